@@ -1,19 +1,40 @@
 import base64
+import datetime
+import mimetypes
 import os
+from typing import Any
+from typing import Callable
+from typing import Dict
 from typing import Optional
+from typing import Tuple
 
 from flask import Flask
 from flask import render_template
 from flask import jsonify
 from flask import request
 from flask import Response
+from werkzeug.exceptions import BadRequest
 from werkzeug.exceptions import HTTPException
+from werkzeug.exceptions import NotFound
+from werkzeug.http import is_resource_modified
 
 
+from callisto.core.compression import choose_encoding
+from callisto.core.compression import compress
+from callisto.core.compression import is_compressible
+from callisto.core.content_index import ContentIndexer
 from callisto.core.contents_loader import ContentsLoader
+from callisto.core.listing import MAX_PAGE_SIZE
+from callisto.core.listing import directories_first
+from callisto.core.outputs import BLOB_NAME_PATTERN
 from callisto.core.callisto_config import CallistoConfig
+from callisto.core.notebook_content import cells_key
+from callisto.core.prerender import Prerenderer
+from callisto.core.prerender import prerender_lock
 from callisto.core.private_loader import PrivateLoader
+from callisto.core.single_flight import job_lock
 
+DEFAULT_SEARCH_LIMIT = 50
 
 app = Flask(__name__, static_folder="./built/static", template_folder="./built")
 
@@ -23,7 +44,36 @@ def configure_app(config: Optional[str]) -> Flask:
     app.logger.info(f"configure_app using config: {config}")
     app.callisto_config = CallistoConfig.load_from_config_file(config)
     app.contents_loader = ContentsLoader(app.callisto_config)
-    app.private_loader = PrivateLoader(app.callisto_config)
+    app.private_loader = PrivateLoader(
+        app.callisto_config, render_pool=app.contents_loader.render_pool
+    )
+    if app.callisto_config.prerender_interval:
+        app.prerenderer = Prerenderer(
+            app.contents_loader,
+            prefixes=app.callisto_config.prerender_prefixes,
+            max_workers=app.callisto_config.prerender_workers,
+        )
+        # Every worker starts one, the lock lets a single one of them run.
+        app.prerenderer.start(
+            app.callisto_config.prerender_interval,
+            lock=prerender_lock(
+                app.callisto_config, app.callisto_config.prerender_prefixes
+            ),
+        )
+    if app.callisto_config.content_index_interval:
+        app.content_indexer = ContentIndexer(
+            app.contents_loader,
+            app.contents_loader.content_index,
+            prefixes=app.callisto_config.content_index_prefixes,
+        )
+        app.content_indexer.start(
+            app.callisto_config.content_index_interval,
+            lock=job_lock(
+                "content-index",
+                path=app.callisto_config.content_index_path,
+                prefixes=app.callisto_config.content_index_prefixes,
+            ),
+        )
     return app
 
 
@@ -34,45 +84,212 @@ def index_2(path: str = None) -> str:
     return render_template("index.html")
 
 
+def _validators(model: Dict[str, Any]) -> Tuple[Optional[str], Any]:
+    last_modified = model.get("last_modified")
+    if not isinstance(last_modified, datetime.datetime):
+        last_modified = None
+    return model.get("etag"), last_modified
+
+
+def _conditional_response(
+    etag: Optional[str],
+    last_modified: Any,
+    build: Callable[[], Response],
+    compressible: bool = True,
+) -> Response:
+    """Answers with 304 when the client already has this version.
+
+    `build` is only called when the client needs the full response, and the
+    response always has to be revalidated before the client reuses it. A 304
+    has the validators and `Vary` the full response would have, compressed
+    when it is `compressible`.
+    """
+    if (etag or last_modified) and not is_resource_modified(
+        request.environ, etag=etag, last_modified=last_modified
+    ):
+        response = Response(status=304)
+    else:
+        response = build()
+    if compressible:
+        response.vary.add("Accept-Encoding")
+    if etag:
+        compressed = "Content-Encoding" in response.headers
+        response.set_etag(etag, weak=compressed or compressible and _may_compress())
+    if last_modified:
+        response.last_modified = last_modified
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def _json_response(model: Dict[str, Any], by_body: bool = False) -> Response:
+    """JSON response validated by the backend ETag/last modified when there is
+    one, or by a hash of the body for directories and when `by_body`.
+
+    The last modified time of a folder does not change with the entries in it,
+    so directory listings are always validated by their body.
+    """
+    etag, last_modified = _validators(model)
+    by_body = by_body or model.get("type") == "directory"
+    if not by_body and (etag or last_modified):
+        return _conditional_response(etag, last_modified, lambda: jsonify(model))
+    response = jsonify(model)
+    response.add_etag(weak=_may_compress())
+    response.vary.add("Accept-Encoding")
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+
 @app.route("/api/info/<path:path>")
 def info(path):
     if path == "<root>":
         path = ""
-    return jsonify(app.contents_loader.info(path))
+    return _json_response(app.contents_loader.info(path))
 
 
 @app.route("/api/get/<path:path>")
 def list(path: str) -> Response:
     if path == "<root>":
         path = ""
+    if request.args.get("refresh"):
+        app.contents_loader.invalidate_listing(path)
+    if "limit" in request.args:
+        limit = _parse_limit(request.args["limit"])
+        return _json_response(
+            app.contents_loader.list_page(
+                path, limit, cursor=request.args.get("cursor") or None
+            )
+        )
     r = app.contents_loader.get(path)
     if r["type"] == "directory":
-        r["content"] = sorted(
-            r["content"], key=lambda item: (item["type"] != "directory", item["name"])
-        )
-    return jsonify(r)
+        r["content"] = sorted(r["content"], key=directories_first)
+    return _json_response(r)
+
+
+@app.route("/api/tree/<path:path>")
+def tree(path: str) -> Response:
+    if path == "<root>":
+        path = ""
+    max_depth = app.callisto_config.tree_max_depth
+    value = request.args.get("depth", "1")
+    try:
+        depth = int(value)
+    except ValueError:
+        raise BadRequest(f"invalid depth `{value}`")
+    if not 0 < depth <= max_depth:
+        raise BadRequest(f"depth must be between 1 and {max_depth}")
+    # Nothing tells whether any entry below the root changed but the entries.
+    return _json_response(app.contents_loader.list_tree(path, depth), by_body=True)
+
+
+def _parse_limit(value: str) -> int:
+    try:
+        limit = int(value)
+    except ValueError:
+        raise BadRequest(f"invalid limit `{value}`")
+    if not 0 < limit <= MAX_PAGE_SIZE:
+        raise BadRequest(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    return limit
+
+
+@app.route("/api/search")
+def search() -> Response:
+    query, limit = _search_args()
+    return _json_response(
+        {"query": query, "content": app.contents_loader.search(query, limit)}
+    )
+
+
+@app.route("/api/search/content")
+def search_content() -> Response:
+    query, limit = _search_args()
+    return _json_response(
+        {"query": query, "content": app.contents_loader.search_content(query, limit)}
+    )
+
+
+def _search_args() -> Tuple[str, int]:
+    query = request.args.get("q", "").strip()
+    if not query:
+        raise BadRequest("missing query `q`")
+    return query, _parse_limit(request.args.get("limit", str(DEFAULT_SEARCH_LIMIT)))
+
+
+@app.route("/api/cache/stats")
+def cache_stats():
+    return jsonify(app.contents_loader.cache_stats())
 
 
 @app.route("/api/private-raw/<path:path>", defaults={"private": True})
 @app.route("/api/raw/<path:path>")
 def raw(path, private=False):
     loader = app.private_loader if private else app.contents_loader
-    content = loader.get(path, type="file")
-    if content["format"] == "base64":
-        content["content"] = base64.decodebytes(content["content"].encode("ascii"))
-    download = bool(request.args.get("download"))
-    kwargs = (
-        {"headers": {"Content-Disposition": f"attachment;filename={content['name']}"}}
-        if download
-        else {}
-    )
+    if request.if_none_match or request.if_modified_since:
+        etag, last_modified = _validators(loader.info(path))
+        if not is_resource_modified(
+            request.environ, etag=etag, last_modified=last_modified
+        ):
+            return _conditional_response(
+                etag, last_modified, Response, compressible=False
+            )
+
+    byte_range = None
+    if request.range is not None and len(request.range.ranges) == 1:
+        byte_range = request.range.ranges[0]
+    content = loader.open_stream(path, byte_range=byte_range)
+    if (
+        byte_range is not None
+        and content is not None
+        and not _if_range_matches(content)
+    ):
+        content["content"].close()
+        content = loader.open_stream(path)
+
+    headers = {}
+    status = 200
+    if content is None:
+        content = loader.get(path, type="file")
+        if content["format"] == "base64":
+            content["content"] = base64.decodebytes(content["content"].encode("ascii"))
+    else:
+        headers["Accept-Ranges"] = "bytes"
+        headers["Content-Length"] = str(content["size"])
+        if content.get("content_range") is not None:
+            start, stop = content["content_range"]
+            status = 206
+            headers["Content-Range"] = f"bytes {start}-{stop - 1}/{content['size']}"
+            headers["Content-Length"] = str(stop - start)
+    if request.args.get("download"):
+        headers["Content-Disposition"] = f"attachment;filename={content['name']}"
     mimetype = (
         "text/plain"
         if content.get("mimetype", None) is None
         or content["mimetype"].startswith("text/")
         else content["mimetype"]
     )
-    return Response(content["content"], mimetype=mimetype, **kwargs)
+    response = Response(
+        content["content"], status=status, mimetype=mimetype, headers=headers
+    )
+    etag, last_modified = _validators(content)
+    if etag:
+        response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def _if_range_matches(content: Dict[str, Any]) -> bool:
+    """Whether a Range request still applies to the current version of a file."""
+    if_range = request.if_range
+    if if_range.etag is not None:
+        return if_range.etag == content.get("etag")
+    if if_range.date is not None:
+        last_modified = content.get("last_modified")
+        return (
+            last_modified is not None
+            and last_modified.replace(microsecond=0) == if_range.date
+        )
+    return True
 
 
 @app.route("/api/notebook/private-toc/<path:path>", defaults={"private": True})
@@ -80,7 +297,10 @@ def raw(path, private=False):
 def toc(path, private=False):
     loader = app.private_loader if private else app.contents_loader
     nb = loader.get_nb(path)
-    return jsonify(nb.toc())
+    etag, last_modified = nb.version()
+    return _conditional_response(
+        etag, last_modified, lambda: jsonify(nb.toc(refresh=False))
+    )
 
 
 @app.route("/api/notebook/private-render/<path:path>", defaults={"private": True})
@@ -88,7 +308,108 @@ def toc(path, private=False):
 def render_nb(path, private=False):
     loader = app.private_loader if private else app.contents_loader
     nb = loader.get_nb(path)
-    return nb.html_content
+    etag, last_modified = nb.version()
+    if "cells" in request.args:
+        return _render_cells(nb, etag, last_modified)
+
+    return _conditional_response(
+        etag,
+        last_modified,
+        lambda: _html_response(
+            nb.get_html(refresh=False),
+            lambda encoding: nb.get_compressed_html(encoding, refresh=False),
+        ),
+    )
+
+
+def _html_response(html: str, get_compressed: Callable[[str], bytes]) -> Response:
+    """Rendered html, or its stored variant in the negotiated encoding."""
+    # The threshold is in bytes, a string never has more characters than
+    # utf-8 bytes so only short ones need to be encoded to tell.
+    size = len(html)
+    if size < (app.callisto_config.compression_min_size or 0):
+        size = len(html.encode("utf-8"))
+    encoding = _negotiate_encoding(size)
+    if encoding is None:
+        return Response(html)
+    response = Response(get_compressed(encoding), mimetype="text/html")
+    _mark_compressed(response, encoding)
+    return response
+
+
+def _parse_cells(value: str, total: int) -> Tuple[int, int]:
+    """Parses a `start-stop` cell range, `stop` is excluded and optional."""
+    start, sep, stop = value.partition("-")
+    try:
+        cells = int(start), int(stop) if stop else total
+    except ValueError:
+        raise BadRequest(f"invalid cell range `{value}`")
+    if not sep or cells[0] < 0 or cells[1] < cells[0]:
+        raise BadRequest(f"invalid cell range `{value}`")
+    return cells[0], min(cells[1], total)
+
+
+def _render_cells(nb: Any, etag: str, last_modified: Any) -> Response:
+    """Renders a range of cells, as a document or with `fragment=1` as markup.
+
+    The total number of cells is sent in `X-Total-Cells`, so that a client can
+    load a notebook a range at a time.
+    """
+    total = nb.cell_count(refresh=False)
+    start, stop = _parse_cells(request.args["cells"], total)
+    fragment = bool(request.args.get("fragment"))
+    response = _conditional_response(
+        cells_key(etag, start, stop, fragment),
+        last_modified,
+        lambda: _html_response(
+            nb.get_cells_html(start, stop, fragment=fragment, refresh=False),
+            lambda encoding: nb.get_compressed_cells_html(
+                start, stop, encoding, fragment=fragment, refresh=False
+            ),
+        ),
+    )
+    response.headers["X-Total-Cells"] = str(total)
+    return response
+
+
+@app.route("/api/notebook/output/<name>")
+def notebook_output(name):
+    """Serves an output extracted from a rendered notebook.
+
+    Outputs are addressed by the hash of their content, so they never change
+    and can be cached by browsers for good.
+    """
+    match = BLOB_NAME_PATTERN.match(name)
+    if match is None:
+        raise NotFound()
+    blob = app.contents_loader.get_output(match.group(1))
+    if blob is None:
+        raise NotFound()
+    response = Response(blob, mimetype=mimetypes.guess_type(name)[0])
+    response.set_etag(match.group(1))
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response.make_conditional(request)
+
+
+@app.route("/api/notebook/private-output-text/<path:path>", defaults={"private": True})
+@app.route("/api/notebook/output-text/<path:path>")
+def notebook_output_text(path, private=False):
+    """Serves the full text of an output truncated in the rendered notebook."""
+    loader = app.private_loader if private else app.contents_loader
+    try:
+        cell, output = int(request.args["cell"]), int(request.args["output"])
+    except (KeyError, ValueError):
+        raise BadRequest("`cell` and `output` must be integers")
+    nb = loader.get_nb(path)
+    etag, last_modified = nb.version()
+    text = nb.get_output_text(cell, output, refresh=False)
+    if text is None:
+        raise NotFound()
+    return _conditional_response(
+        f"{etag}.output-{cell}-{output}",
+        last_modified,
+        lambda: Response(text[0], mimetype=text[1]),
+    )
 
 
 @app.route("/api/notebook/private-import/<path:path>", defaults={"private": True})
@@ -129,9 +450,56 @@ if os.getenv("FLASK_ENV", "") == "development":
         return app.private_loader.resolve_path(path)
 
 
+def _may_compress() -> bool:
+    """Whether compressible responses to this request are compressed if big enough.
+
+    Their ETag is then weak whatever their size, so that a 304 has the same one.
+    """
+    return (
+        app.callisto_config.compression_min_size is not None
+        and choose_encoding(request.accept_encodings) is not None
+    )
+
+
+def _negotiate_encoding(size: int) -> Optional[str]:
+    min_size = app.callisto_config.compression_min_size
+    if min_size is None or size < min_size:
+        return None
+    return choose_encoding(request.accept_encodings)
+
+
+def _mark_compressed(response: Response, encoding: str) -> None:
+    response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    # the compressed body is only semantically equivalent to the original one
+    etag, is_weak = response.get_etag()
+    if etag and not is_weak:
+        response.set_etag(etag, weak=True)
+
+
+@app.after_request
+def compress_response(response: Response) -> Response:
+    if (
+        response.status_code != 200
+        or response.is_streamed
+        or "Content-Encoding" in response.headers
+        or not is_compressible(response.mimetype)
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = _negotiate_encoding(response.content_length or 0)
+    if encoding is not None:
+        response.set_data(compress(response.get_data(), encoding))
+        _mark_compressed(response, encoding)
+    return response
+
+
 @app.errorhandler(HTTPException)
 def handle_exception(e):
+    # Keeps the headers of the exception, like Content-Range of a 416.
     response = e.get_response()
     output = jsonify({"code": e.code, "name": e.name, "description": e.description})
+    response.set_data(output.get_data())
     response.content_type = "application/json"
-    return output, e.code
+    return response
@@ -0,0 +1,312 @@
+import asyncio
+import logging
+import pathlib
+import threading
+from contextlib import AsyncExitStack
+from typing import Any
+from typing import Awaitable
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import TypeVar
+
+from botocore.exceptions import BotoCoreError
+from botocore.exceptions import ClientError
+from tornado.web import HTTPError as TornadoHTTPError
+
+from callisto.contents_managers.s3 import SimplifiedS3ContentsManager
+from callisto.core.listing import list_tree
+
+try:
+    from aiobotocore.config import AioConfig
+    from aiobotocore.session import AioSession
+except ImportError:  # pragma: no cover
+    AioConfig = None
+    AioSession = None
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class EventLoopThread:
+    """An asyncio event loop running in a daemon thread.
+
+    `run` waits for a coroutine from any other thread, so synchronous code can
+    share the loop and everything bound to it, like an aiohttp session.
+    """
+
+    def __init__(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def run(self, coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+        if threading.current_thread() is self.thread:
+            if asyncio.iscoroutine(coro):
+                coro.close()
+            raise RuntimeError("`run` would block the event loop it waits for")
+        return asyncio.run_coroutine_threadsafe(_await(coro), self.loop).result(timeout)
+
+    def stop(self) -> None:
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+async def _await(awaitable: Awaitable[T]) -> T:
+    return await awaitable
+
+
+class _SyncBody:
+    """The blocking file-like interface of a streamed aiobotocore body."""
+
+    def __init__(self, runner: EventLoopThread, body: Any) -> None:
+        self.runner = runner
+        self.body = body
+
+    def read(self, amt: Optional[int] = None) -> bytes:
+        return self.runner.run(self.body.read(amt))
+
+    def close(self) -> None:
+        self.runner.loop.call_soon_threadsafe(self.body.close)
+
+
+class _SyncPaginator:
+    def __init__(self, runner: EventLoopThread, paginator: Any) -> None:
+        self.runner = runner
+        self.paginator = paginator
+
+    def paginate(self, **kwargs: Any) -> Iterator[Dict[str, Any]]:
+        pages = self.paginator.paginate(**kwargs).__aiter__()
+        while True:
+            try:
+                yield self.runner.run(pages.__anext__())
+            except StopAsyncIteration:
+                return
+
+
+class SyncClient:
+    """Calls an aiobotocore client like a boto3 one, blocking on its loop.
+
+    Only what SimplifiedS3ContentsManager uses is supported: keyword argument
+    calls, paginators, and streamed bodies.
+    """
+
+    def __init__(
+        self, runner: EventLoopThread, client: Any, exit_stack: AsyncExitStack
+    ) -> None:
+        self.runner = runner
+        self.async_client = client
+        self._exit_stack = exit_stack
+
+    def __getattr__(self, name: str) -> Any:
+        method = getattr(self.async_client, name)
+
+        def call(**kwargs: Any) -> Any:
+            response = self.runner.run(method(**kwargs))
+            if "Body" in response:
+                response["Body"] = _SyncBody(self.runner, response["Body"])
+            return response
+
+        return call
+
+    def get_paginator(self, name: str) -> _SyncPaginator:
+        return _SyncPaginator(self.runner, self.async_client.get_paginator(name))
+
+    def close(self) -> None:
+        self.runner.run(self._exit_stack.aclose())
+        self.runner.stop()
+
+
+class AsyncS3ContentsManager(SimplifiedS3ContentsManager):
+    """SimplifiedS3ContentsManager on top of aiobotocore.
+
+    The aiobotocore client runs on an event loop in a background thread, one
+    per process, and the regular synchronous methods wait for it, so the
+    manager works anywhere a SimplifiedS3ContentsManager does. Listing many
+    folders (`list_folders`, `list_tree`, `crawl`) and fetching many files
+    (`get_many`) overlap their requests instead, at most `max_concurrency`
+    at a time.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: Optional[str] = None,
+        max_pool_connections: int = 10,
+        max_concurrency: int = 10,
+        **kwargs: Any,
+    ) -> None:
+        if AioSession is None:
+            raise ImportError(
+                "AsyncS3ContentsManager needs aiobotocore, "
+                "install callisto-nbviewer[async]"
+            )
+        super().__init__(
+            bucket, prefix=prefix, max_pool_connections=max_pool_connections, **kwargs
+        )
+        self.max_concurrency = max_concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _create_client(self) -> SyncClient:
+        runner = EventLoopThread()
+        client, exit_stack = runner.run(self._open_client())
+        return SyncClient(runner, client, exit_stack)
+
+    async def _open_client(self) -> Any:
+        session_kwargs = self.session_kwargs.copy()
+        session = AioSession(profile=session_kwargs.pop("profile_name", None))
+        exit_stack = AsyncExitStack()
+        client = await exit_stack.enter_async_context(
+            session.create_client(
+                "s3",
+                config=AioConfig(max_pool_connections=self.max_pool_connections),
+                **session_kwargs,
+            )
+        )
+        # Bound to the loop of this process.
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return client, exit_stack
+
+    @property
+    def async_client(self) -> Any:
+        return self.client.async_client
+
+    def run(self, coro: Awaitable[T]) -> T:
+        """Waits for a coroutine on the event loop of the client."""
+        return self.client.runner.run(coro)
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    async def _call(self, method: str, **kwargs: Any) -> Dict[str, Any]:
+        async with self._semaphore:  # type: ignore
+            return await getattr(self.async_client, method)(**kwargs)
+
+    async def alist_folder(self, path: str) -> List[Dict[str, Any]]:
+        """Lists a folder like `list_folder`, one page after another."""
+        prefix = self._folder_prefix(path)
+        result = []
+        kwargs = {"Bucket": self.bucket, "Prefix": prefix, "Delimiter": "/"}
+        while True:
+            data = await self._call("list_objects_v2", **kwargs)
+            for content in self._listed_files(data.get("Contents") or [], prefix):
+                result.append(self._file_item(content))
+            for common_prefix in data.get("CommonPrefixes") or []:
+                result.append(self._directory_item(common_prefix))
+            if not data.get("IsTruncated"):
+                return result
+            kwargs["ContinuationToken"] = data["NextContinuationToken"]
+
+    def _list_folder(self, path):
+        return self.run(self.alist_folder(path))
+
+    def list_folders(self, paths: List[str]) -> List[List[Dict[str, Any]]]:
+        """Lists several folders concurrently, in the order of `paths`.
+
+        A folder failing to list is logged and listed as empty, the others are
+        still returned.
+        """
+
+        async def list_all() -> List[Any]:
+            return await asyncio.gather(
+                *(self.alist_folder(p) for p in paths), return_exceptions=True
+            )
+
+        listings = []
+        for path, listing in zip(paths, self.run(list_all())):
+            if isinstance(listing, (BotoCoreError, ClientError, OSError)):
+                logger.warning(f"unable to list `{path}`: {listing}")
+                listing = []
+            elif isinstance(listing, BaseException):
+                raise listing
+            listings.append(listing)
+        return listings
+
+    def list_tree(
+        self, path: str, depth: int, max_entries: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """The directory model of `path` with `depth` levels of entries.
+
+        Every folder of a level is listed concurrently. `truncated` of the
+        model tells whether `max_entries` stopped the listing early.
+        """
+        content, truncated = list_tree(self.list_folders, path, depth, max_entries)
+        return {
+            **self._get_directory(path, content=False),
+            "content": content,
+            "truncated": truncated,
+        }
+
+    async def _alist_keys(self, prefix: str, delimiter: bool) -> Dict[str, Any]:
+        """Every object and, with a `delimiter`, folder under `prefix`."""
+        contents: List[Dict[str, Any]] = []
+        common_prefixes: List[Dict[str, Any]] = []
+        kwargs = {"Bucket": self.bucket, "Prefix": prefix}
+        if delimiter:
+            kwargs["Delimiter"] = "/"
+        while True:
+            data = await self._call("list_objects_v2", **kwargs)
+            contents += data.get("Contents") or []
+            common_prefixes += data.get("CommonPrefixes") or []
+            if not data.get("IsTruncated"):
+                return {"Contents": contents, "CommonPrefixes": common_prefixes}
+            kwargs["ContinuationToken"] = data["NextContinuationToken"]
+
+    def _crawl_contents(self, prefix: str) -> Iterable[Dict[str, Any]]:
+        """A flat listing of every folder under `prefix`, all of them at once."""
+
+        async def crawl() -> List[Dict[str, Any]]:
+            top = await self._alist_keys(prefix, delimiter=True)
+            folders = await asyncio.gather(
+                *(
+                    self._alist_keys(p["Prefix"], delimiter=False)
+                    for p in top["CommonPrefixes"]
+                )
+            )
+            return top["Contents"] + [
+                c for folder in folders for c in folder["Contents"]
+            ]
+
+        return self.run(crawl())
+
+    async def aget(self, path: str, content: bool = True) -> Dict[str, Any]:
+        """The model of a file, like `get` of a file path."""
+        key = str(pathlib.Path(self.prefix) / path)
+        if not content:
+            obj = await self._call("head_object", Bucket=self.bucket, Key=key)
+            return self._file_model(path, obj, None)
+        async with self._semaphore:  # type: ignore
+            obj = await self.async_client.get_object(Bucket=self.bucket, Key=key)
+            async with obj["Body"] as body:
+                return self._file_model(path, obj, await body.read())
+
+    def get_many(
+        self, paths: List[str], content: bool = True
+    ) -> Dict[str, Dict[str, Any]]:
+        """Fetches the models of several files concurrently, by path.
+
+        Files that do not exist are left out.
+        """
+
+        async def get(path: str) -> Optional[Dict[str, Any]]:
+            try:
+                return await self.aget(path, content=content)
+            except ClientError as e:
+                if e.response["Error"]["Code"] in self.not_found_codes:
+                    return None
+                raise
+
+        async def get_all() -> List[Optional[Dict[str, Any]]]:
+            return await asyncio.gather(*(get(path) for path in paths))
+
+        try:
+            models = self.run(get_all())
+        except ClientError as e:
+            raise TornadoHTTPError(500, e.response["Error"]["Message"])
+        return {path: model for path, model in zip(paths, models) if model is not None}
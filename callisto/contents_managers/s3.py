@@ -2,23 +2,55 @@ import base64
 import os
 import pathlib
 import mimetypes
+import threading
+from collections import OrderedDict
 from typing import Any
+from typing import Callable
 from typing import Dict
+from typing import Iterable
+from typing import List
 from typing import Optional
+from typing import Tuple
 
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from tornado.web import HTTPError as TornadoHTTPError
 
+from callisto.core.cache import LRUCache
+from callisto.core.listing import decode_cursor
+from callisto.core.listing import encode_cursor
+from callisto.core.metadata_index import MetadataIndex
+from callisto.core.streaming import ByteRange
+from callisto.core.streaming import ChunkedStream
+from callisto.core.streaming import RangeNotSatisfiable
+from callisto.core.streaming import STREAM_CHUNK_SIZE
+
+# Sorts after every key under a prefix, to resume a listing after a directory.
+AFTER_PREFIX = "\U0010ffff"
+
+# A listed item and the key to resume a listing after it.
+Entry = Tuple[str, Dict[str, Any]]
 
-class SimplifiedS3ContentsManager:
 
+class SimplifiedS3ContentsManager:
     """The current s3contents seems to be slow when there are multiple direcotries.
     This class is a simplified version which only implements the `get` function
     of the regular ContentsManager. This should be good enough to serve our needs.
 
     Based on my tests, this simplifiedS3ContentsManager is 6 times faster than
     s3contents.
+
+    The boto3 client is created once per process and shared between threads,
+    `max_pool_connections` controls the size of its connection pool.
+
+    With an `index_path`, folder listings are kept in a local MetadataIndex and
+    served from it for `index_max_age` seconds (forever when None), or until
+    they are `invalidate`d. `crawl` fills the index for a whole prefix, and it
+    backs the name `search`.
+
+    Without one, the directories of a folder are kept in memory for
+    `directories_cache_ttl` seconds between the pages of its listing.
     """
 
     avaiable_boto3_session_arg_names = [
@@ -32,8 +64,26 @@ class SimplifiedS3ContentsManager:
 
     available_s3_arg_names = ["bucket", "prefix"]
 
+    # `get_object` reports a missing key as NoSuchKey, `head_object` has no body
+    # and only reports the http status code.
+    not_found_codes = ("NoSuchKey", "404")
+
+    stream_chunk_size = STREAM_CHUNK_SIZE
+
+    # Keys per list_objects_v2 request, at most 1000.
+    max_keys = 1000
+
     def __init__(
-        self, bucket: str, prefix: Optional[str] = None, **kwargs: Dict[str, Any]
+        self,
+        bucket: str,
+        prefix: Optional[str] = None,
+        max_pool_connections: int = 10,
+        path_kind_cache_size: int = 10000,
+        index_path: Optional[str] = None,
+        index_max_age: Optional[float] = 300,
+        directories_cache_size: int = 1000,
+        directories_cache_ttl: Optional[float] = 60,
+        **kwargs: Dict[str, Any],
     ) -> None:
         self.session_kwargs = {
             key: kwargs[key]
@@ -43,18 +93,42 @@ class SimplifiedS3ContentsManager:
 
         self.bucket = bucket
         self.prefix = prefix or ""
+        self.max_pool_connections = max_pool_connections
+        self._client = None
+        self._client_pid: Optional[int] = None
+        self._client_lock = threading.Lock()
+        self.path_kind_cache_size = path_kind_cache_size
+        self._path_kinds: "OrderedDict[str, str]" = OrderedDict()
+        self._path_kinds_lock = threading.Lock()
+        self.index = MetadataIndex(index_path) if index_path else None
+        self.index_max_age = index_max_age
+        self._directories_cache = LRUCache(
+            directories_cache_size, ttl=directories_cache_ttl
+        )
 
-    @property
-    def client(self):
+    def _create_client(self):
         session_kwargs = self.session_kwargs.copy()
         endpoint_url = session_kwargs.pop("endpoint_url", None)
         session = boto3.session.Session(**session_kwargs)
         client = session.client(
             service_name="s3",
             endpoint_url=endpoint_url,
+            config=Config(max_pool_connections=self.max_pool_connections),
         )
         return client
 
+    @property
+    def client(self):
+        # boto3 clients are thread-safe but must not be shared across a fork,
+        # so a gunicorn worker forked from a preloaded app builds its own.
+        pid = os.getpid()
+        if self._client is None or self._client_pid != pid:
+            with self._client_lock:
+                if self._client is None or self._client_pid != pid:
+                    self._client = self._create_client()
+                    self._client_pid = pid
+        return self._client
+
     def is_folder(self, path):
         path = os.path.join(self.prefix, path)
         path = path.rstrip("/") + "/"
@@ -66,10 +140,65 @@ class SimplifiedS3ContentsManager:
         )
         return "Contents" in r or "CommonPrefixes" in r
 
-    def list_folder(self, path):
+    def _folder_prefix(self, path: str) -> str:
         prefix = os.path.join(self.prefix, path).rstrip("/") + "/"
-        if prefix == "/":
-            prefix = ""
+        return "" if prefix == "/" else prefix
+
+    def _file_item(self, content: Dict[str, Any]) -> Dict[str, Any]:
+        name = pathlib.Path(content["Key"]).name
+        return {
+            "name": name,
+            "path": str(pathlib.Path(content["Key"]).relative_to(self.prefix)),
+            "writable": True,
+            "last_modified": content["LastModified"],
+            "created": content["LastModified"],
+            "etag": content["ETag"].strip('"'),
+            "content": None,
+            "format": None,
+            "mimetype": None,
+            "type": "notebook" if name.endswith(".ipynb") else "file",
+        }
+
+    def _directory_item(self, common_prefix: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "name": pathlib.Path(common_prefix["Prefix"]).name,
+            "path": str(pathlib.Path(common_prefix["Prefix"]).relative_to(self.prefix)),
+            "writable": True,
+            "last_modified": None,
+            "created": None,
+            "content": None,
+            "format": None,
+            "mimetype": None,
+            "type": "directory",
+        }
+
+    def _listed_files(
+        self, contents: List[Dict[str, Any]], prefix: str
+    ) -> List[Dict[str, Any]]:
+        return [
+            content
+            for content in contents
+            if content["Key"] != prefix
+            and not pathlib.Path(content["Key"]).name.startswith(".")
+        ]
+
+    def list_folder(self, path):
+        if self.index is None:
+            return self._list_folder(path)
+        items = self.index.list_folder(path, max_age=self.index_max_age)
+        if items is None:
+            items = self._list_folder(path)
+            self.index.sync_folder(path, items)
+        return items
+
+    def invalidate(self, path: str) -> None:
+        """Lists the folder from S3 again on its next listing."""
+        self._directories_cache.pop(self._folder_prefix(path))
+        if self.index is not None:
+            self.index.invalidate(path)
+
+    def _list_folder(self, path):
+        prefix = self._folder_prefix(path)
         result = []
         paginator = self.client.get_paginator("list_objects")
         page_iterator = paginator.paginate(
@@ -79,112 +208,412 @@ class SimplifiedS3ContentsManager:
             PaginationConfig={"PageSize": 1000},
         )
         for data in page_iterator:
-            contents = data.get("Contents")
-            if contents:
-                for content in contents:
-                    if content["Key"] == prefix:
-                        continue
-                    name = pathlib.Path(content["Key"]).name
-                    if not name.startswith("."):
-                        result.append(
-                            {
-                                "name": name,
-                                "path": str(
-                                    pathlib.Path(content["Key"]).relative_to(
-                                        self.prefix
-                                    )
-                                ),
-                                "writable": True,
-                                "last_modified": content["LastModified"],
-                                "created": content["LastModified"],
-                                "content": None,
-                                "format": None,
-                                "mimetype": None,
-                                "type": "notebook"
-                                if name.endswith(".ipynb")
-                                else "file",
-                            }
-                        )
-            common_prefixes = data.get("CommonPrefixes")
-            if common_prefixes:
-                for common_prefix in common_prefixes:
-                    name = pathlib.Path(common_prefix["Prefix"]).name
-                    result.append(
-                        {
-                            "name": name,
-                            "path": str(
-                                pathlib.Path(common_prefix["Prefix"]).relative_to(
-                                    self.prefix
-                                )
-                            ),
-                            "writable": True,
-                            "last_modified": None,
-                            "created": None,
-                            "content": None,
-                            "format": None,
-                            "mimetype": None,
-                            "type": "directory",
-                        }
-                    )
+            for content in self._listed_files(data.get("Contents") or [], prefix):
+                result.append(self._file_item(content))
+            for common_prefix in data.get("CommonPrefixes") or []:
+                result.append(self._directory_item(common_prefix))
         return result
 
-    def get(self, path, content, type=None, **kwargs):
+    def list_folder_page(
+        self, path: str, limit: int, cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Returns the directory model with a page of at most `limit` entries.
+
+        Directories come first, then files, both in key order. S3 lists them
+        mixed, so the directories of a folder are found in a pass over all of
+        its keys, 1000 per request, and kept in memory for
+        `directories_cache_ttl` seconds; the first files of that pass fill the
+        rest of the page. Later pages of files resume after the last listed
+        key, with as many requests as needed to fill them. `next_cursor` of the
+        model is the cursor of the next page, None after the last one.
+
+        With an index, pages are read from the index instead.
+        """
+        if self.index is not None:
+            return self._list_indexed_folder_page(self.index, path, limit, cursor)
+        prefix = self._folder_prefix(path)
         try:
-            name = pathlib.Path(path).name
-            if self.is_folder(path):
-                return {
-                    "name": name,
-                    "path": path,
-                    "writable": True,
-                    "last_modified": None,
-                    "created": None,
-                    "content": self.list_folder(path) if content else None,
-                    "format": "json",
-                    "mimetype": None,
-                    "type": "directory",
-                }
+            state = decode_cursor(cursor) if cursor else {"phase": "directories"}
+            phase = state["phase"]
+            start_after = state.get("after")
+            if phase not in ("directories", "files"):
+                raise ValueError(phase)
+            if start_after is not None and not isinstance(start_after, str):
+                raise ValueError(start_after)
+        except (KeyError, ValueError) as e:
+            raise TornadoHTTPError(400, f"invalid cursor: {e}")
 
-            key = str(pathlib.Path(self.prefix) / path)
-            obj = self.client.get_object(Bucket=self.bucket, Key=key)
+        items: List[Dict[str, Any]] = []
 
-            if path.endswith(".ipynb"):
-                c = obj["Body"].read().decode("utf-8")
-                return {
-                    "name": name,
-                    "path": path,
-                    "writable": True,
-                    "last_modified": obj["LastModified"],
-                    "created": obj["LastModified"],
-                    "content": None if not content else c,
-                    "format": "json",
-                    "mimetype": None,
-                    "type": "notebook",
-                }
+        def page(more: bool) -> Dict[str, Any]:
+            return {
+                **self._get_directory(path, content=False),
+                "content": items,
+                "next_cursor": (
+                    encode_cursor({"phase": phase, "after": start_after})
+                    if more
+                    else None
+                ),
+            }
 
-            mimetype, _ = mimetypes.guess_type(name)
-            content_s = None if not content else obj["Body"].read()
+        try:
+            if phase == "directories":
+                listed = self._directories_cache.get(prefix)
+                # The first files, when the folder was scanned by this request.
+                files: Optional[List[Entry]] = None
+                if listed is None:
+                    listed, files = self._scan_directories(prefix, limit + 1)
+                    if listed[0] or listed[1]:
+                        self._directories_cache.set(prefix, listed)
+                directories, has_files = listed
+                directories = [
+                    (key, item)
+                    for key, item in directories
+                    if start_after is None or key > start_after
+                ]
+                for key, item in directories[:limit]:
+                    items.append(item)
+                    start_after = key
+                if len(directories) > limit:
+                    return page(more=True)
+                if not has_files:
+                    return self._first_page(path, cursor, page)
+                phase, start_after = "files", None
+                if files is not None:
+                    for key, item in files[: limit - len(items)]:
+                        items.append(item)
+                        start_after = key
+                    return page(more=len(items) - len(directories) < len(files))
+                if len(items) == limit:
+                    return page(more=True)
 
-            if mimetype.startswith("text/"):
-                format_ = "text"
-            else:
-                format_ = "base64"
-                content_s = (
-                    base64.b64encode(content_s).decode("ascii") if content else None
+            while True:
+                kwargs = {
+                    "Bucket": self.bucket,
+                    "Prefix": prefix,
+                    "Delimiter": "/",
+                    "MaxKeys": self.max_keys,
+                }
+                if start_after is not None:
+                    kwargs["StartAfter"] = start_after
+                data = self.client.list_objects_v2(**kwargs)
+                contents = data.get("Contents") or []
+                common_prefixes = data.get("CommonPrefixes") or []
+                entries = [
+                    (content["Key"], self._file_item(content))
+                    for content in self._listed_files(contents, prefix)
+                ]
+                remaining = limit - len(items)
+                if len(entries) > remaining:
+                    for key, item in entries[:remaining]:
+                        items.append(item)
+                        start_after = key
+                    return page(more=True)
+                items.extend(item for _, item in entries)
+                if not data.get("IsTruncated"):
+                    break
+                # Past every key of the last directory too.
+                start_after = max(
+                    [content["Key"] for content in contents[-1:]]
+                    + [p["Prefix"] + AFTER_PREFIX for p in common_prefixes[-1:]]
                 )
+                if len(items) == limit:
+                    return page(more=True)
+        except ClientError as e:
+            raise TornadoHTTPError(500, e.response["Error"]["Message"])
+        return self._first_page(path, cursor, page)
+
+    def _first_page(
+        self, path: str, cursor: Optional[str], page: Callable[[bool], Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """The last page, or the model of `path` when nothing is under it."""
+        model = page(False)
+        if cursor is None and not model["content"]:
+            # Nothing under the prefix: an empty folder, a file or nothing at all.
+            model = self.get(path, content=True)
+            if model["type"] == "directory":
+                model["next_cursor"] = None
+        return model
+
+    def _scan_directories(
+        self, prefix: str, max_files: int
+    ) -> Tuple[Tuple[List[Entry], bool], List[Entry]]:
+        """Lists every directory of a folder, in a pass over all of its keys.
 
+        Returns the directories and whether the folder has files, then its
+        first `max_files` files. Each entry comes with the key to resume a
+        listing after it, past every key of a directory.
+        """
+        directories: List[Entry] = []
+        files: List[Entry] = []
+        has_files = False
+        kwargs = {
+            "Bucket": self.bucket,
+            "Prefix": prefix,
+            "Delimiter": "/",
+            "MaxKeys": self.max_keys,
+        }
+        while True:
+            data = self.client.list_objects_v2(**kwargs)
+            listed = self._listed_files(data.get("Contents") or [], prefix)
+            has_files = has_files or bool(listed)
+            files += [
+                (content["Key"], self._file_item(content))
+                for content in listed[: max_files - len(files)]
+            ]
+            directories += [
+                (p["Prefix"] + AFTER_PREFIX, self._directory_item(p))
+                for p in data.get("CommonPrefixes") or []
+            ]
+            if not data.get("IsTruncated"):
+                return (directories, has_files), files
+            kwargs["ContinuationToken"] = data["NextContinuationToken"]
+
+    def _list_indexed_folder_page(
+        self, index: MetadataIndex, path: str, limit: int, cursor: Optional[str]
+    ) -> Dict[str, Any]:
+        try:
+            offset = decode_cursor(cursor)["offset"] if cursor else 0
+            if not isinstance(offset, int) or offset < 0:
+                raise ValueError(offset)
+        except (KeyError, ValueError) as e:
+            raise TornadoHTTPError(400, f"invalid cursor: {e}")
+
+        items = index.list_folder(
+            path, max_age=self.index_max_age, limit=limit + 1, offset=offset
+        )
+        if items is None:
+            # Not indexed yet, or stale: list the folder into the index.
+            index.sync_folder(path, self._list_folder(path))
+            items = index.list_folder(path, limit=limit + 1, offset=offset) or []
+        if cursor is None and not items:
+            # Nothing under the prefix: an empty folder, a file or nothing at all.
+            model = self.get(path, content=True)
+            if model["type"] == "directory":
+                model["next_cursor"] = None
+            return model
+        more = len(items) > limit
+        return {
+            **self._get_directory(path, content=False),
+            "content": items[:limit],
+            "next_cursor": encode_cursor({"offset": offset + limit}) if more else None,
+        }
+
+    def crawl(self, path: str = "") -> int:
+        """Lists every key under `path` into the index, in a single pass.
+
+        Only entries that changed since the last crawl are written, and the
+        whole tree is served from the index afterwards. Returns the number of
+        files and directories found.
+        """
+        if self.index is None:
+            raise ValueError("crawl needs an index, set `index_path`")
+        prefix = self._folder_prefix(path)
+        depth = prefix.count("/")
+        items: Dict[str, Dict[str, Any]] = {}
+        try:
+            for content in self._crawl_contents(prefix):
+                key = content["Key"]
+                parts = key.split("/")[depth:]
+                # Every folder above the key, folder markers included.
+                for i in range(1, len(parts)):
+                    folder = prefix + "/".join(parts[:i]) + "/"
+                    if folder not in items:
+                        items[folder] = self._directory_item({"Prefix": folder})
+                if parts[-1] and not parts[-1].startswith("."):
+                    items[key] = self._file_item(content)
+        except ClientError as e:
+            raise TornadoHTTPError(500, e.response["Error"]["Message"])
+        return self.index.sync_tree(path, items.values())
+
+    def _crawl_contents(self, prefix: str) -> Iterable[Dict[str, Any]]:
+        """Every object under `prefix`, from a flat listing."""
+        paginator = self.client.get_paginator("list_objects_v2")
+        for data in paginator.paginate(
+            Bucket=self.bucket,
+            Prefix=prefix,
+            PaginationConfig={"PageSize": 1000},
+        ):
+            yield from data.get("Contents") or []
+
+    def search(self, query: str, limit: int = 50) -> Optional[List[Dict[str, Any]]]:
+        """Files and directories whose name contains `query`, None without index."""
+        if self.index is None:
+            return None
+        return self.index.search(query, limit=limit)
+
+    def _guess_kind(self, path: str, type: Optional[str]) -> str:
+        with self._path_kinds_lock:
+            kind = self._path_kinds.get(path)
+            if kind is not None:
+                self._path_kinds.move_to_end(path)
+                return kind
+        if type in ("file", "notebook"):
+            return "file"
+        if type == "directory":
+            return "directory"
+        name = pathlib.Path(path).name
+        if name.endswith(".ipynb") or mimetypes.guess_type(name)[0] is not None:
+            return "file"
+        return "directory"
+
+    def _remember_kind(self, path: str, kind: Optional[str]) -> None:
+        with self._path_kinds_lock:
+            if kind is None:
+                self._path_kinds.pop(path, None)
+                return
+            self._path_kinds[path] = kind
+            self._path_kinds.move_to_end(path)
+            while len(self._path_kinds) > self.path_kind_cache_size:
+                self._path_kinds.popitem(last=False)
+
+    def _get_directory(self, path, content):
+        return {
+            "name": pathlib.Path(path).name,
+            "path": path,
+            "writable": True,
+            "last_modified": None,
+            "created": None,
+            "content": self.list_folder(path) if content else None,
+            "format": "json",
+            "mimetype": None,
+            "type": "directory",
+        }
+
+    def _get_file(self, path, content):
+        key = str(pathlib.Path(self.prefix) / path)
+        if content:
+            obj = self.client.get_object(Bucket=self.bucket, Key=key)
+            return self._file_model(path, obj, obj["Body"].read())
+        obj = self.client.head_object(Bucket=self.bucket, Key=key)
+        return self._file_model(path, obj, None)
+
+    def _file_model(
+        self, path: str, obj: Dict[str, Any], body: Optional[bytes]
+    ) -> Dict[str, Any]:
+        """The model of a file from its object and body, None without content."""
+        name = pathlib.Path(path).name
+        if path.endswith(".ipynb"):
             return {
                 "name": name,
                 "path": path,
                 "writable": True,
                 "last_modified": obj["LastModified"],
                 "created": obj["LastModified"],
-                "content": content_s,
-                "format": format_,
-                "mimetype": mimetype,
-                "type": "file",
+                "etag": obj["ETag"].strip('"'),
+                "content": body.decode("utf-8") if body is not None else None,
+                "format": "json",
+                "mimetype": None,
+                "type": "notebook",
             }
+
+        mimetype, _ = mimetypes.guess_type(name)
+        content_s: Any = body
+
+        if mimetype is not None and mimetype.startswith("text/"):
+            format_ = "text"
+        else:
+            format_ = "base64"
+            content_s = (
+                base64.b64encode(body).decode("ascii") if body is not None else None
+            )
+
+        return {
+            "name": name,
+            "path": path,
+            "writable": True,
+            "last_modified": obj["LastModified"],
+            "created": obj["LastModified"],
+            "etag": obj["ETag"].strip('"'),
+            "content": content_s,
+            "format": format_,
+            "mimetype": mimetype,
+            "type": "file",
+        }
+
+    def open_stream(
+        self, path: str, byte_range: Optional[ByteRange] = None
+    ) -> Dict[str, Any]:
+        """Returns the file model with `content` streaming the object body.
+
+        The body is read lazily in chunks, so large files are neither held in
+        memory nor base64 encoded. With a `byte_range` only that part of the
+        object is requested from S3.
+        """
+        name = pathlib.Path(path).name
+        key = str(pathlib.Path(self.prefix) / path)
+        kwargs = {}
+        if byte_range is not None:
+            start, stop = byte_range
+            kwargs["Range"] = (
+                f"bytes={start}"
+                if start < 0
+                else f"bytes={start}-{'' if stop is None else stop - 1}"
+            )
+        try:
+            obj = self.client.get_object(Bucket=self.bucket, Key=key, **kwargs)
+        except ClientError as e:
+            code = e.response["Error"]["Code"]
+            if code in self.not_found_codes:
+                raise TornadoHTTPError(404, e.response["Error"]["Message"])
+            if code == "InvalidRange":
+                size = e.response["Error"].get("ActualObjectSize")
+                raise RangeNotSatisfiable(int(size) if size is not None else None)
+            raise TornadoHTTPError(500, e.response["Error"]["Message"])
+
+        size = obj["ContentLength"]
+        content_range = None
+        if "ContentRange" in obj:
+            # e.g. "bytes 0-99/1234"
+            span, size = obj["ContentRange"].split(" ", 1)[1].split("/")
+            start, last = span.split("-")
+            content_range = (int(start), int(last) + 1)
+            size = int(size)
+
+        return {
+            "name": name,
+            "path": path,
+            "writable": True,
+            "last_modified": obj["LastModified"],
+            "created": obj["LastModified"],
+            "content": ChunkedStream(obj["Body"], chunk_size=self.stream_chunk_size),
+            "content_range": content_range,
+            "etag": obj["ETag"].strip('"'),
+            "format": None,
+            "mimetype": mimetypes.guess_type(name)[0],
+            "size": size,
+            "type": "notebook" if name.endswith(".ipynb") else "file",
+        }
+
+    def get(self, path, content, type=None, **kwargs):
+        """Resolves `path` with as few round trips as possible.
+
+        Paths that look like files are fetched directly and only fall back to a
+        prefix listing when the key does not exist, the resolved kind of each
+        path is remembered so later requests go straight to the right call.
+        """
+        try:
+            kind = self._guess_kind(path, type)
+            if kind == "file":
+                try:
+                    model = self._get_file(path, content)
+                except ClientError as e:
+                    if e.response["Error"]["Code"] not in self.not_found_codes:
+                        raise
+                    if not self.is_folder(path):
+                        raise
+                    model = self._get_directory(path, content)
+            else:
+                model = self._get_directory(path, content)
+                if not model["content"] and not self.is_folder(path):
+                    model = self._get_file(path, content)
+            self._remember_kind(
+                path, "directory" if model["type"] == "directory" else "file"
+            )
+            return model
         except ClientError as e:
-            if e.response["Error"]["Code"] == "NoSuchKey":
+            if e.response["Error"]["Code"] in self.not_found_codes:
+                self._remember_kind(path, None)
                 raise TornadoHTTPError(404, e.response["Error"]["Message"])
             else:
                 raise TornadoHTTPError(500, e.response["Error"]["Message"])
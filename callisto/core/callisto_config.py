@@ -6,6 +6,7 @@ from typing import Union
 from typing import Type
 from typing import Dict
 from typing import Callable
+from typing import List
 from typing import Optional
 from dataclasses import dataclass
 
@@ -23,6 +24,31 @@ class CallistoConfig:
     private_contents_manager_cls: Optional[Union[str, Type[ContentsManager]]] = None
     private_contents_manager_kwargs: Optional[Dict[str, Any]] = None
     private_link_encrypt_key: Optional[bytes] = None
+    listing_cache_ttl: float = 10.0
+    listing_cache_max_entries: int = 1000
+    notebook_cache_max_entries: int = 100
+    notebook_cache_max_bytes: int = 512 * 1024 ** 2
+    notebook_revalidate_interval: float = 0
+    notebook_stale_while_revalidate: float = 0
+    compression_min_size: Optional[int] = 1024
+    render_cache_cls: Optional[Union[str, Type[Any]]] = None
+    render_cache_kwargs: Optional[Dict[str, Any]] = None
+    exporter_options: Optional[Dict[str, Any]] = None
+    output_blob_min_size: Optional[int] = None
+    max_output_size: Optional[int] = None
+    render_lock_directory: Optional[str] = None
+    render_workers: Optional[int] = None
+    render_queue_size: int = 64
+    render_timeout: Optional[float] = 60
+    prerender_interval: Optional[float] = None
+    prerender_prefixes: Optional[List[str]] = None
+    prerender_workers: Optional[int] = None
+    content_index_path: Optional[str] = None
+    content_index_interval: Optional[float] = None
+    content_index_prefixes: Optional[List[str]] = None
+    tree_max_depth: int = 5
+    tree_max_entries: int = 10000
+    tree_workers: int = 8
 
     def __post_init__(self):
         if self.contents_manager_cls is None:
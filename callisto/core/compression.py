@@ -0,0 +1,40 @@
+import gzip
+from typing import List
+from typing import Optional
+
+from werkzeug.datastructures import Accept
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+
+COMPRESSIBLE_MIMETYPES = (
+    "application/javascript",
+    "application/json",
+    "image/svg+xml",
+)
+
+
+def available_encodings() -> List[str]:
+    """Supported content encodings, most preferred first."""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def choose_encoding(accept_encodings: Accept) -> Optional[str]:
+    return accept_encodings.best_match(available_encodings())
+
+
+def is_compressible(mimetype: Optional[str]) -> bool:
+    return mimetype is not None and (
+        mimetype.startswith("text/") or mimetype in COMPRESSIBLE_MIMETYPES
+    )
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=6)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(data, quality=5)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
@@ -0,0 +1,237 @@
+import html
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+
+from werkzeug.exceptions import HTTPException
+
+from callisto.core.notebook_content import NotebookContent
+from callisto.core.prerender import scan_notebooks
+from callisto.core.single_flight import ProcessLock
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notebooks (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    last_modified TEXT
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS sources USING fts5 (
+    name, markdown, code, tokenize = 'unicode61'
+);
+"""
+
+# Private use characters around matches in snippets, replaced by <mark> once
+# the snippet is escaped.
+_MATCH_START = "\ue000"
+_MATCH_END = "\ue001"
+_SNIPPET_TOKENS = 16
+
+
+def extract_sources(notebook: Dict[str, Any]) -> Dict[str, str]:
+    """The markdown and code sources of a parsed notebook, each joined."""
+    sources: Dict[str, List[str]] = {"markdown": [], "code": []}
+    for cell in notebook.get("cells", []):
+        if cell.get("cell_type") in sources:
+            source = cell.get("source", "")
+            if isinstance(source, list):
+                source = "".join(source)
+            sources[cell["cell_type"]].append(source)
+    return {key: "\n\n".join(value) for key, value in sources.items()}
+
+
+def match_query(query: str) -> str:
+    """Turns a search box query into an FTS5 query.
+
+    Every word must match, quoted so FTS5 operators are plain text. Words
+    are not matched as prefixes, a short prefix expands to too many terms.
+    """
+    return " ".join('"{}"'.format(term.replace('"', '""')) for term in query.split())
+
+
+def _snippet(text: str) -> str:
+    escaped = html.escape(text)
+    return escaped.replace(_MATCH_START, "<mark>").replace(_MATCH_END, "</mark>")
+
+
+class ContentIndex:
+    """A full-text index of the markdown and code cells of notebooks.
+
+    Kept in a SQLite FTS5 table, one row per notebook, with the last modified
+    time each notebook was indexed at so only changed notebooks get indexed
+    again.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def indexed(self) -> Dict[str, Optional[str]]:
+        """The last modified time of every indexed notebook, by path."""
+        with self._connect() as db:
+            return dict(db.execute("SELECT path, last_modified FROM notebooks"))
+
+    def update(
+        self, path: str, last_modified: Optional[str], notebook: Dict[str, Any]
+    ) -> None:
+        sources = extract_sources(notebook)
+        with self._connect() as db:
+            self._delete(db, path)
+            rowid = db.execute(
+                "INSERT INTO notebooks (path, last_modified) VALUES (?, ?)",
+                (path, last_modified),
+            ).lastrowid
+            db.execute(
+                "INSERT INTO sources (rowid, name, markdown, code) VALUES (?, ?, ?, ?)",
+                (rowid, path.rpartition("/")[2], sources["markdown"], sources["code"]),
+            )
+
+    def remove(self, path: str) -> None:
+        with self._connect() as db:
+            self._delete(db, path)
+
+    def _delete(self, db: sqlite3.Connection, path: str) -> None:
+        row = db.execute("SELECT id FROM notebooks WHERE path = ?", (path,)).fetchone()
+        if row is not None:
+            db.execute("DELETE FROM sources WHERE rowid = ?", row)
+            db.execute("DELETE FROM notebooks WHERE id = ?", row)
+
+    def search(self, query: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Notebooks matching every word of `query`, best matches first.
+
+        Each result has an html `snippet` of its best matching part, with the
+        matched words in <mark>.
+        """
+        match = match_query(query)
+        if not match:
+            return []
+        with self._connect() as db:
+            try:
+                rows = db.execute(
+                    "SELECT notebooks.path, notebooks.last_modified,"
+                    " snippet(sources, -1, ?, ?, '…', ?)"
+                    " FROM sources JOIN notebooks ON notebooks.id = sources.rowid"
+                    " WHERE sources MATCH ? ORDER BY rank LIMIT ?",
+                    (_MATCH_START, _MATCH_END, _SNIPPET_TOKENS, match, limit),
+                ).fetchall()
+            except sqlite3.OperationalError as e:
+                # e.g. a query without any word, only punctuation
+                logger.debug(f"invalid search `{query}`: {e}")
+                return []
+        return [
+            {
+                "name": path.rpartition("/")[2],
+                "path": path,
+                "last_modified": last_modified,
+                "snippet": _snippet(snippet),
+            }
+            for path, last_modified, snippet in rows
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._connect() as db:
+            notebooks = db.execute("SELECT count(*) FROM notebooks").fetchone()[0]
+        return {"path": self.path, "notebooks": notebooks}
+
+
+class ContentIndexer:
+    """Keeps a ContentIndex up to date with the notebooks under `prefixes`.
+
+    Every run lists the folders under the prefixes, indexes the notebooks
+    whose `last_modified` changed since they were indexed and removes the
+    notebooks that are gone.
+    """
+
+    def __init__(
+        self, loader: Any, index: ContentIndex, prefixes: Optional[List[str]] = None
+    ) -> None:
+        self.loader = loader
+        self.index = index
+        self.prefixes = [prefix.strip("/") for prefix in prefixes or [""]]
+        self._stop = threading.Event()
+
+    def _in_prefixes(self, path: str) -> bool:
+        return any(
+            not prefix or path == prefix or path.startswith(prefix + "/")
+            for prefix in self.prefixes
+        )
+
+    def run_once(self) -> int:
+        """Indexes the notebooks changed since they were last indexed.
+
+        Returns the number of notebooks indexed. Notebooks failing to load are
+        retried on the next run.
+        """
+        indexed = self.index.indexed()
+        seen = set()
+        updated = 0
+        for item in scan_notebooks(self.loader.contents_manager, self.prefixes):
+            path = item["path"]
+            seen.add(path)
+            last_modified = str(item["last_modified"])
+            if indexed.get(path) == last_modified:
+                continue
+            try:
+                notebook = NotebookContent(self.loader, path).dict_content
+            except (HTTPException, ValueError) as e:
+                logger.warning(f"unable to index `{path}`: {e}")
+                continue
+            self.index.update(path, last_modified, notebook)
+            logger.info(f"indexed `{path}`")
+            updated += 1
+        for path in indexed.keys() - seen:
+            if self._in_prefixes(path):
+                self.index.remove(path)
+        return updated
+
+    def run_forever(self, interval: float, lock: Optional[ProcessLock] = None) -> None:
+        """Runs every `interval` seconds until stopped.
+
+        With a `lock`, runs are skipped while another process holds it.
+        """
+        try:
+            while not self._stop.is_set():
+                if lock is None or lock.acquire():
+                    try:
+                        self.run_once()
+                    except Exception:
+                        logger.exception("content indexing failed")
+                self._stop.wait(interval)
+        finally:
+            if lock is not None:
+                lock.release()
+
+    def start(
+        self, interval: float, lock: Optional[ProcessLock] = None
+    ) -> threading.Thread:
+        """Runs `run_forever` in a daemon thread."""
+        thread = threading.Thread(
+            target=self.run_forever, args=(interval, lock), daemon=True
+        )
+        thread.start()
+        return thread
+
+    def stop(self) -> None:
+        self._stop.set()
@@ -1,42 +1,355 @@
 import importlib
-from functools import lru_cache
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from typing import Any
+from typing import ContextManager
 from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Type
+from typing import Union
+from urllib.parse import quote
 
+from jupyter_server.services.contents.filemanager import FileContentsManager
 from jupyter_server.services.contents.manager import ContentsManager
 from tornado.web import HTTPError as TornadoHTTPError
 from werkzeug.exceptions import BadRequest
+from werkzeug.exceptions import HTTPException
 from werkzeug.exceptions import NotFound
+from werkzeug.exceptions import NotImplemented as HTTPNotImplemented
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
 
+from callisto.core.cache import LRUCache
+from callisto.core.content_index import ContentIndex
 from callisto.core.callisto_config import CallistoConfig
+from callisto.core.listing import decode_cursor
+from callisto.core.listing import directories_first
+from callisto.core.listing import encode_cursor
+from callisto.core.listing import list_local_folder
+from callisto.core.listing import list_tree
 from callisto.core.notebook_content import NotebookContent
+from callisto.core.outputs import blob_key
+from callisto.core.outputs import extract_outputs
+from callisto.core.outputs import output_digests
+from callisto.core.outputs import truncate_outputs
+from callisto.core.render_cache import RenderCache
+from callisto.core.renderer import DEFAULT_EXPORTER_OPTIONS
+from callisto.core.renderer import RenderPool
+from callisto.core.single_flight import SingleFlight
+from callisto.core.single_flight import file_lock
+from callisto.core.streaming import ByteRange
+from callisto.core.streaming import open_local_stream
+
+logger = logging.getLogger(__name__)
+
+
+def import_class(cls: Union[str, Type[Any]]) -> Type[Any]:
+    if isinstance(cls, str):
+        module_name, cls_name = cls.rsplit(".", 1)
+        return getattr(importlib.import_module(module_name), cls_name)
+    return cls
+
+
+def to_http_exception(e: TornadoHTTPError) -> HTTPException:
+    if e.status_code == 404:
+        return NotFound()
+    if e.status_code == 416:
+        return RequestedRangeNotSatisfiable(length=getattr(e, "size", None))
+    return BadRequest()
 
 
 class ContentsLoader:
     contents_manager: ContentsManager
+    render_cache: Optional[RenderCache]
+    render_pool: Optional[RenderPool]
+    content_index: Optional[ContentIndex]
+    cache_namespace = "public"
+    output_text_url = "/api/notebook/output-text/"
 
-    def __init__(self, config: CallistoConfig) -> None:
-        if isinstance(config.contents_manager_cls, str):
-            module_name, cls_name = config.contents_manager_cls.rsplit(".", 1)
-            manager_class = getattr(importlib.import_module(module_name), cls_name)
-        else:
-            manager_class = config.contents_manager_cls
-
+    def __init__(
+        self, config: CallistoConfig, render_pool: Optional[RenderPool] = None
+    ) -> None:
+        manager_class = import_class(config.contents_manager_cls)
         self.contents_manager = manager_class(**(config.contents_manager_kwargs or {}))
+        self.listing_cache = LRUCache(
+            config.listing_cache_max_entries, ttl=config.listing_cache_ttl
+        )
+        self.notebook_cache = LRUCache(
+            config.notebook_cache_max_entries,
+            max_bytes=config.notebook_cache_max_bytes,
+            sizeof=lambda nb: nb.nbytes,
+        )
+        self.notebook_revalidate_interval = config.notebook_revalidate_interval
+        self.notebook_stale_while_revalidate = config.notebook_stale_while_revalidate
+        self.render_cache = None
+        if config.render_cache_cls is not None:
+            self.render_cache = import_class(config.render_cache_cls)(
+                **(config.render_cache_kwargs or {})
+            )
+        self.exporter_options = {
+            **DEFAULT_EXPORTER_OPTIONS,
+            **(config.exporter_options or {}),
+        }
+        self.output_blob_min_size = config.output_blob_min_size
+        if self.output_blob_min_size is not None and self.render_cache is None:
+            raise ValueError(
+                "`output_blob_min_size` needs `render_cache_cls` to be configured"
+            )
+        # Settings changing the rendered html, other than the exporter options.
+        self.render_settings: Dict[str, Any] = {}
+        if self.output_blob_min_size is not None:
+            self.render_settings["output_blob_min_size"] = self.output_blob_min_size
+        self.max_output_size = config.max_output_size
+        if self.max_output_size is not None:
+            self.render_settings["max_output_size"] = self.max_output_size
+        self.render_lock_directory = config.render_lock_directory
+        self.single_flight = SingleFlight()
+        self._notebook_lock = threading.Lock()
+        # Loaders of one worker share a pool, to bound its processes.
+        self.render_pool = render_pool
+        if self.render_pool is None and config.render_workers:
+            self.render_pool = RenderPool(
+                max_workers=config.render_workers,
+                max_queue=config.render_queue_size,
+                timeout=config.render_timeout,
+            )
+        self.tree_max_entries = config.tree_max_entries
+        self.tree_executor = ThreadPoolExecutor(
+            max_workers=config.tree_workers, thread_name_prefix="callisto-tree"
+        )
+        self.content_index = None
+        if config.content_index_path:
+            self.content_index = ContentIndex(config.content_index_path)
+        elif config.content_index_interval:
+            raise ValueError(
+                "`content_index_interval` needs `content_index_path` to be configured"
+            )
 
     def get(self, path: str, **kwargs) -> Dict[str, Any]:
         content = kwargs.pop("content", True)
+        cacheable = content and kwargs.get("type") in (None, "directory")
+        if cacheable:
+            cached = self.listing_cache.get(path)
+            if cached is not None:
+                return dict(cached)
+        try:
+            model = self.contents_manager.get(path, content=content, **kwargs)
+        except TornadoHTTPError as e:
+            raise to_http_exception(e)
+        if cacheable and model["type"] == "directory":
+            self.listing_cache.set(path, dict(model))
+        return model
+
+    def list_page(
+        self, path: str, limit: int, cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Lists at most `limit` entries of a folder, directories first.
+
+        `content` of the returned model holds the page and `next_cursor` the
+        cursor of the next one, None after the last page. Contents managers
+        without a `list_folder_page` are listed whole, through the listing
+        cache, and sliced. Paths of files return the file model.
+        """
         try:
-            return self.contents_manager.get(path, content=content, **kwargs)
+            if hasattr(self.contents_manager, "list_folder_page"):
+                return self.contents_manager.list_folder_page(
+                    path, limit, cursor=cursor
+                )
         except TornadoHTTPError as e:
-            if e.status_code == 404:
-                raise NotFound()
-            else:
-                raise BadRequest()
+            raise to_http_exception(e)
+
+        model = self.get(path)
+        if model["type"] != "directory":
+            return model
+        try:
+            offset = decode_cursor(cursor)["offset"] if cursor else 0
+            if not isinstance(offset, int) or offset < 0:
+                raise ValueError(offset)
+        except (KeyError, ValueError) as e:
+            raise BadRequest(f"invalid cursor: {e}")
+        stop = offset + limit
+        content = sorted(model["content"], key=directories_first)
+        model["content"] = content[offset:stop]
+        model["next_cursor"] = (
+            encode_cursor({"offset": stop}) if stop < len(content) else None
+        )
+        return model
+
+    def list_tree(self, path: str, depth: int) -> Dict[str, Any]:
+        """Lists `depth` levels of folders under `path`, directories first.
+
+        Listed directories get their entries as `content`, and `truncated` of
+        the model tells whether `tree_max_entries` stopped the listing early.
+        The folders of a level are listed at once, by the contents manager when
+        it has `list_folders`, over a thread pool otherwise. Paths of files
+        return the file model.
+        """
+        model = self.get(path)
+        if model["type"] != "directory":
+            return model
+        listed = model["content"]
+        list_folders = getattr(self.contents_manager, "list_folders", None)
+
+        def list_level(paths: List[str]) -> List[List[Dict[str, Any]]]:
+            if paths == [path]:
+                return [listed]
+            try:
+                if list_folders is not None:
+                    return list_folders(paths)
+            except TornadoHTTPError as e:
+                raise to_http_exception(e)
+            return list(self.tree_executor.map(self._list_folder, paths))
+
+        model["content"], model["truncated"] = list_tree(
+            list_level, path, depth, self.tree_max_entries
+        )
+        return model
+
+    def _list_folder(self, path: str) -> List[Dict[str, Any]]:
+        try:
+            if isinstance(self.contents_manager, FileContentsManager):
+                return list_local_folder(self.contents_manager, path)
+            if hasattr(self.contents_manager, "list_folder"):
+                return self.contents_manager.list_folder(path)
+            return self.contents_manager.get(path, content=True)["content"]
+        except (OSError, TornadoHTTPError) as e:
+            logger.warning(f"unable to list `{path}`: {e}")
+            return []
+
+    def search(self, query: str, limit: int) -> List[Dict[str, Any]]:
+        """Files and directories whose name contains `query`.
+
+        Only contents managers with a metadata index can search.
+        """
+        search = getattr(self.contents_manager, "search", None)
+        results = search(query, limit=limit) if search is not None else None
+        if results is None:
+            raise HTTPNotImplemented("search needs a contents manager with an index")
+        return results
+
+    def search_content(self, query: str, limit: int) -> List[Dict[str, Any]]:
+        """Notebooks whose markdown or code cells contain every word of `query`."""
+        if self.content_index is None:
+            raise HTTPNotImplemented(
+                "search needs `content_index_path` to be configured"
+            )
+        return self.content_index.search(query, limit=limit)
+
+    def invalidate_listing(self, path: str) -> None:
+        self.listing_cache.pop(path)
+        invalidate = getattr(self.contents_manager, "invalidate", None)
+        if invalidate is not None:
+            invalidate(path)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        stats = {
+            "listing": self.listing_cache.stats(),
+            "notebook": self.notebook_cache.stats(),
+        }
+        if self.render_cache is not None:
+            stats["render"] = self.render_cache.stats()
+        if self.render_pool is not None:
+            stats["render_pool"] = self.render_pool.stats()
+        if self.content_index is not None:
+            stats["content_index"] = self.content_index.stats()
+        return stats
+
+    def open_stream(
+        self, path: str, byte_range: Optional[ByteRange] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Opens a file for streaming, `content` of the model yields bytes.
+
+        With a `byte_range` only that part of the file is streamed, and
+        `content_range` of the model holds the absolute `(start, stop)` offsets.
+        Returns None when the contents manager can only load whole files.
+        """
+        try:
+            if hasattr(self.contents_manager, "open_stream"):
+                return self.contents_manager.open_stream(path, byte_range=byte_range)
+            if isinstance(self.contents_manager, FileContentsManager):
+                return open_local_stream(
+                    self.contents_manager, path, byte_range=byte_range
+                )
+        except TornadoHTTPError as e:
+            raise to_http_exception(e)
+        return None
+
+    def prepare_notebook(
+        self, notebook: Dict[str, Any], path: str, first_cell: int = 0
+    ) -> Dict[str, Any]:
+        """Applies the configured output handling before a notebook is rendered.
+
+        `path` is the notebook as requested, `first_cell` the index of the first
+        cell of `notebook` when only a range of cells is rendered. Returns
+        `notebook` itself when there is nothing to change.
+        """
+        if self.output_blob_min_size is not None:
+            notebook = extract_outputs(
+                notebook, self.output_blob_min_size, self.store_output
+            )
+        if self.max_output_size is not None:
+            notebook = truncate_outputs(
+                notebook,
+                self.max_output_size,
+                lambda cell, output: (
+                    f"{self.output_text_url}{quote(path)}?cell={cell}&output={output}"
+                ),
+                first_cell=first_cell,
+            )
+        return notebook
+
+    def store_output(self, digest: str, blob: bytes) -> None:
+        key = blob_key(digest)
+        if self.render_cache is not None and not self.render_cache.touch(key):
+            self.render_cache.set(key, blob)
+
+    def touch_outputs(self, html: str) -> bool:
+        """Keeps the outputs extracted from a cached render in the render cache.
+
+        Browsers cache outputs for good and rarely fetch them again, so they
+        are marked as used along with the html showing them. Returns False
+        when one of them was evicted already, and the html has to be rendered
+        again to store it.
+        """
+        if self.output_blob_min_size is None or self.render_cache is None:
+            return True
+        touched = [
+            self.render_cache.touch(blob_key(digest)) for digest in output_digests(html)
+        ]
+        return all(touched)
+
+    def get_output(self, digest: str) -> Optional[bytes]:
+        if self.render_cache is None:
+            return None
+        return self.render_cache.get(blob_key(digest))
+
+    def render_lock(self, key: str) -> ContextManager[None]:
+        """Keeps other workers from rendering the same notebook version.
+
+        Only when `render_lock_directory` is configured, threads of this worker
+        are already coordinated by `single_flight`.
+        """
+        if self.render_lock_directory is None:
+            return nullcontext()
+        return file_lock(self.render_lock_directory, key)
 
     def info(self, path: str) -> Dict[str, Any]:
         return self.get(path, content=False)
 
-    @lru_cache(10)
-    def get_nb(self, path):
-        return NotebookContent(self, path)
+    def get_nb(self, path: str) -> NotebookContent:
+        # Notebooks grow once they are rendered, re-weigh the cache so that
+        # the ones rendered by earlier requests count against the byte limit.
+        self.notebook_cache.evict()
+        with self._notebook_lock:
+            nb = self.notebook_cache.get(path)
+            if nb is None:
+                nb = NotebookContent(
+                    self,
+                    path,
+                    revalidate_interval=self.notebook_revalidate_interval,
+                    stale_while_revalidate=self.notebook_stale_while_revalidate,
+                )
+                self.notebook_cache.set(path, nb)
+        return nb
@@ -0,0 +1,126 @@
+import base64
+import datetime
+import json
+import mimetypes
+import os
+import stat
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+# Largest page of a folder listing a client can ask for.
+MAX_PAGE_SIZE = 1000
+
+
+def directories_first(item: Dict[str, Any]) -> Tuple[bool, str]:
+    """Sort key listing directories before files, each by name."""
+    return item["type"] != "directory", item["name"]
+
+
+def encode_cursor(state: Dict[str, Any]) -> str:
+    """Turns where a paginated listing stopped into an opaque, url safe cursor."""
+    data = json.dumps(state, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Reverses `encode_cursor`, raises ValueError for an invalid cursor."""
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid cursor `{cursor}`")
+    if not isinstance(state, dict):
+        raise ValueError(f"invalid cursor `{cursor}`")
+    return state
+
+
+def list_tree(
+    list_folders: Callable[[List[str]], List[List[Dict[str, Any]]]],
+    path: str,
+    depth: int,
+    max_entries: Optional[int] = None,
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """Lists `depth` levels of folders under `path`, directories first.
+
+    `list_folders` lists several folders at once, returning their entries in
+    the same order, so every folder of a level can be listed concurrently.
+    Listed directories get their entries as `content`, the ones of the last
+    level keep None. Stops before going over `max_entries` entries, and
+    returns whether it did along with the entries of `path`.
+    """
+    tree: List[Dict[str, Any]] = []
+    level: List[Tuple[str, Optional[Dict[str, Any]]]] = [(path, None)]
+    count = 0
+    for _ in range(depth):
+        if not level:
+            break
+        listings = list_folders([folder for folder, _ in level])
+        next_level = []
+        for (_, directory), items in zip(level, listings):
+            if max_entries is not None and count + len(items) > max_entries:
+                return tree, True
+            count += len(items)
+            # Copies, listings may be cached.
+            items = sorted((dict(item) for item in items), key=directories_first)
+            if directory is None:
+                tree = items
+            else:
+                directory["content"] = items
+            next_level += [
+                (item["path"], item) for item in items if item["type"] == "directory"
+            ]
+        level = next_level
+    return tree, False
+
+
+def list_local_folder(manager: Any, path: str) -> List[Dict[str, Any]]:
+    """The entries of a FileContentsManager folder, from one `os.scandir`.
+
+    The same entries as the manager lists, without the extra lookups it does
+    for every one of them. Checking the folder itself is left to the caller.
+    """
+    path = path.strip("/")
+    os_dir = manager._get_os_path(path)
+    items = []
+    with os.scandir(os_dir) as entries:
+        for entry in entries:
+            name = entry.name
+            if not manager.should_list(name) or (
+                not manager.allow_hidden and name.startswith(".")
+            ):
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                # e.g. a broken symlink
+                continue
+            if stat.S_ISDIR(st.st_mode):
+                type_ = "directory"
+            elif stat.S_ISREG(st.st_mode):
+                type_ = "notebook" if name.endswith(".ipynb") else "file"
+            else:
+                continue
+            items.append(
+                {
+                    "name": name,
+                    "path": f"{path}/{name}" if path else name,
+                    "last_modified": datetime.datetime.fromtimestamp(
+                        st.st_mtime, tz=datetime.timezone.utc
+                    ),
+                    "created": datetime.datetime.fromtimestamp(
+                        st.st_ctime, tz=datetime.timezone.utc
+                    ),
+                    "content": None,
+                    "format": None,
+                    "mimetype": (
+                        mimetypes.guess_type(name)[0] if type_ == "file" else None
+                    ),
+                    "size": st.st_size if type_ != "directory" else None,
+                    "writable": os.access(entry.path, os.W_OK),
+                    "type": type_,
+                }
+            )
+    return items
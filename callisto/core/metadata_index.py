@@ -0,0 +1,257 @@
+import datetime
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    path TEXT PRIMARY KEY,
+    parent TEXT NOT NULL,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    last_modified TEXT,
+    etag TEXT
+);
+CREATE INDEX IF NOT EXISTS entries_parent ON entries (parent, type, name);
+CREATE TABLE IF NOT EXISTS folders (
+    path TEXT PRIMARY KEY,
+    listed_at REAL NOT NULL
+);
+"""
+
+# Sorts after every path, to select a whole tree with a range.
+_LAST_PATH = "\U0010ffff"
+
+Row = Tuple[str, str, str, str, Optional[str], Optional[str]]
+
+
+def _subtree(path: str) -> Tuple[str, str]:
+    """Bounds of the paths under `path`, `path` itself excluded."""
+    if not path:
+        return "", _LAST_PATH
+    # "0" is the character after "/".
+    return path + "/", path + "0"
+
+
+def _parent(path: str) -> str:
+    return path.rpartition("/")[0]
+
+
+def _row(item: Dict[str, Any]) -> Row:
+    last_modified = item.get("last_modified")
+    if isinstance(last_modified, datetime.datetime):
+        last_modified = last_modified.isoformat()
+    path = item["path"].strip("/")
+    return (
+        path,
+        _parent(path),
+        item["name"],
+        item["type"],
+        last_modified,
+        item.get("etag"),
+    )
+
+
+def _item(row: Row) -> Dict[str, Any]:
+    path, _, name, type_, last_modified, etag = row
+    modified = (
+        datetime.datetime.fromisoformat(last_modified)
+        if last_modified is not None
+        else None
+    )
+    item = {
+        "name": name,
+        "path": path,
+        "writable": True,
+        "last_modified": modified,
+        "created": modified,
+        "content": None,
+        "format": None,
+        "mimetype": None,
+        "type": type_,
+    }
+    if etag is not None:
+        item["etag"] = etag
+    return item
+
+
+class MetadataIndex:
+    """A SQLite index of the folder listings of a contents manager.
+
+    Entries are the models of `list_folder`. A folder is served from the index
+    once it has been synced, alone with `sync_folder` or with its whole tree
+    with `sync_tree`, and until its listing is older than the `max_age` asked
+    for. Every operation opens its own connection, so an index can be shared
+    by threads and processes.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as db:
+            # Readers are not blocked while a crawl writes.
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def list_folder(
+        self,
+        path: str,
+        max_age: Optional[float] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Entries of a folder, directories first, each by name.
+
+        Returns None when the folder is not in the index, or was listed more
+        than `max_age` seconds ago.
+        """
+        path = path.strip("/")
+        with self._connect() as db:
+            listed = db.execute(
+                "SELECT listed_at FROM folders WHERE path = ?", (path,)
+            ).fetchone()
+            if listed is None or (
+                max_age is not None and time.time() - listed[0] > max_age
+            ):
+                return None
+            rows = db.execute(
+                "SELECT * FROM entries WHERE parent = ?"
+                " ORDER BY type != 'directory', name LIMIT ? OFFSET ?",
+                (path, -1 if limit is None else limit, offset),
+            )
+            return [_item(row) for row in rows]
+
+    def invalidate(self, path: str) -> None:
+        """Drops the listing of a folder, so it is listed again on the next read."""
+        with self._connect() as db:
+            db.execute("DELETE FROM folders WHERE path = ?", (path.strip("/"),))
+
+    def search(self, query: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Entries whose name contains `query`, case insensitively.
+
+        Exact matches come first, then names starting with `query`, then the
+        shallowest paths.
+        """
+        escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT * FROM entries WHERE name LIKE ? ESCAPE '\\'"
+                " ORDER BY name NOT LIKE ? ESCAPE '\\', name NOT LIKE ? ESCAPE '\\',"
+                " length(path) - length(replace(path, '/', '')), path LIMIT ?",
+                (f"%{escaped}%", escaped, f"{escaped}%", limit),
+            )
+            return [_item(row) for row in rows]
+
+    def sync_folder(self, path: str, items: Iterable[Dict[str, Any]]) -> None:
+        """Replaces the entries of a folder with the `items` listed in it.
+
+        The trees of directories that are not listed anymore are removed.
+        """
+        path = path.strip("/")
+        rows = {row[0]: row for row in map(_row, items)}
+        with self._connect() as db:
+            existing = {
+                row[0]: row
+                for row in db.execute("SELECT * FROM entries WHERE parent = ?", (path,))
+            }
+            for gone in existing.keys() - rows.keys():
+                self._delete(db, gone, tree=existing[gone][3] == "directory")
+            self._upsert(db, rows, existing)
+            if rows or not path:
+                db.execute(
+                    "INSERT OR REPLACE INTO folders VALUES (?, ?)", (path, time.time())
+                )
+            else:
+                db.execute("DELETE FROM folders WHERE path = ?", (path,))
+
+    def sync_tree(self, path: str, items: Iterable[Dict[str, Any]]) -> int:
+        """Replaces the whole tree under `path` with `items`.
+
+        `items` are every file and directory under `path`, as listed by a
+        crawl. Only entries that changed are written. Returns the number of
+        entries in the tree.
+        """
+        path = path.strip("/")
+        rows = {row[0]: row for row in map(_row, items)}
+        lower, upper = _subtree(path)
+        now = time.time()
+        with self._connect() as db:
+            existing = {
+                row[0]: row
+                for row in db.execute(
+                    "SELECT * FROM entries WHERE path >= ? AND path < ?", (lower, upper)
+                )
+            }
+            db.executemany(
+                "DELETE FROM entries WHERE path = ?",
+                [(gone,) for gone in existing.keys() - rows.keys()],
+            )
+            self._upsert(db, rows, existing)
+            db.execute(
+                "DELETE FROM folders WHERE path >= ? AND path < ?", (lower, upper)
+            )
+            folders = [p for p, row in rows.items() if row[3] == "directory"]
+            db.executemany(
+                "INSERT OR REPLACE INTO folders VALUES (?, ?)",
+                [(folder, now) for folder in folders + [path]],
+            )
+            if path and rows:
+                # The folder and its parents, as entries of their parents.
+                parts = path.split("/")
+                db.executemany(
+                    "INSERT OR IGNORE INTO entries"
+                    " VALUES (?, ?, ?, 'directory', NULL, NULL)",
+                    [
+                        ("/".join(parts[:i]), "/".join(parts[: i - 1]), parts[i - 1])
+                        for i in range(1, len(parts) + 1)
+                    ],
+                )
+            elif path:
+                self._delete(db, path, tree=False)
+                db.execute("DELETE FROM folders WHERE path = ?", (path,))
+        return len(rows)
+
+    def _upsert(
+        self, db: sqlite3.Connection, rows: Dict[str, Row], existing: Dict[str, Row]
+    ) -> None:
+        db.executemany(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+            [row for path, row in rows.items() if existing.get(path) != row],
+        )
+
+    def _delete(self, db: sqlite3.Connection, path: str, tree: bool) -> None:
+        db.execute("DELETE FROM entries WHERE path = ?", (path,))
+        if tree:
+            lower, upper = _subtree(path)
+            db.execute(
+                "DELETE FROM entries WHERE path >= ? AND path < ?", (lower, upper)
+            )
+            db.execute(
+                "DELETE FROM folders WHERE path = ? OR path >= ? AND path < ?",
+                (path, lower, upper),
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._connect() as db:
+            entries = db.execute("SELECT count(*) FROM entries").fetchone()[0]
+            folders = db.execute("SELECT count(*) FROM folders").fetchone()[0]
+        return {"path": self.path, "entries": entries, "folders": folders}
@@ -1,82 +1,414 @@
-import json
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from dataclasses import field
 from typing import Any
+from typing import Callable
 from typing import Dict
 from typing import List
 from typing import Optional
+from typing import Tuple
+from typing import Union
 
-import nbformat
-from bs4 import BeautifulSoup
-from cssutils import parseStyle
-from nbconvert.exporters import HTMLExporter
-
+from callisto.core.cache import deep_sizeof
+from callisto.core.compression import compress
+from callisto.core.notebook_json import dumps
+from callisto.core.notebook_json import parse_notebook
+from callisto.core.outputs import output_text
+from callisto.core.render_cache import make_cache_key
+from callisto.core.renderer import RENDER_VERSION
+from callisto.core.renderer import render_notebook
 from callisto.core.toc import TocNode
+from callisto.core.toc import extract_headings
+
+
+def render_key(
+    namespace: str,
+    path: str,
+    last_modified: Any,
+    etag: Any,
+    exporter_options: Dict[str, Any],
+    **settings: Any,
+) -> str:
+    """The render cache key of one version of a notebook.
+
+    `settings` are any other settings changing the rendered html.
+    """
+    return make_cache_key(
+        namespace=namespace,
+        path=path,
+        last_modified=last_modified,
+        etag=etag,
+        exporter=exporter_options,
+        version=RENDER_VERSION,
+        **settings,
+    )
+
+
+# Cells the notebook view loads at a time, `CELLS_PER_PAGE` of NotebookView.vue.
+CELLS_PER_PAGE = 30
+
+
+def cells_key(key: str, start: int, stop: int, fragment: bool = False) -> str:
+    """The render cache key of the cells `start` to `stop` of a render `key`."""
+    return f"{key}.cells-{start}-{stop}{'.fragment' if fragment else ''}"
+
+
+@dataclass
+class _NotebookVersion:
+    """One fetched version of a notebook, and what was built from it.
+
+    A new fetch replaces the whole version, so a render that started on an
+    older version never mixes with, or ends up cached for, the new one.
+    """
+
+    content: Union[str, bytes]
+    last_modified: Any
+    etag: Optional[str]
+    model_path: str
+    dict_content: Optional[Dict[str, Any]] = None
+    dict_nbytes: int = 0
+    html_content: Optional[str] = None
+    toc: Optional[List[Any]] = None
+    compressed_html: Dict[str, bytes] = field(default_factory=dict)
+    cells_html: Dict[str, str] = field(default_factory=dict)
 
 
 class NotebookContent:
 
-    _last_modified: Optional[str] = None
-    _content: Optional[str] = None
-    _dict_content: Optional[Dict[str, Any]] = None
-    _html_content: Optional[str] = None
+    _version: Optional[_NotebookVersion] = None
     path: str
     loader: Any
 
-    def __init__(self, loader: Any, path: str) -> None:
+    def __init__(
+        self,
+        loader: Any,
+        path: str,
+        revalidate_interval: float = 0,
+        stale_while_revalidate: float = 0,
+    ) -> None:
         self.path = path
         self.loader = loader
+        self.revalidate_interval = revalidate_interval
+        self.stale_while_revalidate = stale_while_revalidate
+        self._checked_at: float = 0
+        self._revalidate_lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
 
-    @property
-    def content(self) -> Optional[str]:
-        def fetch() -> None:
-            content = self.loader.get(self.path, type="file")
-            self._content = content["content"]
-            self._last_modified = content["last_modified"]
-            self._dict_content = None
-            self._html_content = None
-
-        if self._content is None:
-            fetch()
+    def _fetch(self) -> None:
+        """Loads the current version, to be called with `_fetch_lock` held."""
+        # Streamed files are read as bytes, skipping a decoded copy of the json.
+        model = self.loader.open_stream(self.path)
+        if model is None:
+            model = self.loader.get(self.path, type="file")
+            content = model["content"]
+        else:
+            content = model["content"].read()
+        self._version = _NotebookVersion(
+            content=content,
+            last_modified=model["last_modified"],
+            etag=model.get("etag"),
+            model_path=model.get("path", self.path),
+        )
+        self._checked_at = time.monotonic()
 
+    def _revalidate(self) -> None:
         new_info = self.loader.info(self.path)
+        self._checked_at = time.monotonic()
         if new_info["last_modified"] != self._last_modified:
-            fetch()
+            self._fetch()
+
+    def _background_revalidate(self) -> None:
+        try:
+            with self._fetch_lock:
+                self._revalidate()
+        finally:
+            self._revalidate_lock.release()
+
+    def refresh(self) -> None:
+        """Makes sure the loaded notebook is up to date.
+
+        The backend is trusted for `revalidate_interval` seconds after the last
+        check. For another `stale_while_revalidate` seconds the loaded version is
+        still served while it gets checked in a background thread. Concurrent
+        callers share a single check.
+        """
+        started = time.monotonic()
+        if self._version is not None:
+            age = started - self._checked_at
+            if age < self.revalidate_interval:
+                return
+            if age < self.revalidate_interval + self.stale_while_revalidate:
+                if self._revalidate_lock.acquire(blocking=False):
+                    threading.Thread(
+                        target=self._background_revalidate, daemon=True
+                    ).start()
+                return
+
+        with self._fetch_lock:
+            # Another thread may have checked while this one was waiting.
+            if self._version is None:
+                self._fetch()
+            elif self._checked_at < started:
+                self._revalidate()
+
+    @property
+    def _last_modified(self) -> Any:
+        return self._version.last_modified if self._version is not None else None
+
+    @property
+    def content(self) -> Optional[Union[str, bytes]]:
+        self.refresh()
+        return self._get_version().content
 
-        return self._content
+    def _get_version(self) -> _NotebookVersion:
+        """The loaded version, fetched if nothing was loaded yet."""
+        version = self._version
+        if version is None:
+            self.refresh()
+            version = self._version
+            assert version is not None
+        return version
+
+    def _get_dict_content(self, version: _NotebookVersion) -> Dict[str, Any]:
+        """The notebook parsed once into a NotebookNode of the current nbformat."""
+        if version.dict_content is None:
+            dict_content = parse_notebook(version.content or "")
+            version.dict_nbytes = deep_sizeof(dict_content)
+            version.dict_content = dict_content
+        return version.dict_content
 
     @property
     def dict_content(self) -> Dict[str, Any]:
-        if self._dict_content is None:
-            self._dict_content = json.loads(str(self.content))
-        return self._dict_content
+        self.refresh()
+        return self._get_dict_content(self._get_version())
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the raw, parsed and rendered notebook."""
+        version = self._version
+        if version is None:
+            return 0
+        size = version.dict_nbytes if version.dict_content is not None else 0
+        for value in (version.content, version.html_content):
+            if value is not None:
+                size += sys.getsizeof(value)
+        for compressed in version.compressed_html.values():
+            size += sys.getsizeof(compressed)
+        for html in version.cells_html.values():
+            size += sys.getsizeof(html)
+        return size
+
+    def _render_key(self, version: _NotebookVersion) -> str:
+        return render_key(
+            self.loader.cache_namespace,
+            str(version.model_path),
+            version.last_modified,
+            version.etag,
+            self.loader.exporter_options,
+            **self.loader.render_settings,
+        )
+
+    def _render(self, version: _NotebookVersion) -> str:
+        return self._render_content(
+            version,
+            self._render_key(version),
+            self._get_dict_content(version),
+            self.loader.exporter_options,
+        )
+
+    def _render_content(
+        self,
+        version: _NotebookVersion,
+        key: str,
+        notebook: Dict[str, Any],
+        exporter_options: Dict[str, Any],
+        first_cell: int = 0,
+    ) -> str:
+        prepared = self.loader.prepare_notebook(
+            notebook, self.path, first_cell=first_cell
+        )
+        render_pool = self.loader.render_pool
+        if render_pool is None:
+            return render_notebook(prepared, exporter_options)
+        # Render processes get json, the fetched one when nothing changed.
+        if prepared is version.dict_content:
+            content = version.content or ""
+        else:
+            content = dumps(prepared)
+        return render_pool.render(key, content, exporter_options)
+
+    def version(self) -> Tuple[str, Any]:
+        """Returns an ETag and the last modified time of the current version.
+
+        The ETag also covers the render settings, so it changes whenever the
+        rendered html would.
+        """
+        self.refresh()
+        version = self._get_version()
+        return self._render_key(version), version.last_modified
 
     @property
     def html_content(self) -> str:
-        if self._html_content is None:
-            html_exporter = HTMLExporter()
-            html_exporter.template_name = "classic"
-            notebook_node = nbformat.reads(
-                self.content, as_version=self.dict_content["nbformat"]
+        return self.get_html()
+
+    def get_html(self, refresh: bool = True) -> str:
+        if refresh:
+            self.refresh()
+        return self._get_html(self._get_version())
+
+    def _get_html(self, version: _NotebookVersion) -> str:
+        if version.html_content is None:
+            key = self._render_key(version)
+            version.html_content = self.loader.single_flight.do(
+                key, lambda: self._load_html(key, lambda: self._render(version))
             )
-            html, _ = html_exporter.from_notebook_node(notebook_node)
-            soup = BeautifulSoup(html, "html.parser")
-            for elem in soup.find_all(class_="CodeMirror"):
-                style = parseStyle(elem.get("style", ""))
-                style["overflow-x"] = "auto"
-                elem["style"] = style.cssText
-            self._html_content = str(soup)
-        return self._html_content
-
-    def toc(self) -> List[Any]:
-        soup = BeautifulSoup(self.html_content, "html.parser")
-        headings: List[TocNode] = [
-            TocNode(
-                int(item.name.replace("h", "")),
-                item.contents[0].text,
-                item["id"],
+        return version.html_content
+
+    def _load_html(self, key: str, render: Callable[[], str]) -> str:
+        render_cache = self.loader.render_cache
+        if render_cache is None:
+            return render()
+        html = self._cached_html(key)
+        if html is None:
+            with self.loader.render_lock(key):
+                # Another worker may have rendered it while this one was waiting.
+                html = self._cached_html(key)
+                if html is None:
+                    html = render()
+                    render_cache.set(key, html.encode("utf-8"))
+        return html
+
+    def _cached_html(self, key: str) -> Optional[str]:
+        """The html in the render cache, unless outputs it shows were evicted."""
+        cached = self.loader.render_cache.get(key)
+        if cached is None:
+            return None
+        html = cached.decode("utf-8")
+        return html if self.loader.touch_outputs(html) else None
+
+    def cell_count(self, refresh: bool = True) -> int:
+        if refresh:
+            self.refresh()
+        return len(self._get_dict_content(self._get_version())["cells"])
+
+    def get_cells_html(
+        self, start: int, stop: int, fragment: bool = False, refresh: bool = True
+    ) -> str:
+        """Renders the cells `start` to `stop` (excluded) of the notebook.
+
+        The result is a document of its own, or with `fragment` only the markup
+        of the cells, to be added to a document rendered from earlier cells.
+        A document of every cell is the rendered notebook itself, other ranges
+        are kept in memory next to it and in the render cache.
+        """
+        if refresh:
+            self.refresh()
+        return self._get_cells_html(self._get_version(), start, stop, fragment)[1]
+
+    def _get_cells_html(
+        self, version: _NotebookVersion, start: int, stop: int, fragment: bool
+    ) -> Tuple[str, str]:
+        """The render cache key and html of a range of cells."""
+        notebook = self._get_dict_content(version)
+        if not fragment and start == 0 and stop >= len(notebook["cells"]):
+            return self._render_key(version), self._get_html(version)
+        key = cells_key(self._render_key(version), start, stop, fragment)
+        if key not in version.cells_html:
+            exporter_options = self.loader.exporter_options
+            if fragment:
+                exporter_options = {
+                    **exporter_options,
+                    "template_file": "base.html.j2",
+                }
+
+            def render() -> str:
+                cells = {**notebook, "cells": notebook["cells"][start:stop]}
+                return self._render_content(
+                    version, key, cells, exporter_options, first_cell=start
+                )
+
+            version.cells_html[key] = self.loader.single_flight.do(
+                key, lambda: self._load_html(key, render)
+            )
+        return key, version.cells_html[key]
+
+    def get_output_text(
+        self, cell: int, output: int, refresh: bool = True
+    ) -> Optional[Tuple[str, str]]:
+        """The full text and mimetype of an output, None if there is no such output.
+
+        Used to show outputs truncated in the rendered html.
+        """
+        if refresh:
+            self.refresh()
+        cells = self._get_dict_content(self._get_version())["cells"]
+        if not 0 <= cell < len(cells):
+            return None
+        outputs = cells[cell].get("outputs", [])
+        if not 0 <= output < len(outputs):
+            return None
+        return output_text(outputs[output])
+
+    def get_compressed_html(self, encoding: str, refresh: bool = True) -> bytes:
+        """Returns the rendered html compressed with `encoding`.
+
+        Compressed variants are kept next to the html, in memory and in the
+        render cache, so a notebook version is compressed only once.
+        """
+        if refresh:
+            self.refresh()
+        version = self._get_version()
+        return self._get_compressed(
+            version, self._render_key(version), self._get_html(version), encoding
+        )
+
+    def get_compressed_cells_html(
+        self,
+        start: int,
+        stop: int,
+        encoding: str,
+        fragment: bool = False,
+        refresh: bool = True,
+    ) -> bytes:
+        """Returns `get_cells_html` compressed with `encoding`, kept the same way."""
+        if refresh:
+            self.refresh()
+        version = self._get_version()
+        key, html = self._get_cells_html(version, start, stop, fragment)
+        return self._get_compressed(version, key, html, encoding)
+
+    def _get_compressed(
+        self, version: _NotebookVersion, key: str, html: str, encoding: str
+    ) -> bytes:
+        key = f"{key}.{encoding}"
+        if key not in version.compressed_html:
+            version.compressed_html[key] = self.loader.single_flight.do(
+                key, lambda: self._load_compressed_html(key, html, encoding)
+            )
+        return version.compressed_html[key]
+
+    def _load_compressed_html(self, key: str, html: str, encoding: str) -> bytes:
+        render_cache = self.loader.render_cache
+        compressed = render_cache.get(key) if render_cache is not None else None
+        if compressed is None:
+            compressed = compress(html.encode("utf-8"), encoding)
+            if render_cache is not None:
+                render_cache.set(key, compressed)
+        return compressed
+
+    def toc(self, refresh: bool = True) -> List[Any]:
+        if refresh:
+            self.refresh()
+        version = self._get_version()
+        if version.toc is None:
+            version.toc = self._build_toc(
+                extract_headings(self._get_dict_content(version))
             )
-            for item in soup.find_all(["h1", "h2", "h3", "h4", "h5"])
-        ]
+        return version.toc
 
+    def _build_toc(self, headings: List[TocNode]) -> List[Any]:
         tree = []
         prev = None
         for h in headings:
@@ -0,0 +1,47 @@
+import json
+from typing import Any
+from typing import Dict
+from typing import Union
+
+import nbformat
+from nbformat import NotebookNode
+from nbformat.reader import get_version
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """Decodes json, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(value: Any) -> bytes:
+    """Encodes json as utf-8, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value).encode("utf-8")
+
+
+def parse_notebook(data: Union[str, bytes]) -> NotebookNode:
+    """Parses the json of a notebook, decoding it only once."""
+    return to_notebook_node(loads(data))
+
+
+def to_notebook_node(notebook: Dict[str, Any]) -> NotebookNode:
+    """Turns a decoded notebook into a NotebookNode of the current nbformat.
+
+    Like `nbformat.reads` without the json parsing, multiline strings are
+    joined and older formats converted. The notebook itself is not modified.
+    """
+    major, minor = get_version(notebook)
+    if major not in nbformat.versions:
+        raise nbformat.NBFormatError(f"Unsupported nbformat version {major}")
+    node = nbformat.versions[major].to_notebook_json(notebook, minor=minor)
+    if major != nbformat.current_nbformat:
+        node = nbformat.convert(node, nbformat.current_nbformat)
+    return node
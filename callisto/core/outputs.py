@@ -0,0 +1,181 @@
+import base64
+import hashlib
+import re
+from html import escape
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Optional
+from typing import Set
+from typing import Tuple
+
+OUTPUT_URL_PREFIX = "/api/notebook/output/"
+# Images are stored base64 encoded in notebooks.
+BLOB_MIMETYPES = {"image/png": "png", "image/jpeg": "jpg", "image/gif": "gif"}
+BLOB_NAME_PATTERN = re.compile(r"^([0-9a-f]{64})\.(png|jpg|gif)$")
+# How rendered html refers to extracted outputs, see `lazy_load_outputs`.
+OUTPUT_SRC_PATTERN = re.compile(
+    ' loading="lazy" src="' + re.escape(OUTPUT_URL_PREFIX) + r"([0-9a-f]{64})\."
+)
+# Text representations of outputs, in the order a full output is served.
+TEXT_MIMETYPES = ("text/html", "text/markdown", "text/plain")
+
+
+def blob_key(digest: str) -> str:
+    """The render cache key of an extracted output."""
+    return f"{digest}.output"
+
+
+def extract_outputs(
+    notebook: Dict[str, Any],
+    min_size: int,
+    store: Callable[[str, bytes], None],
+) -> Dict[str, Any]:
+    """Moves images of at least `min_size` bytes out of the notebook.
+
+    Each image is passed to `store` with the sha256 of its bytes, and the
+    output refers to it by url instead of embedding it. The notebook itself is
+    not modified, changed cells and outputs are copies.
+    """
+    cells = []
+    for cell in notebook["cells"]:
+        outputs = cell.get("outputs")
+        if outputs:
+            cell = {
+                **cell,
+                "outputs": [_extract_output(o, min_size, store) for o in outputs],
+            }
+        cells.append(cell)
+    return {**notebook, "cells": cells}
+
+
+def _extract_output(
+    output: Dict[str, Any], min_size: int, store: Callable[[str, bytes], None]
+) -> Dict[str, Any]:
+    data = output.get("data")
+    if not data:
+        return output
+    filenames = {}
+    for mimetype, extension in BLOB_MIMETYPES.items():
+        encoded = _join(data.get(mimetype))
+        # Decoded size is 3/4 of the base64 size.
+        if encoded is None or len(encoded) * 3 // 4 < min_size:
+            continue
+        blob = base64.b64decode(encoded)
+        digest = hashlib.sha256(blob).hexdigest()
+        store(digest, blob)
+        filenames[mimetype] = f"{OUTPUT_URL_PREFIX}{digest}.{extension}"
+    if not filenames:
+        return output
+    metadata = output.get("metadata", {})
+    return {
+        **output,
+        # The template still picks the output by its mimetype, the data itself
+        # is not needed anymore.
+        "data": {**data, **{mimetype: "" for mimetype in filenames}},
+        "metadata": {
+            **metadata,
+            "filenames": {**metadata.get("filenames", {}), **filenames},
+        },
+    }
+
+
+def _join(value: Optional[Any]) -> Optional[str]:
+    if isinstance(value, list):
+        return "".join(value)
+    return value
+
+
+def lazy_load_outputs(html: str) -> str:
+    """Lets the browser load extracted images once they are scrolled to."""
+    return html.replace(
+        f' src="{OUTPUT_URL_PREFIX}', f' loading="lazy" src="{OUTPUT_URL_PREFIX}'
+    )
+
+
+def output_digests(html: str) -> Set[str]:
+    """The digests of the extracted outputs a rendered notebook shows."""
+    return set(OUTPUT_SRC_PATTERN.findall(html))
+
+
+def output_text(output: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    """Returns the text of an output and its mimetype, html when there is some."""
+    if output.get("output_type") == "stream":
+        return _join(output.get("text")) or "", "text/plain"
+    data = output.get("data") or {}
+    for mimetype in TEXT_MIMETYPES:
+        if mimetype in data:
+            return _join(data[mimetype]), mimetype
+    return None
+
+
+def truncate_outputs(
+    notebook: Dict[str, Any],
+    max_size: int,
+    full_output_url: Callable[[int, int], str],
+    first_cell: int = 0,
+) -> Dict[str, Any]:
+    """Cuts text outputs longer than `max_size` characters.
+
+    A truncated output is followed by a link to `full_output_url(cell, output)`,
+    where `cell` counts from `first_cell`. The notebook itself is not modified.
+    """
+    cells = []
+    for i, cell in enumerate(notebook["cells"]):
+        outputs = cell.get("outputs")
+        if outputs and any(_text_size(o) > max_size for o in outputs):
+            truncated = []
+            for j, output in enumerate(outputs):
+                size = _text_size(output)
+                if size <= max_size:
+                    truncated.append(output)
+                    continue
+                url = full_output_url(first_cell + i, j)
+                truncated.append(_truncate_output(output, max_size))
+                truncated.append(_full_output_link(url, size))
+            cell = {**cell, "outputs": truncated}
+        cells.append(cell)
+    return {**notebook, "cells": cells}
+
+
+def _text_size(output: Dict[str, Any]) -> int:
+    if output.get("output_type") == "stream":
+        return len(_join(output.get("text")) or "")
+    data = output.get("data") or {}
+    return max(
+        (len(_join(data[m]) or "") for m in TEXT_MIMETYPES if m in data), default=0
+    )
+
+
+def _truncate_output(output: Dict[str, Any], max_size: int) -> Dict[str, Any]:
+    if output.get("output_type") == "stream":
+        return {**output, "text": _join(output["text"])[:max_size]}
+    # Cutting html or markdown could break it, keep the beginning of its plain
+    # text instead, or of its source when it has none.
+    data = output["data"]
+    if "text/plain" in data:
+        text = _join(data["text/plain"])
+    else:
+        text, _ = output_text(output) or ("", "")
+    return {**output, "data": {"text/plain": text[:max_size]}}
+
+
+def _full_output_link(url: str, size: int) -> Dict[str, Any]:
+    return {
+        "output_type": "display_data",
+        "metadata": {},
+        "data": {
+            "text/html": (
+                f'<a class="callisto-full-output" href="{escape(url)}" '
+                f'target="_blank">Show full output ({_format_size(size)})</a>'
+            )
+        },
+    }
+
+
+def _format_size(size: int) -> str:
+    if size >= 1000 ** 2:
+        return f"{size / 1000 ** 2:.1f}M characters"
+    if size >= 1000:
+        return f"{size / 1000:.0f}K characters"
+    return f"{size} characters"
@@ -0,0 +1,209 @@
+import logging
+import threading
+from concurrent.futures import ALL_COMPLETED
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import wait
+from typing import Any
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from tornado.web import HTTPError as TornadoHTTPError
+from werkzeug.exceptions import HTTPException
+
+from callisto.core.callisto_config import CallistoConfig
+from callisto.core.notebook_content import CELLS_PER_PAGE
+from callisto.core.notebook_content import cells_key
+from callisto.core.notebook_content import render_key
+from callisto.core.notebook_json import dumps
+from callisto.core.notebook_json import parse_notebook
+from callisto.core.renderer import render_notebook
+from callisto.core.single_flight import ProcessLock
+from callisto.core.single_flight import job_lock
+
+logger = logging.getLogger(__name__)
+
+
+def scan_notebooks(
+    contents_manager: Any, prefixes: List[str]
+) -> Iterator[Dict[str, Any]]:
+    """Yields the listed model of every notebook under the prefixes."""
+    pending = list(prefixes)
+    while pending:
+        path = pending.pop()
+        try:
+            model = contents_manager.get(path, content=True)
+        except TornadoHTTPError as e:
+            logger.warning(f"unable to list `{path}`: {e}")
+            continue
+        if model["type"] != "directory":
+            continue
+        for item in model["content"]:
+            if item["type"] == "directory":
+                pending.append(item["path"])
+            elif item["type"] == "notebook" or item["name"].endswith(".ipynb"):
+                yield item
+
+
+def prerender_lock(
+    config: CallistoConfig, prefixes: Optional[List[str]] = None
+) -> ProcessLock:
+    """The lock of the prerenderers of `prefixes` sharing a render cache."""
+    return job_lock(
+        "prerender",
+        render_cache_cls=config.render_cache_cls,
+        render_cache_kwargs=config.render_cache_kwargs,
+        prefixes=prefixes,
+    )
+
+
+class Prerenderer:
+    """Renders notebooks into the render cache before anyone asks for them.
+
+    Every run lists the folders under `prefixes` and renders the notebooks
+    whose `last_modified` changed since the previous run in a process pool.
+    What the notebook view asks for first is rendered: the first page of
+    cells, or the whole notebook when it fits in one. Notebooks already in the
+    render cache, e.g. rendered by a web worker, are skipped.
+    """
+
+    def __init__(
+        self,
+        loader: Any,
+        prefixes: Optional[List[str]] = None,
+        max_workers: Optional[int] = None,
+    ) -> None:
+        if loader.render_cache is None:
+            raise ValueError("prerendering needs `render_cache_cls` to be configured")
+        self.loader = loader
+        self.prefixes = prefixes or [""]
+        self.max_workers = max_workers
+        self._seen: Dict[str, Any] = {}
+        self._stop = threading.Event()
+
+    def scan(self) -> Iterator[Dict[str, Any]]:
+        """Yields the listed model of every notebook under the prefixes."""
+        return scan_notebooks(self.loader.contents_manager, self.prefixes)
+
+    def changed(self) -> List[Dict[str, Any]]:
+        items = list(self.scan())
+        # Forget the notebooks that are gone.
+        listed = {item["path"] for item in items}
+        for path in self._seen.keys() - listed:
+            del self._seen[path]
+        return [
+            item
+            for item in items
+            if self._seen.get(item["path"]) != item["last_modified"]
+        ]
+
+    def run_once(self) -> int:
+        """Renders the notebooks changed since the last run.
+
+        Returns the number of notebooks rendered. Notebooks failing to render
+        are retried on the next run.
+        """
+        notebooks = self.changed()
+        if not notebooks:
+            return 0
+
+        rendered = 0
+        # Bound the notebooks held in memory while waiting for a free process.
+        max_pending = 2 * (self.max_workers or 4)
+        pending: Dict[Future, Tuple[Dict[str, Any], str]] = {}
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            for item in notebooks:
+                if len(pending) >= max_pending:
+                    rendered += self._collect(pending, FIRST_COMPLETED)
+                submitted = self._submit(executor, item)
+                if submitted is not None:
+                    pending[submitted[0]] = (item, submitted[1])
+            rendered += self._collect(pending)
+        return rendered
+
+    def _submit(
+        self, executor: ProcessPoolExecutor, item: Dict[str, Any]
+    ) -> Optional[Tuple[Future, str]]:
+        try:
+            model = self.loader.get(item["path"], type="file")
+        except HTTPException as e:
+            logger.warning(f"unable to load `{item['path']}`: {e}")
+            return None
+        key = render_key(
+            self.loader.cache_namespace,
+            model.get("path", item["path"]),
+            model["last_modified"],
+            model.get("etag"),
+            self.loader.exporter_options,
+            **self.loader.render_settings,
+        )
+        try:
+            notebook = parse_notebook(model["content"])
+        except ValueError as e:
+            logger.warning(f"unable to load `{item['path']}`: {e}")
+            return None
+        if len(notebook["cells"]) > CELLS_PER_PAGE:
+            key = cells_key(key, 0, CELLS_PER_PAGE)
+            notebook = {**notebook, "cells": notebook["cells"][:CELLS_PER_PAGE]}
+        if key in self.loader.render_cache:
+            self._seen[item["path"]] = item["last_modified"]
+            return None
+        content = dumps(self.loader.prepare_notebook(notebook, item["path"]))
+        return (
+            executor.submit(render_notebook, content, self.loader.exporter_options),
+            key,
+        )
+
+    def _collect(
+        self,
+        pending: Dict[Future, Tuple[Dict[str, Any], str]],
+        return_when: str = ALL_COMPLETED,
+    ) -> int:
+        done, _ = wait(list(pending), return_when=return_when)
+        rendered = 0
+        for future in done:
+            item, key = pending.pop(future)
+            try:
+                html = future.result()
+            except Exception:
+                logger.exception(f"unable to render `{item['path']}`")
+                continue
+            self.loader.render_cache.set(key, html.encode("utf-8"))
+            self._seen[item["path"]] = item["last_modified"]
+            logger.info(f"rendered `{item['path']}`")
+            rendered += 1
+        return rendered
+
+    def run_forever(self, interval: float, lock: Optional[ProcessLock] = None) -> None:
+        """Runs every `interval` seconds until stopped.
+
+        With a `lock`, runs are skipped while another process holds it.
+        """
+        try:
+            while not self._stop.is_set():
+                if lock is None or lock.acquire():
+                    try:
+                        self.run_once()
+                    except Exception:
+                        logger.exception("prerendering failed")
+                self._stop.wait(interval)
+        finally:
+            if lock is not None:
+                lock.release()
+
+    def start(
+        self, interval: float, lock: Optional[ProcessLock] = None
+    ) -> threading.Thread:
+        """Runs `run_forever` in a daemon thread."""
+        thread = threading.Thread(
+            target=self.run_forever, args=(interval, lock), daemon=True
+        )
+        thread.start()
+        return thread
+
+    def stop(self) -> None:
+        self._stop.set()
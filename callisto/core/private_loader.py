@@ -1,4 +1,5 @@
 import base64
+import dataclasses
 from typing import Any
 from typing import Dict
 from typing import Optional
@@ -7,20 +8,32 @@ from cryptography.fernet import Fernet
 
 from callisto.core.contents_loader import ContentsLoader
 from callisto.core.callisto_config import CallistoConfig
+from callisto.core.renderer import RenderPool
+from callisto.core.streaming import ByteRange
 
 
 class PrivateLoader(ContentsLoader):
 
     encrypt_key: Optional[bytes]
+    cache_namespace = "private"
+    output_text_url = "/api/notebook/private-output-text/"
 
-    def __init__(self, config: CallistoConfig) -> None:
-        private_config = CallistoConfig(
+    def __init__(
+        self, config: CallistoConfig, render_pool: Optional[RenderPool] = None
+    ) -> None:
+        private_config = dataclasses.replace(
+            config,
             contents_manager_cls=config.private_contents_manager_cls,
             contents_manager_kwargs=getattr(
                 config, "private_contents_manager_kwargs", {}
             ),
+            # Private notebooks must not show up in the content search.
+            content_index_path=None,
+            content_index_interval=None,
+            # Extracted outputs are served to anyone knowing their hash.
+            output_blob_min_size=None,
         )
-        super().__init__(private_config)
+        super().__init__(private_config, render_pool=render_pool)
         if (
             config.private_contents_manager_cls is not None
             and config.private_link_encrypt_key is None
@@ -45,3 +58,8 @@ class PrivateLoader(ContentsLoader):
     def get(self, path: str, **kwargs) -> Dict[str, Any]:
         decrypted_path = self.resolve_path(path)
         return super().get(decrypted_path, **kwargs)
+
+    def open_stream(
+        self, path: str, byte_range: Optional[ByteRange] = None
+    ) -> Optional[Dict[str, Any]]:
+        return super().open_stream(self.resolve_path(path), byte_range=byte_range)
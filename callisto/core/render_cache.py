@@ -0,0 +1,159 @@
+import abc
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any
+from typing import Dict
+from typing import Optional
+
+
+def make_cache_key(**parts: Any) -> str:
+    """Builds a stable key out of everything that changes the rendered output."""
+    serialized = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+class RenderCache(abc.ABC):
+    """A cache of rendered notebooks shared by every worker.
+
+    Implementations must be safe to use from multiple threads and processes,
+    keys are strings usable as file names and values are bytes.
+    """
+
+    @abc.abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        """The value of `key`, None when it is not cached."""
+
+    @abc.abstractmethod
+    def set(self, key: str, value: bytes) -> None:
+        """Stores `value` under `key`, replacing any previous value."""
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def touch(self, key: str) -> bool:
+        """Marks an entry as recently used, returns whether it exists."""
+        return key in self
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class LocalDirectoryRenderCache(RenderCache):
+    """Stores rendered notebooks as files under `directory`.
+
+    Files are written atomically so concurrent workers never see a partial
+    entry. Reading an entry bumps its mtime, and once the directory grows over
+    `max_bytes` the least recently used files are removed.
+
+    The size of the directory is counted as entries are written, and the
+    directory is only walked when that count goes over `max_bytes`, or every
+    `evict_interval` seconds to catch up with what other workers wrote.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 1024 ** 3,
+        evict_interval: float = 60,
+    ) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.evict_interval = evict_interval
+        self.hits = 0
+        self.misses = 0
+        self._size: Optional[int] = None
+        self._walked_at = 0.0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def touch(self, key: str) -> bool:
+        try:
+            os.utime(self._path(key))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def set(self, key: str, value: bytes) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(value)
+            try:
+                replaced = os.stat(path).st_size
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        with self._lock:
+            if self._size is not None:
+                self._size += len(value) - replaced
+            walk = (
+                self._size is None
+                or self._size > self.max_bytes
+                or time.monotonic() - self._walked_at >= self.evict_interval
+            )
+        if walk:
+            self.evict()
+
+    def evict(self) -> None:
+        """Removes the least recently used files until under `max_bytes`."""
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.startswith(".tmp-"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        with self._lock:
+            self._size = total
+            self._walked_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "directory": self.directory,
+            "max_bytes": self.max_bytes,
+            "bytes": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
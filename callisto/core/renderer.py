@@ -0,0 +1,166 @@
+import json
+import os
+import threading
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any
+from typing import Dict
+from typing import Optional
+from typing import Union
+
+from nbconvert.exporters import HTMLExporter
+from nbformat import NotebookNode
+from werkzeug.exceptions import GatewayTimeout
+from werkzeug.exceptions import ServiceUnavailable
+
+from callisto.core.notebook_json import parse_notebook
+from callisto.core.notebook_json import to_notebook_node
+from callisto.core.outputs import lazy_load_outputs
+
+# Bump whenever the rendering pipeline changes its output, so that entries in
+# a shared render cache written by older versions are not served anymore.
+RENDER_VERSION = 2
+DEFAULT_EXPORTER_OPTIONS: Dict[str, Any] = {"template_name": "classic"}
+
+# Lets long lines of code scroll instead of overflowing their cell.
+EXTRA_STYLE = "<style>.CodeMirror { overflow-x: auto; }</style>\n"
+
+
+_exporters = threading.local()
+
+
+def get_exporter(exporter_options: Dict[str, Any]) -> HTMLExporter:
+    """Returns an HTMLExporter configured with `exporter_options`.
+
+    Exporters load their templates and Jinja environment on first use, so they
+    are kept for the next renders. Each thread gets its own, as exporters keep
+    state while rendering.
+    """
+    if not hasattr(_exporters, "by_options"):
+        _exporters.by_options = {}
+    key = json.dumps(exporter_options, sort_keys=True, default=str)
+    exporter = _exporters.by_options.get(key)
+    if exporter is None:
+        exporter = _exporters.by_options[key] = HTMLExporter(**exporter_options)
+    return exporter
+
+
+def render_notebook(
+    notebook: Union[str, bytes, Dict[str, Any]],
+    exporter_options: Optional[Dict[str, Any]] = None,
+) -> str:
+    """Renders a notebook, its json or already parsed, to html.
+
+    This is a plain function of its input so it can run in other processes.
+    """
+    html_exporter = get_exporter(exporter_options or DEFAULT_EXPORTER_OPTIONS)
+    if isinstance(notebook, (str, bytes)):
+        notebook_node = parse_notebook(notebook)
+    elif isinstance(notebook, NotebookNode):
+        notebook_node = notebook
+    else:
+        notebook_node = to_notebook_node(notebook)
+    html, _ = html_exporter.from_notebook_node(notebook_node)
+    return add_style(lazy_load_outputs(html))
+
+
+def add_style(html: str) -> str:
+    """Adds `EXTRA_STYLE` to the head of the document, or in front of it."""
+    head_end = html.find("</head>")
+    if head_end == -1:
+        return EXTRA_STYLE + html
+    return html[:head_end] + EXTRA_STYLE + html[head_end:]
+
+
+class RenderPool:
+    """Renders notebooks in a pool of processes.
+
+    Rendering is CPU bound and holds the GIL, so it runs outside of the web
+    worker. Concurrent requests for the same `key` wait on a single render, at
+    most `max_queue` distinct renders are queued or running, and callers wait
+    at most `timeout` seconds for a result.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_queue: int = 64,
+        timeout: Optional[float] = 60,
+    ) -> None:
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # A pool inherited from the parent process through fork is unusable.
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            self._executor_pid = os.getpid()
+            self._pending = {}
+        return self._executor
+
+    def _submit(
+        self,
+        key: str,
+        content: Union[str, bytes],
+        exporter_options: Optional[Dict[str, Any]],
+    ) -> Future:
+        with self._lock:
+            executor = self._get_executor()
+            future = self._pending.get(key)
+            if future is not None:
+                return future
+            if len(self._pending) >= self.max_queue:
+                raise ServiceUnavailable("too many notebooks waiting to be rendered")
+            try:
+                future = executor.submit(render_notebook, content, exporter_options)
+            except BrokenProcessPool:
+                # A render process died, replace the whole pool.
+                executor.shutdown(wait=False)
+                self._executor = None
+                future = self._get_executor().submit(
+                    render_notebook, content, exporter_options
+                )
+            self._pending[key] = future
+        future.add_done_callback(lambda _: self._forget(key, future))
+        return future
+
+    def _forget(self, key: str, future: Future) -> None:
+        with self._lock:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+
+    def render(
+        self,
+        key: str,
+        content: Union[str, bytes],
+        exporter_options: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        future = self._submit(key, content, exporter_options)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            # The render keeps going, a retry waits on the same render.
+            raise GatewayTimeout("rendering the notebook took too long")
+        except BrokenProcessPool:
+            raise ServiceUnavailable("the render process died")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "pending": len(self._pending),
+        }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._pending = {}
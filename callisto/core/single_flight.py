@@ -0,0 +1,130 @@
+import fcntl
+import os
+import tempfile
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import IO
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterator
+from typing import Optional
+from typing import TypeVar
+
+from callisto.core.render_cache import make_cache_key
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Runs a function once for all concurrent callers with the same key.
+
+    The first caller runs `fn`, the ones arriving while it runs wait for its
+    result, or its exception. Later callers run `fn` again.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+
+    def do(self, key: str, fn: Callable[[], T]) -> T:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                leader = False
+            else:
+                leader = True
+                call = self._calls[key] = Future()
+        if not leader:
+            return call.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+
+@contextmanager
+def file_lock(directory: str, key: str) -> Iterator[None]:
+    """Holds an exclusive lock on `key`, shared by every process on the host.
+
+    The lock is released by the OS when the holding process dies. Lock files
+    are removed by the holder before it releases them, so `directory` only
+    has the files of locks being held or waited for.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{key}.lock")
+    while True:
+        f = open(path, "a")
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            same_file = os.stat(path).st_ino == os.fstat(f.fileno()).st_ino
+        except FileNotFoundError:
+            same_file = False
+        if same_file:
+            break
+        # The previous holder removed the file while this one waited for it.
+        f.close()
+    try:
+        yield
+    finally:
+        os.unlink(path)
+        fcntl.flock(f, fcntl.LOCK_UN)
+        f.close()
+
+
+class ProcessLock:
+    """A lock held by at most one process on the host, taken without waiting.
+
+    Once `acquire` succeeds the process keeps the lock until `release`, or
+    until it dies and the OS releases it for another process to take over.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file: Optional[IO[str]] = None
+
+    def acquire(self) -> bool:
+        """Takes the lock if it is free, returns whether this process holds it."""
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            f = open(self.path, "a")
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                f.close()
+                return False
+            self._file = f
+        return True
+
+    def release(self) -> None:
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+def job_lock(name: str, **resource: Any) -> ProcessLock:
+    """The lock of a background job, for web workers to run it only once.
+
+    Lock files are in the temporary directory, named after the job and the
+    `resource` it works on, so only workers sharing that resource compete.
+    """
+    return ProcessLock(
+        os.path.join(
+            tempfile.gettempdir(),
+            "callisto",
+            f"{name}-{make_cache_key(**resource)}.lock",
+        )
+    )
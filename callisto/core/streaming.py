@@ -0,0 +1,110 @@
+import os
+from typing import Any
+from typing import Dict
+from typing import Iterator
+from typing import Optional
+from typing import Tuple
+
+from jupyter_server.services.contents.filemanager import FileContentsManager
+from tornado.web import HTTPError as TornadoHTTPError
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# A byte range as parsed by werkzeug: `(start, stop)` with an exclusive `stop`,
+# `(start, None)` for everything from `start`, `(-n, None)` for the last n bytes.
+ByteRange = Tuple[int, Optional[int]]
+
+
+class RangeNotSatisfiable(TornadoHTTPError):
+    """A 416 error, with the size of the file for the Content-Range header."""
+
+    def __init__(self, size: Optional[int]) -> None:
+        super().__init__(416, f"range not satisfiable for size {size}")
+        self.size = size
+
+
+class ChunkedStream:
+    """Iterates over a file-like object in chunks.
+
+    The file is closed once it has been read, or when `close` is called, which
+    WSGI servers do when a client goes away in the middle of a response.
+    """
+
+    def __init__(
+        self,
+        f: Any,
+        length: Optional[int] = None,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+    ) -> None:
+        self.f = f
+        self.length = length
+        self.chunk_size = chunk_size
+
+    def __iter__(self) -> Iterator[bytes]:
+        remaining = self.length
+        try:
+            while remaining is None or remaining > 0:
+                size = (
+                    self.chunk_size
+                    if remaining is None
+                    else min(self.chunk_size, remaining)
+                )
+                chunk = self.f.read(size)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+        finally:
+            self.close()
+
+    def read(self) -> bytes:
+        """Reads everything left at once, then closes the file."""
+        try:
+            return self.f.read() if self.length is None else self.f.read(self.length)
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        self.f.close()
+
+
+def resolve_range(byte_range: ByteRange, size: int) -> Tuple[int, int]:
+    """Turns a byte range into absolute `(start, stop)` offsets for a file."""
+    start, stop = byte_range
+    if start < 0:
+        start, stop = max(size + start, 0), size
+    else:
+        stop = size if stop is None else min(stop, size)
+    if start >= stop:
+        raise RangeNotSatisfiable(size)
+    return start, stop
+
+
+def open_local_stream(
+    manager: FileContentsManager, path: str, byte_range: Optional[ByteRange] = None
+) -> Dict[str, Any]:
+    """`open_stream` for the FileContentsManager, which does not provide one.
+
+    The manager itself validates the path (hidden files, directories, paths
+    outside of root_dir) before the file is opened.
+    """
+    model = manager.get(path, content=False, type="file")
+    os_path = manager._get_os_path(path)
+    f = open(os_path, "rb")
+    try:
+        size = os.fstat(f.fileno()).st_size
+        content_range = None
+        if byte_range is not None:
+            content_range = resolve_range(byte_range, size)
+            f.seek(content_range[0])
+    except BaseException:
+        f.close()
+        raise
+    model["size"] = size
+    model["content_range"] = content_range
+    model["content"] = ChunkedStream(
+        f,
+        length=None if content_range is None else content_range[1] - content_range[0],
+    )
+    return model
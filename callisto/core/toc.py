@@ -1,7 +1,15 @@
+from html.parser import HTMLParser
 from typing import Any
 from typing import Dict
 from typing import List
 from typing import Optional
+from typing import Tuple
+
+from nbconvert.filters.markdown_mistune import IPythonRenderer
+from nbconvert.filters.markdown_mistune import MarkdownWithMath
+
+
+HEADING_TAGS = ("h1", "h2", "h3", "h4", "h5")
 
 
 class TocNode:
@@ -42,3 +50,69 @@ class TocNode:
             "anchor": self.anchor,
             "children": [c.to_dict() for c in self.children],
         }
+
+
+class _HeadingParser(HTMLParser):
+    """Collects the headings of a rendered markdown cell.
+
+    Like the table of contents used to be built from the rendered notebook, the
+    text of a heading is the text of its first child node.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.headings: List[TocNode] = []
+        self._current: Optional[TocNode] = None
+        self._depth = 0
+        self._first_child_done = False
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if self._current is None:
+            anchor = dict(attrs).get("id")
+            if tag in HEADING_TAGS and anchor:
+                self._current = TocNode(int(tag[1]), "", anchor)
+                self._depth = 0
+                self._first_child_done = False
+            return
+        self._depth += 1
+
+    def handle_endtag(self, tag: str) -> None:
+        if self._current is None:
+            return
+        if self._depth == 0:
+            self.headings.append(self._current)
+            self._current = None
+            return
+        self._depth -= 1
+        if self._depth == 0:
+            self._first_child_done = True
+
+    def handle_data(self, data: str) -> None:
+        if self._current is None or self._first_child_done:
+            return
+        self._current.text = (self._current.text or "") + data
+        if self._depth == 0:
+            self._first_child_done = True
+
+
+def extract_headings(notebook: Dict[str, Any]) -> List[TocNode]:
+    """Finds the headings of the markdown cells in a notebook.
+
+    Markdown is rendered with the same renderer nbconvert uses, so anchors match
+    the ids in the rendered notebook without rendering the whole notebook.
+    """
+    headings: List[TocNode] = []
+    for cell in notebook.get("cells", []):
+        if cell.get("cell_type") != "markdown":
+            continue
+        source = cell.get("source", "")
+        if isinstance(source, list):
+            source = "".join(source)
+        renderer = IPythonRenderer(
+            escape=False, attachments=cell.get("attachments", {})
+        )
+        parser = _HeadingParser()
+        parser.feed(MarkdownWithMath(renderer=renderer).render(source))
+        parser.close()
+        headings.extend(parser.headings)
+    return headings
@@ -1,5 +1,7 @@
 #!/usr/bin/env python
 import sys
+from typing import Optional
+from typing import Tuple
 
 import click
 from more_click import host_option
@@ -43,6 +45,128 @@ def start(
     )
 
 
+@cli.command("prerender")
+@click.option(
+    "--config",
+    envvar="CALLISTO_CONFIG",
+    type=click.Path(exists=True),
+    help="config file",
+)
+@click.option(
+    "--prefix",
+    "prefixes",
+    multiple=True,
+    help="folder to render notebooks from, can be repeated",
+)
+@click.option("--render-workers", type=int, help="number of render processes")
+@click.option(
+    "--interval",
+    type=float,
+    help="keep running, and look for changed notebooks every INTERVAL seconds",
+)
+def prerender(
+    config: str,
+    prefixes: Tuple[str, ...],
+    render_workers: Optional[int],
+    interval: Optional[float],
+) -> None:
+    """Renders notebooks into the render cache."""
+    import logging
+
+    from callisto.core.callisto_config import CallistoConfig
+    from callisto.core.contents_loader import ContentsLoader
+    from callisto.core.prerender import Prerenderer
+    from callisto.core.prerender import prerender_lock
+
+    logging.basicConfig(level=logging.INFO)
+    callisto_config = CallistoConfig.load_from_config_file(config)
+    prerender_prefixes = list(prefixes) or callisto_config.prerender_prefixes
+    prerenderer = Prerenderer(
+        ContentsLoader(callisto_config),
+        prefixes=prerender_prefixes,
+        max_workers=render_workers or callisto_config.prerender_workers,
+    )
+    if interval:
+        # Takes turns with the web workers prerendering the same folders.
+        prerenderer.run_forever(
+            interval, lock=prerender_lock(callisto_config, prerender_prefixes)
+        )
+    else:
+        click.echo(f"rendered {prerenderer.run_once()} notebooks")
+
+
+@cli.command("index")
+@click.option(
+    "--config",
+    envvar="CALLISTO_CONFIG",
+    type=click.Path(exists=True),
+    help="config file",
+)
+@click.option(
+    "--prefix",
+    "prefixes",
+    multiple=True,
+    help="folder to index, can be repeated, everything by default",
+)
+def index(config: str, prefixes: Tuple[str, ...]) -> None:
+    """Builds or refreshes the metadata index of the contents manager."""
+    from callisto.core.callisto_config import CallistoConfig
+    from callisto.core.contents_loader import ContentsLoader
+
+    contents_manager = ContentsLoader(
+        CallistoConfig.load_from_config_file(config)
+    ).contents_manager
+    if getattr(contents_manager, "index", None) is None:
+        raise click.UsageError("the contents manager has no `index_path` set")
+    for prefix in prefixes or ("",):
+        count = contents_manager.crawl(prefix.strip("/"))
+        click.echo(f"indexed {count} entries under /{prefix.strip('/')}")
+
+
+@cli.command("index-content")
+@click.option(
+    "--config",
+    envvar="CALLISTO_CONFIG",
+    type=click.Path(exists=True),
+    help="config file",
+)
+@click.option(
+    "--prefix",
+    "prefixes",
+    multiple=True,
+    help="folder to index notebooks from, can be repeated",
+)
+@click.option(
+    "--interval",
+    type=float,
+    help="keep running, and look for changed notebooks every INTERVAL seconds",
+)
+def index_content(
+    config: str, prefixes: Tuple[str, ...], interval: Optional[float]
+) -> None:
+    """Indexes the cells of changed notebooks for `/api/search/content`."""
+    import logging
+
+    from callisto.core.callisto_config import CallistoConfig
+    from callisto.core.content_index import ContentIndexer
+    from callisto.core.contents_loader import ContentsLoader
+
+    logging.basicConfig(level=logging.INFO)
+    callisto_config = CallistoConfig.load_from_config_file(config)
+    loader = ContentsLoader(callisto_config)
+    if loader.content_index is None:
+        raise click.UsageError("`content_index_path` is not configured")
+    indexer = ContentIndexer(
+        loader,
+        loader.content_index,
+        prefixes=list(prefixes) or callisto_config.content_index_prefixes,
+    )
+    if interval:
+        indexer.run_forever(interval)
+    else:
+        click.echo(f"indexed {indexer.run_once()} notebooks")
+
+
 @cli.command("start-dev")
 @click.option(
     "--config",
@@ -5,7 +5,6 @@ from pathlib import Path
 from distutils.core import setup
 from setuptools import find_packages
 
-
 HERE = Path(__file__).parent.resolve()
 pkg_json = json.loads((HERE / "front" / "package.json").read_bytes())
 long_description = (HERE / "README.md").read_text()
@@ -25,10 +24,8 @@ setup(
     include_package_data=True,
     install_requires=[
         "boto3",
-        "bs4",
         "click",
         "cryptography",
-        "cssutils",
         "flask",
         "gunicorn",
         "jinja2",
@@ -36,6 +33,11 @@ setup(
         "more_click",
         "nbconvert",
     ],
+    extras_require={
+        "async": ["aiobotocore"],
+        "brotli": ["brotli"],
+        "orjson": ["orjson"],
+    },
     classifiers=[
         "Development Status :: 5 - Production/Stable",
         "Environment :: Web Environment",
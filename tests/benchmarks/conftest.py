@@ -0,0 +1,52 @@
+import os
+import socket
+import time
+
+import boto3
+import pytest
+from moto.server import ThreadedMotoServer
+
+from tests.utils.create_s3 import BUCKET
+from tests.utils.create_s3 import upload_fixture_to_s3
+from tests.utils.create_s3 import set_env
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture(scope="session")
+def env():
+    new_env, old_env = set_env()
+    yield
+    os.environ.update(old_env)
+    for key in set(new_env.keys()) - set(old_env.keys()):
+        del os.environ[key]
+
+
+@pytest.fixture(scope="session")
+def endpoint_url(env):
+    port = _free_port()
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=port, verbose=False)
+    server.start()
+    endpoint_url = f"http://127.0.0.1:{port}"
+    client = boto3.client("s3", region_name="us-east-1", endpoint_url=endpoint_url)
+    upload_fixture_to_s3(client)
+    yield endpoint_url
+    server.stop()
+
+
+@pytest.fixture(scope="session")
+def bucket():
+    return BUCKET
+
+
+def timeit(func, repeat: int) -> float:
+    """Returns the average seconds per call of `func`."""
+    func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
@@ -0,0 +1,146 @@
+import json
+import tracemalloc
+
+import nbformat
+import pytest
+from nbconvert.exporters import HTMLExporter
+
+from callisto.core.notebook_json import parse_notebook
+from callisto.core.renderer import DEFAULT_EXPORTER_OPTIONS
+from callisto.core.renderer import get_exporter
+from callisto.core.renderer import render_notebook
+from tests.benchmarks.conftest import timeit
+
+
+@pytest.fixture(scope="module")
+def large_notebook():
+    nb = nbformat.v4.new_notebook()
+    for i in range(100):
+        nb.cells.append(nbformat.v4.new_markdown_cell(f"## Section {i}\n\nSome text"))
+        source = "\n".join(
+            f"value_{j} = compute({i}, {j})  # " + "x" * 80 for j in range(20)
+        )
+        output = nbformat.v4.new_output(
+            "stream", name="stdout", text="\n".join(f"line {j}" for j in range(50))
+        )
+        nb.cells.append(
+            nbformat.v4.new_code_cell(source, execution_count=i, outputs=[output])
+        )
+    return nbformat.writes(nb)
+
+
+def render_with_beautifulsoup(content: str) -> str:
+    """The previous pipeline, exporting then rewriting `.CodeMirror` styles."""
+    bs4 = pytest.importorskip("bs4")
+    cssutils = pytest.importorskip("cssutils")
+
+    notebook_node = nbformat.reads(content, as_version=4)
+    html, _ = HTMLExporter(**DEFAULT_EXPORTER_OPTIONS).from_notebook_node(notebook_node)
+    soup = bs4.BeautifulSoup(html, "html.parser")
+    for elem in soup.find_all(class_="CodeMirror"):
+        style = cssutils.parseStyle(elem.get("style", ""))
+        style["overflow-x"] = "auto"
+        elem["style"] = style.cssText
+    return str(soup)
+
+
+def peak_memory(func) -> int:
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_render_without_beautifulsoup(large_notebook):
+    def old():
+        render_with_beautifulsoup(large_notebook)
+
+    def new():
+        render_notebook(large_notebook)
+
+    old_time, new_time = timeit(old, repeat=1), timeit(new, repeat=1)
+    old_peak, new_peak = peak_memory(old), peak_memory(new)
+    print(
+        f"\nrender {len(large_notebook) // 1024}KiB notebook: "
+        f"beautifulsoup {old_time * 1000:.0f}ms / {old_peak // 1024 ** 2}MiB peak, "
+        f"string insert {new_time * 1000:.0f}ms / {new_peak // 1024 ** 2}MiB peak "
+        f"({old_time / new_time:.1f}x)"
+    )
+    assert new_time < old_time
+
+
+@pytest.fixture(scope="module")
+def small_notebook():
+    nb = nbformat.v4.new_notebook()
+    nb.cells.append(nbformat.v4.new_code_cell("x = 1"))
+    return nbformat.writes(nb)
+
+
+def test_render_with_cached_exporter(small_notebook):
+    def fresh():
+        notebook_node = nbformat.reads(small_notebook, as_version=4)
+        HTMLExporter(**DEFAULT_EXPORTER_OPTIONS).from_notebook_node(notebook_node)
+
+    def cached():
+        render_notebook(small_notebook)
+
+    fresh_time, cached_time = timeit(fresh, repeat=20), timeit(cached, repeat=20)
+    print(
+        f"\nrender small notebook: new exporter {fresh_time * 1000:.1f}ms, "
+        f"cached exporter {cached_time * 1000:.1f}ms "
+        f"({fresh_time / cached_time:.1f}x)"
+    )
+    assert cached_time < fresh_time
+
+
+@pytest.fixture(scope="module")
+def notebook_with_large_outputs():
+    nb = nbformat.v4.new_notebook()
+    for i in range(10):
+        output = nbformat.v4.new_output(
+            "stream", name="stdout", text=f"line {i}\n" * 50_000
+        )
+        nb.cells.append(nbformat.v4.new_code_cell(f"run({i})", outputs=[output]))
+    return nbformat.writes(nb).encode("utf-8")
+
+
+def test_parse_notebook_once(notebook_with_large_outputs):
+    """Peak memory of loading a notebook fetched as bytes, then rendering it.
+
+    The previous pipeline decoded the bytes to a str, parsed it for the
+    contents, then twice more to render: once for its version and once in
+    `nbformat.reads`.
+    """
+    data = notebook_with_large_outputs
+
+    def old_parse():
+        content = data.decode("utf-8")
+        dict_content = json.loads(content)
+        notebook_node = nbformat.reads(
+            content, as_version=json.loads(content)["nbformat"]
+        )
+        return dict_content, notebook_node
+
+    def old():
+        _, notebook_node = old_parse()
+        get_exporter(DEFAULT_EXPORTER_OPTIONS).from_notebook_node(notebook_node)
+
+    def new_parse():
+        return parse_notebook(data)
+
+    def new():
+        render_notebook(new_parse())
+
+    old_parse_peak, new_parse_peak = peak_memory(old_parse), peak_memory(new_parse)
+    old_peak, new_peak = peak_memory(old), peak_memory(new)
+    mib = 1024 ** 2
+    print(
+        f"\nparse {len(data) // mib}MiB notebook: "
+        f"before {old_parse_peak / mib:.0f}MiB peak, "
+        f"after {new_parse_peak / mib:.0f}MiB peak"
+        f"\nparse and render it: before {old_peak / mib:.0f}MiB peak, "
+        f"after {new_peak / mib:.0f}MiB peak"
+    )
+    assert new_parse_peak < old_parse_peak
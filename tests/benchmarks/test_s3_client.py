@@ -0,0 +1,72 @@
+from unittest import mock
+
+import pytest
+
+from callisto.contents_managers.s3 import SimplifiedS3ContentsManager
+from tests.benchmarks.conftest import timeit
+
+
+@pytest.fixture
+def manager(endpoint_url, bucket):
+    return SimplifiedS3ContentsManager(
+        bucket=bucket,
+        endpoint_url=endpoint_url,
+        aws_access_key_id="testing",
+        aws_secret_access_key="testing",
+    )
+
+
+@pytest.mark.parametrize(
+    "path", ["", "nested_folders", "test-notebook.ipynb", "nested_folders/data.csv"]
+)
+def test_pooled_client_latency(manager, path):
+    def get():
+        manager.get(path, content=True)
+
+    pooled = timeit(get, repeat=20)
+    with mock.patch.object(
+        SimplifiedS3ContentsManager,
+        "client",
+        new_callable=mock.PropertyMock,
+        side_effect=manager._create_client,
+    ):
+        per_call = timeit(get, repeat=20)
+
+    print(
+        f"\n{path or '<root>'}: client per call {per_call * 1000:.1f}ms, "
+        f"pooled client {pooled * 1000:.1f}ms ({per_call / pooled:.1f}x)"
+    )
+    assert pooled < per_call
+
+
+def test_async_list_folders(manager, endpoint_url, bucket):
+    """Listing many folders one after another, then all at once."""
+    async_s3 = pytest.importorskip("callisto.contents_managers.async_s3")
+    pytest.importorskip("aiobotocore")
+    async_manager = async_s3.AsyncS3ContentsManager(
+        bucket=bucket,
+        endpoint_url=endpoint_url,
+        aws_access_key_id="testing",
+        aws_secret_access_key="testing",
+        max_concurrency=10,
+    )
+    paths = ["", "nested_folders"] * 10
+
+    def serial():
+        for path in paths:
+            manager.list_folder(path)
+
+    def concurrent():
+        async_manager.list_folders(paths)
+
+    try:
+        serial_seconds = timeit(serial, repeat=5)
+        concurrent_seconds = timeit(concurrent, repeat=5)
+    finally:
+        async_manager.close()
+    print(
+        f"\nlist {len(paths)} folders: serial {serial_seconds * 1000:.1f}ms, "
+        f"concurrent {concurrent_seconds * 1000:.1f}ms "
+        f"({serial_seconds / concurrent_seconds:.1f}x)"
+    )
+    assert concurrent_seconds < serial_seconds
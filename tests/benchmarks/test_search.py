@@ -0,0 +1,38 @@
+import random
+
+import pytest
+
+from callisto.core.content_index import ContentIndex
+from tests.benchmarks.conftest import timeit
+
+WORDS = [f"word{i}" for i in range(5000)]
+
+
+@pytest.fixture(scope="module")
+def content_index(tmpdir_factory):
+    rng = random.Random(0)
+    index = ContentIndex(str(tmpdir_factory.mktemp("search").join("content.sqlite")))
+    for i in range(20000):
+        markdown = " ".join(rng.choices(WORDS, k=100))
+        code = "\n".join(
+            f"df_{j} = spark.table('warehouse.table_{rng.randrange(2000)}')"
+            for j in range(20)
+        )
+        notebook = {
+            "cells": [
+                {"cell_type": "markdown", "source": markdown},
+                {"cell_type": "code", "source": code},
+            ]
+        }
+        index.update(f"team/{i % 100}/notebook_{i}.ipynb", str(i), notebook)
+    return index
+
+
+@pytest.mark.parametrize(
+    "query", ["table_42", "warehouse", "word1 word2", "spark table_7", "nothing"]
+)
+def test_search_content(content_index, query):
+    """Search latency over 20k indexed notebooks, best 50 matches."""
+    seconds = timeit(lambda: content_index.search(query, limit=50), repeat=20)
+    print(f"search `{query}`: {seconds * 1000:.1f}ms")
+    assert seconds < 0.1
@@ -0,0 +1,64 @@
+import time
+
+import boto3
+import pytest
+
+from callisto.core.callisto_config import CallistoConfig
+from callisto.core.contents_loader import ContentsLoader
+from tests.benchmarks.conftest import timeit
+
+TREE_BUCKET = "test-tree-bucket"
+
+
+@pytest.fixture(scope="module")
+def tree_bucket(endpoint_url):
+    client = boto3.client("s3", region_name="us-east-1", endpoint_url=endpoint_url)
+    client.create_bucket(Bucket=TREE_BUCKET)
+    for i in range(10):
+        for j in range(5):
+            client.put_object(
+                Bucket=TREE_BUCKET, Key=f"project/{i}/{j}/nb.ipynb", Body=b"{}"
+            )
+    return TREE_BUCKET
+
+
+def make_loader(endpoint_url, bucket, workers):
+    loader = ContentsLoader(
+        CallistoConfig(
+            contents_manager_cls=(
+                "callisto.contents_managers.s3.SimplifiedS3ContentsManager"
+            ),
+            contents_manager_kwargs={
+                "bucket": bucket,
+                "endpoint_url": endpoint_url,
+                "aws_access_key_id": "testing",
+                "aws_secret_access_key": "testing",
+            },
+            listing_cache_ttl=0,
+            tree_workers=workers,
+        )
+    )
+    # The local server answers in no time, add the round trip of a real S3.
+    loader.contents_manager.client.meta.events.register(
+        "before-send.s3.*", lambda **kwargs: time.sleep(0.02)
+    )
+    return loader
+
+
+def test_tree_fan_out(endpoint_url, tree_bucket):
+    """A 3 level tree of 61 folders, one listing at a time then 8 at once.
+
+    Every request takes 20ms more, like a round trip to S3.
+    """
+    serial = make_loader(endpoint_url, tree_bucket, workers=1)
+    parallel = make_loader(endpoint_url, tree_bucket, workers=8)
+    assert serial.list_tree("project", 3) == parallel.list_tree("project", 3)
+
+    serial_seconds = timeit(lambda: serial.list_tree("project", 3), repeat=5)
+    parallel_seconds = timeit(lambda: parallel.list_tree("project", 3), repeat=5)
+    print(
+        f"\ntree: serial {serial_seconds * 1000:.1f}ms, "
+        f"thread pool {parallel_seconds * 1000:.1f}ms "
+        f"({serial_seconds / parallel_seconds:.1f}x)"
+    )
+    assert parallel_seconds < serial_seconds
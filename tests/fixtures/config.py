@@ -55,3 +55,82 @@ private_link_encrypt_key = b"MPQkJL_w4wKx1HJQRdII6pBRQOTPiuzcAPfACjZORNI="
 # it is not discoverable
 # The key is generated via
 # `from cryptography.fernet import Fernet; Fernet.generate_key()`
+
+listing_cache_ttl = 10
+listing_cache_max_entries = 1000
+# [Optional] directory listings are cached for `listing_cache_ttl` seconds, keeping
+# at most `listing_cache_max_entries` folders. Set the ttl to 0 to disable the cache.
+
+notebook_cache_max_entries = 100
+notebook_cache_max_bytes = 512 * 1024**2
+# [Optional] loaded notebooks are kept in memory until there are more than
+# `notebook_cache_max_entries` of them, or their raw json, parsed content and
+# rendered html take more than `notebook_cache_max_bytes`.
+
+notebook_revalidate_interval = 0
+notebook_stale_while_revalidate = 0
+# [Optional] a loaded notebook is trusted for `notebook_revalidate_interval` seconds
+# before checking the backend for a new version. For `notebook_stale_while_revalidate`
+# more seconds it is still served while being checked in a background thread.
+
+render_cache_cls = "callisto.core.render_cache.LocalDirectoryRenderCache"
+render_cache_kwargs = {"directory": "/tmp/callisto-render-cache"}
+# [Optional] `render_cache_cls` stores rendered notebooks so that every worker, also
+# after a restart, can reuse them. It can be a string or a RenderCache class.
+# `render_cache_kwargs` are passed to the class, `LocalDirectoryRenderCache` takes
+# the `directory` to store files in and `max_bytes` to bound its size (LRU evicted).
+
+compression_min_size = 1024
+# [Optional] responses of at least `compression_min_size` bytes are compressed with
+# gzip, or brotli if installed and accepted by the client. `None` disables it.
+
+exporter_options = {"template_name": "classic"}
+# [Optional] options of the nbconvert HTMLExporter rendering notebooks, on top of
+# the default `{"template_name": "classic"}`.
+
+output_blob_min_size = None
+# [Optional] with a render cache, images of at least `output_blob_min_size` bytes in
+# notebook outputs are stored in it and served from `/api/notebook/output/<hash>`
+# instead of being embedded in the rendered html. Private notebooks keep them inline.
+
+max_output_size = None
+# [Optional] text outputs longer than `max_output_size` characters are cut in the
+# rendered html, followed by a link opening the full output.
+
+render_lock_directory = None
+# [Optional] with a render cache, workers take a file lock in this directory before
+# rendering a notebook, so that a version is rendered by one worker at a time. Lock
+# files are removed once released.
+
+render_workers = None
+render_queue_size = 64
+render_timeout = 60
+# [Optional] with `render_workers`, notebooks are rendered in a pool of processes
+# instead of the request thread, one pool per web worker shared by public and private
+# notebooks. Concurrent requests for a notebook share a render,
+# requests beyond `render_queue_size` distinct renders get a 503, and requests
+# waiting longer than `render_timeout` seconds get a 504.
+
+prerender_interval = None
+prerender_prefixes = None
+prerender_workers = None
+# [Optional] with a render cache, every `prerender_interval` seconds the notebooks
+# under `prerender_prefixes` (everything by default) that changed are rendered in a
+# pool of `prerender_workers` processes, by a single web worker per host at a time.
+# `cli.py prerender` does a one-shot run, or keeps running with `--interval`.
+
+content_index_path = None
+content_index_interval = None
+content_index_prefixes = None
+# [Optional] `content_index_path` is the SQLite file of the full-text index behind
+# `/api/search/content`. Every `content_index_interval` seconds the notebooks under
+# `content_index_prefixes` (everything by default) that changed are indexed again, by
+# a single web worker per host at a time. `cli.py index-content` does a one-shot run,
+# or keeps running with `--interval`.
+
+tree_max_depth = 5
+tree_max_entries = 10000
+tree_workers = 8
+# [Optional] `/api/tree/<path>?depth=` lists at most `tree_max_depth` levels and
+# `tree_max_entries` entries of a folder, `tree_workers` threads listing the folders of
+# a level at once.
@@ -0,0 +1,220 @@
+import asyncio
+import socket
+from unittest import mock
+
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+from tornado.web import HTTPError
+
+from callisto.contents_managers.async_s3 import AsyncS3ContentsManager
+from callisto.contents_managers.async_s3 import EventLoopThread
+from callisto.contents_managers.s3 import SimplifiedS3ContentsManager
+
+BUCKET = "test-async-bucket"
+KEYS = [
+    "top.ipynb",
+    "data.csv",
+    ".hidden",
+    "empty/",
+    "a/one.ipynb",
+    "a/b/two.ipynb",
+    "a/b/c/three.ipynb",
+] + [f"many/{i:02}/nb.ipynb" for i in range(12)]
+
+
+def test_event_loop_thread():
+    runner = EventLoopThread()
+
+    async def add(a, b):
+        await asyncio.sleep(0)
+        return a + b
+
+    assert runner.run(add(1, 2)) == 3
+
+    async def nested():
+        return runner.run(add(1, 2))
+
+    with pytest.raises(RuntimeError):
+        runner.run(nested())
+    runner.stop()
+
+
+@pytest.fixture(scope="module")
+def endpoint_url(env):
+    pytest.importorskip("aiobotocore")
+    from moto.server import ThreadedMotoServer
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=port, verbose=False)
+    server.start()
+    endpoint_url = f"http://127.0.0.1:{port}"
+    client = boto3.client("s3", region_name="us-east-1", endpoint_url=endpoint_url)
+    client.create_bucket(Bucket=BUCKET)
+    for key in KEYS:
+        client.put_object(Bucket=BUCKET, Key=key, Body=b'{"nbformat": 4}')
+    yield endpoint_url
+    server.stop()
+
+
+def make_manager(cls, endpoint_url, **kwargs):
+    return cls(
+        bucket=BUCKET,
+        endpoint_url=endpoint_url,
+        aws_access_key_id="testing",
+        aws_secret_access_key="testing",
+        region_name="us-east-1",
+        **kwargs,
+    )
+
+
+@pytest.fixture
+def manager(endpoint_url):
+    manager = make_manager(AsyncS3ContentsManager, endpoint_url, max_concurrency=3)
+    yield manager
+    manager.close()
+
+
+@pytest.fixture
+def sync_manager(endpoint_url):
+    return make_manager(SimplifiedS3ContentsManager, endpoint_url)
+
+
+def by_path(items):
+    return sorted(items, key=lambda item: item["path"])
+
+
+@pytest.mark.parametrize("path", ["", "a", "a/b", "many", "empty"])
+def test_list_folder(manager, sync_manager, path):
+    assert by_path(manager.list_folder(path)) == by_path(sync_manager.list_folder(path))
+
+
+@pytest.mark.parametrize("path", ["", "a", "top.ipynb", "data.csv"])
+def test_get(manager, sync_manager, path):
+    assert manager.get(path, content=True) == sync_manager.get(path, content=True)
+
+
+def test_get_not_found(manager):
+    with pytest.raises(HTTPError) as e:
+        manager.get("missing.ipynb", content=True)
+    assert e.value.status_code == 404
+
+
+def test_list_folder_page(manager, sync_manager):
+    assert manager.list_folder_page("many", 5) == sync_manager.list_folder_page(
+        "many", 5
+    )
+
+
+def test_open_stream(manager):
+    model = manager.open_stream("a/one.ipynb", byte_range=(1, 9))
+    assert model["content_range"] == (1, 9)
+    assert b"".join(model["content"]) == b'"nbforma'
+
+
+def test_list_folders(manager):
+    listings = manager.list_folders(["a", "a/b", "missing"])
+    assert [sorted(item["name"] for item in items) for items in listings] == [
+        ["b", "one.ipynb"],
+        ["c", "two.ipynb"],
+        [],
+    ]
+
+
+def test_list_folders_failing_folder(manager):
+    alist_folder = manager.alist_folder
+
+    async def failing(path):
+        if path == "a/b":
+            raise ClientError({"Error": {"Code": "AccessDenied"}}, "ListObjectsV2")
+        return await alist_folder(path)
+
+    with mock.patch.object(manager, "alist_folder", side_effect=failing):
+        listings = manager.list_folders(["a", "a/b"])
+    assert [sorted(item["name"] for item in items) for items in listings] == [
+        ["b", "one.ipynb"],
+        [],
+    ]
+
+
+def test_bounded_concurrency(manager):
+    client = manager.async_client
+    list_objects = client.list_objects_v2
+    running = []
+    peak = []
+
+    async def tracked(**kwargs):
+        running.append(1)
+        peak.append(len(running))
+        try:
+            await asyncio.sleep(0.01)
+            return await list_objects(**kwargs)
+        finally:
+            running.pop()
+
+    client.list_objects_v2 = tracked
+    try:
+        manager.list_folders([f"many/{i:02}" for i in range(12)])
+    finally:
+        client.list_objects_v2 = list_objects
+    assert len(peak) == 12
+    assert max(peak) == 3
+
+
+def test_list_tree(manager):
+    model = manager.list_tree("a", depth=2)
+    assert model["type"] == "directory"
+    assert model["truncated"] is False
+    b, one = model["content"]
+    assert (b["path"], one["path"]) == ("a/b", "a/one.ipynb")
+    assert [item["path"] for item in b["content"]] == ["a/b/c", "a/b/two.ipynb"]
+    assert b["content"][0]["content"] is None
+
+
+def test_list_tree_max_entries(manager):
+    model = manager.list_tree("", depth=3, max_entries=8)
+    assert model["truncated"] is True
+    assert [item["name"] for item in model["content"]] == [
+        "a",
+        "empty",
+        "many",
+        "data.csv",
+        "top.ipynb",
+    ]
+    assert [item["name"] for item in model["content"][0]["content"]] == [
+        "b",
+        "one.ipynb",
+    ]
+    assert model["content"][2]["content"] is None
+
+
+def test_crawl(endpoint_url, tmpdir):
+    manager = make_manager(
+        AsyncS3ContentsManager,
+        endpoint_url,
+        index_path=str(tmpdir.join("async.sqlite")),
+    )
+    sync_manager = make_manager(
+        SimplifiedS3ContentsManager,
+        endpoint_url,
+        index_path=str(tmpdir.join("sync.sqlite")),
+    )
+    try:
+        assert manager.crawl() == sync_manager.crawl() == 34
+        for path in ["", "a", "a/b/c", "many/03"]:
+            assert manager.index.list_folder(path) == sync_manager.index.list_folder(
+                path
+            )
+    finally:
+        manager.close()
+
+
+def test_get_many(manager, sync_manager):
+    models = manager.get_many(["top.ipynb", "missing.ipynb", "data.csv"])
+    assert list(models) == ["top.ipynb", "data.csv"]
+    assert models["top.ipynb"] == sync_manager.get("top.ipynb", content=True)
+    assert models["data.csv"] == sync_manager.get("data.csv", content=True)
+    heads = manager.get_many(["top.ipynb"], content=False)
+    assert heads["top.ipynb"]["content"] is None
@@ -5,6 +5,7 @@ import pytest
 from tornado.web import HTTPError
 
 from callisto.contents_managers.s3 import SimplifiedS3ContentsManager
+from callisto.core.listing import encode_cursor
 
 
 class TestSimplifiedS3ContentsManager:
@@ -29,8 +30,26 @@ class TestSimplifiedS3ContentsManager:
             aws_secret_access_key="secret_access_key",
         )
         mock_session.return_value.client.assert_called_once_with(
-            service_name="s3", endpoint_url="http://example.com:3000/"
+            service_name="s3", endpoint_url="http://example.com:3000/", config=mock.ANY
         )
+        config = mock_session.return_value.client.call_args[1]["config"]
+        assert config.max_pool_connections == 10
+
+    def test_client_reused(self, mock_session):
+        manager = SimplifiedS3ContentsManager(
+            bucket="test-bucket", max_pool_connections=50
+        )
+        assert manager.client is manager.client
+        mock_session.assert_called_once_with()
+        config = mock_session.return_value.client.call_args[1]["config"]
+        assert config.max_pool_connections == 50
+
+    def test_client_recreated_after_fork(self, mock_session):
+        manager = SimplifiedS3ContentsManager(bucket="test-bucket")
+        manager.client
+        with mock.patch("os.getpid", return_value=-1):
+            manager.client
+        assert mock_session.call_count == 2
 
     @pytest.fixture
     def manager(self, s3):
@@ -156,3 +175,332 @@ class TestSimplifiedS3ContentsManager:
     def test_get_file_not_found(self, manager, has_content):
         with pytest.raises(HTTPError):
             manager.get("test", content=has_content)
+
+    @pytest.fixture
+    def spy_client(self, manager):
+        client = manager.client
+        with mock.patch.object(
+            client, "list_objects", wraps=client.list_objects
+        ), mock.patch.object(
+            client, "get_object", wraps=client.get_object
+        ), mock.patch.object(
+            client, "head_object", wraps=client.head_object
+        ):
+            yield client
+
+    @pytest.mark.parametrize("path", ["test-notebook.ipynb", "nested_folders/data.csv"])
+    def test_get_file_single_round_trip(self, manager, spy_client, path):
+        manager.get(path, content=True)
+        assert spy_client.get_object.call_count == 1
+        assert spy_client.list_objects.call_count == 0
+
+    def test_get_without_content_uses_head_object(self, manager, spy_client):
+        result = manager.get("test-notebook.ipynb", content=False)
+        assert result["content"] is None
+        assert result["last_modified"] is not None
+        assert spy_client.head_object.call_count == 1
+        assert spy_client.get_object.call_count == 0
+        assert result["etag"] == manager.get("test-notebook.ipynb", True)["etag"]
+
+    def test_get_directory_remembers_kind(self, manager, mock_list_folder):
+        with mock.patch.object(manager, "is_folder", return_value=True) as m:
+            manager.get("nested_folders", content=True)
+            manager.get("nested_folders", content=True)
+            assert m.call_count == 0
+        assert manager._path_kinds["nested_folders"] == "directory"
+
+    def test_get_file_hint_falls_back_to_directory(self, manager, spy_client):
+        result = manager.get("nested_folders", content=True, type="file")
+        assert result["type"] == "directory"
+        assert manager._path_kinds["nested_folders"] == "directory"
+
+        spy_client.get_object.reset_mock()
+        manager.get("nested_folders", content=True, type="file")
+        assert spy_client.get_object.call_count == 0
+
+    def test_get_not_found_forgets_kind(self, manager):
+        manager._path_kinds["gone.ipynb"] = "file"
+        with pytest.raises(HTTPError):
+            manager.get("gone.ipynb", content=True)
+        assert "gone.ipynb" not in manager._path_kinds
+
+    def test_path_kind_cache_bounded(self, manager):
+        manager.path_kind_cache_size = 2
+        for path in ["a", "b", "c"]:
+            manager._remember_kind(path, "file")
+        assert list(manager._path_kinds) == ["b", "c"]
+
+    def test_open_stream(self, manager):
+        with open(
+            "tests/fixtures/notebooks/nested_folders/callisto-256.png", "rb"
+        ) as f:
+            expected_content = f.read()
+
+        result = manager.open_stream("nested_folders/callisto-256.png")
+        assert result["size"] == len(expected_content)
+        assert result["mimetype"] == "image/png"
+        assert result["type"] == "file"
+        assert b"".join(result["content"]) == expected_content
+
+    def test_open_stream_not_found(self, manager):
+        with pytest.raises(HTTPError) as e:
+            manager.open_stream("not-exist.png")
+        assert e.value.status_code == 404
+
+    @pytest.mark.parametrize(
+        "byte_range,expected_range",
+        [((0, 10), (0, 10)), ((10, None), (10, None)), ((-10, None), (-10, None))],
+    )
+    def test_open_stream_range(self, manager, byte_range, expected_range):
+        with open(
+            "tests/fixtures/notebooks/nested_folders/callisto-256.png", "rb"
+        ) as f:
+            expected_content = f.read()
+        size = len(expected_content)
+        start, stop = expected_range
+        if start < 0:
+            start, stop = size + start, size
+        elif stop is None:
+            stop = size
+
+        result = manager.open_stream(
+            "nested_folders/callisto-256.png", byte_range=byte_range
+        )
+        assert result["size"] == size
+        assert result["content_range"] == (start, stop)
+        assert b"".join(result["content"]) == expected_content[start:stop]
+
+    def test_open_stream_range_not_satisfiable(self, manager):
+        with pytest.raises(HTTPError) as e:
+            manager.open_stream(
+                "nested_folders/callisto-256.png", byte_range=(10**9, None)
+            )
+        assert e.value.status_code == 416
+        assert (
+            e.value.size
+            == manager.open_stream("nested_folders/callisto-256.png")["size"]
+        )
+
+
+class TestListFolderPage:
+    DIRECTORIES = [f"dir-{i}" for i in range(5)]
+    FILES = [f"file-{i:02}.ipynb" for i in range(25)]
+
+    @pytest.fixture
+    def manager(self, s3):
+        bucket = "test-paged-bucket"
+        if bucket not in [b["Name"] for b in s3.list_buckets()["Buckets"]]:
+            s3.create_bucket(Bucket=bucket)
+            keys = ["big/", "big/.hidden"] + [f"big/{name}" for name in self.FILES]
+            keys += [f"big/{name}/nested.ipynb" for name in self.DIRECTORIES]
+            keys += ["only-dirs/a/x.ipynb", "only-dirs/b/x.ipynb", "empty/"]
+            for key in keys:
+                s3.put_object(Bucket=bucket, Key=key, Body=b"{}")
+        return SimplifiedS3ContentsManager(bucket=bucket, prefix="")
+
+    def list_all(self, manager, path, limit):
+        pages = []
+        cursor = None
+        while True:
+            model = manager.list_folder_page(path, limit, cursor=cursor)
+            pages.append([item["name"] for item in model["content"]])
+            cursor = model["next_cursor"]
+            if cursor is None:
+                return pages
+
+    @pytest.mark.parametrize("limit", [1, 4, 5, 7, 30, 1000])
+    def test_directories_first(self, manager, limit):
+        pages = self.list_all(manager, "big", limit)
+        assert sum(pages, []) == self.DIRECTORIES + self.FILES
+        assert all(len(page) <= limit for page in pages)
+        assert all(len(page) == limit for page in pages[:-2])
+
+    def test_page(self, manager):
+        model = manager.list_folder_page("big", 3)
+        assert model["type"] == "directory"
+        assert model["path"] == "big"
+        assert [(item["path"], item["type"]) for item in model["content"]] == [
+            ("big/dir-0", "directory"),
+            ("big/dir-1", "directory"),
+            ("big/dir-2", "directory"),
+        ]
+        model = manager.list_folder_page("big", 3, cursor=model["next_cursor"])
+        assert [(item["path"], item["type"]) for item in model["content"]] == [
+            ("big/dir-3", "directory"),
+            ("big/dir-4", "directory"),
+            ("big/file-00.ipynb", "notebook"),
+        ]
+        assert model["content"][2]["etag"]
+
+    def test_folder_without_files_listed_once(self, manager):
+        with mock.patch.object(
+            manager.client, "list_objects_v2", wraps=manager.client.list_objects_v2
+        ) as m:
+            assert self.list_all(manager, "only-dirs", 10) == [["a", "b"]]
+            assert m.call_count == 1
+
+    def test_pages_resume(self, manager):
+        manager.max_keys = 10
+        with mock.patch.object(
+            manager.client, "list_objects_v2", wraps=manager.client.list_objects_v2
+        ) as m:
+            model = manager.list_folder_page("big", 7)
+            # 32 keys and directories, all read to find the directories.
+            assert m.call_count == 4
+            m.reset_mock()
+            model = manager.list_folder_page("big", 7, cursor=model["next_cursor"])
+            assert [item["name"] for item in model["content"]] == self.FILES[2:9]
+            assert m.call_count == 1
+
+    def test_directories_cached(self, manager):
+        manager.max_keys = 10
+        first = manager.list_folder_page("big", 7)
+        with mock.patch.object(
+            manager.client, "list_objects_v2", wraps=manager.client.list_objects_v2
+        ) as m:
+            assert manager.list_folder_page("big", 7) == first
+            assert m.call_count == 1
+            m.reset_mock()
+            manager.invalidate("big")
+            assert manager.list_folder_page("big", 7) == first
+            assert m.call_count == 4
+
+    @pytest.mark.parametrize(
+        "path,expected_type",
+        [("empty", "directory"), ("big/file-00.ipynb", "notebook")],
+    )
+    def test_nothing_listed(self, manager, path, expected_type):
+        model = manager.list_folder_page(path, 10)
+        assert model["type"] == expected_type
+        if expected_type == "directory":
+            assert model["content"] == []
+            assert model["next_cursor"] is None
+
+    def test_not_found(self, manager):
+        with pytest.raises(HTTPError) as e:
+            manager.list_folder_page("not-exist", 10)
+        assert e.value.status_code == 404
+
+    @pytest.mark.parametrize(
+        "cursor",
+        [
+            "not-a-cursor",
+            encode_cursor({"after": "x"}),
+            encode_cursor({"phase": "unknown"}),
+            encode_cursor({"phase": "files", "after": 1}),
+        ],
+    )
+    def test_invalid_cursor(self, manager, cursor):
+        with pytest.raises(HTTPError) as e:
+            manager.list_folder_page("big", 10, cursor=cursor)
+        assert e.value.status_code == 400
+
+
+class TestMetadataIndex:
+    @pytest.fixture
+    def manager(self, s3, tmpdir):
+        bucket = "test-indexed-bucket"
+        if bucket not in [b["Name"] for b in s3.list_buckets()["Buckets"]]:
+            s3.create_bucket(Bucket=bucket)
+            keys = ["root/", "root/a.ipynb", "root/.hidden", "root/b/c.ipynb"]
+            keys += ["root/b/d/", "root/e/f/report.ipynb", "other.txt"]
+            for key in keys:
+                s3.put_object(Bucket=bucket, Key=key, Body=b"{}")
+        return SimplifiedS3ContentsManager(
+            bucket=bucket, prefix="root", index_path=str(tmpdir.join("index.sqlite"))
+        )
+
+    def listing(self, items):
+        return sorted((item["path"], item["type"]) for item in items)
+
+    def test_crawl(self, manager):
+        assert manager.crawl() == 7
+        with mock.patch.object(manager, "_list_folder") as m:
+            assert self.listing(manager.list_folder("")) == [
+                ("a.ipynb", "notebook"),
+                ("b", "directory"),
+                ("e", "directory"),
+            ]
+            assert self.listing(manager.list_folder("b")) == [
+                ("b/c.ipynb", "notebook"),
+                ("b/d", "directory"),
+            ]
+            assert manager.list_folder("b/d") == []
+            assert self.listing(manager.list_folder("e/f")) == [
+                ("e/f/report.ipynb", "notebook")
+            ]
+            m.assert_not_called()
+
+    def test_crawl_matches_list_folder(self, manager):
+        manager.crawl()
+        for path in ["", "b", "e", "e/f"]:
+            indexed = manager.list_folder(path)
+            listed = manager._list_folder(path)
+            assert sorted(indexed, key=lambda item: item["path"]) == sorted(
+                listed, key=lambda item: item["path"]
+            )
+
+    def test_crawl_prefix(self, manager):
+        assert manager.crawl("e") == 2
+        assert manager.index.list_folder("") is None
+        assert self.listing(manager.index.list_folder("e")) == [("e/f", "directory")]
+
+    def test_list_folder_fills_index(self, manager):
+        with mock.patch.object(
+            manager, "_list_folder", wraps=manager._list_folder
+        ) as m:
+            first = self.listing(manager.list_folder("b"))
+            assert self.listing(manager.list_folder("b")) == first
+            assert m.call_count == 1
+
+    def test_list_folder_max_age(self, manager):
+        manager.index_max_age = 0
+        with mock.patch.object(
+            manager, "_list_folder", wraps=manager._list_folder
+        ) as m:
+            manager.list_folder("b")
+            manager.list_folder("b")
+            assert m.call_count == 2
+
+    def test_invalidate(self, manager, s3):
+        manager.list_folder("b")
+        s3.put_object(Bucket=manager.bucket, Key="root/b/new.ipynb", Body=b"{}")
+        try:
+            assert "b/new.ipynb" not in dict(self.listing(manager.list_folder("b")))
+            manager.invalidate("b")
+            assert "b/new.ipynb" in dict(self.listing(manager.list_folder("b")))
+        finally:
+            s3.delete_object(Bucket=manager.bucket, Key="root/b/new.ipynb")
+
+    def test_index_max_age_default(self, manager):
+        assert manager.index_max_age == 300
+
+    def test_list_folder_page(self, manager):
+        manager.crawl()
+        with mock.patch.object(manager.client, "list_objects_v2") as m:
+            model = manager.list_folder_page("", 2)
+            assert [item["name"] for item in model["content"]] == ["b", "e"]
+            model = manager.list_folder_page("", 2, cursor=model["next_cursor"])
+            assert [item["name"] for item in model["content"]] == ["a.ipynb"]
+            assert model["next_cursor"] is None
+            m.assert_not_called()
+
+    def test_list_folder_page_not_indexed(self, manager):
+        model = manager.list_folder_page("b", 10)
+        assert [item["name"] for item in model["content"]] == ["d", "c.ipynb"]
+        assert manager.list_folder_page("a.ipynb", 10)["type"] == "notebook"
+
+    def test_list_folder_page_invalid_cursor(self, manager):
+        with pytest.raises(HTTPError) as e:
+            manager.list_folder_page("", 10, cursor=encode_cursor({"offset": -1}))
+        assert e.value.status_code == 400
+
+    def test_search(self, manager):
+        manager.crawl()
+        assert [item["path"] for item in manager.search("REP")] == ["e/f/report.ipynb"]
+
+    def test_without_index(self, manager):
+        manager.index = None
+        assert manager.search("a") is None
+        with pytest.raises(ValueError):
+            manager.crawl()
@@ -0,0 +1,85 @@
+from unittest import mock
+
+import pytest
+
+from callisto.core.cache import LRUCache
+from callisto.core.cache import deep_sizeof
+
+
+def test_deep_sizeof():
+    small = {"cells": [{"source": "x"}]}
+    large = {"cells": [{"source": "x" * 1000}]}
+    assert deep_sizeof(large) - deep_sizeof(small) >= 999
+
+
+class TestLRUCache:
+    def test_get_set(self):
+        cache = LRUCache(10)
+        assert cache.get("a") is None
+        cache.set("a", 1)
+        assert cache.get("a") == 1
+        assert "a" in cache
+        assert cache.stats() == {
+            "entries": 1,
+            "max_entries": 10,
+            "bytes": None,
+            "max_bytes": None,
+            "hits": 1,
+            "misses": 1,
+            "evictions": 0,
+        }
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert "a" in cache
+        assert "b" not in cache
+        assert "c" in cache
+        assert cache.evictions == 1
+
+    def test_ttl(self):
+        cache = LRUCache(10, ttl=5)
+        with mock.patch("time.monotonic", return_value=100):
+            cache.set("a", 1)
+        with mock.patch("time.monotonic", return_value=104):
+            assert cache.get("a") == 1
+        with mock.patch("time.monotonic", return_value=106):
+            assert cache.get("a") is None
+        assert len(cache) == 0
+
+    @pytest.mark.parametrize("max_entries,ttl", [(0, None), (10, 0)])
+    def test_disabled(self, max_entries, ttl):
+        cache = LRUCache(max_entries, ttl=ttl)
+        cache.set("a", 1)
+        assert cache.get("a") is None
+
+    def test_pop_and_clear(self):
+        cache = LRUCache(10)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        assert cache.pop("a") == 1
+        assert cache.pop("a") is None
+        cache.clear()
+        assert len(cache) == 0
+
+    def test_max_bytes(self):
+        cache = LRUCache(10, max_bytes=10, sizeof=len)
+        cache.set("a", "1234")
+        cache.set("b", "1234")
+        assert cache.stats()["bytes"] == 8
+        cache.set("c", "1234")
+        assert "a" not in cache
+        assert cache.stats()["bytes"] == 8
+
+    def test_evict_reweighs_values(self):
+        cache = LRUCache(10, max_bytes=10, sizeof=len)
+        value = ["x"]
+        cache.set("a", value)
+        cache.set("b", ["x"])
+        value.extend(["x"] * 9)
+        cache.evict()
+        assert "a" not in cache
+        assert "b" in cache
@@ -0,0 +1,50 @@
+import gzip
+from unittest import mock
+
+import pytest
+from werkzeug.datastructures import Accept
+
+from callisto.core import compression
+
+
+@pytest.mark.parametrize(
+    "accept,has_brotli,expected",
+    [
+        ([("gzip", 1), ("br", 1)], True, "br"),
+        ([("gzip", 1), ("br", 0.5)], True, "gzip"),
+        ([("gzip", 1), ("br", 1)], False, "gzip"),
+        ([("identity", 1)], True, None),
+        ([], True, None),
+    ],
+)
+def test_choose_encoding(accept, has_brotli, expected):
+    with mock.patch.object(compression, "brotli", mock.Mock() if has_brotli else None):
+        assert compression.choose_encoding(Accept(accept)) == expected
+
+
+@pytest.mark.parametrize(
+    "mimetype,expected",
+    [
+        ("text/html", True),
+        ("application/json", True),
+        ("image/png", False),
+        (None, False),
+    ],
+)
+def test_is_compressible(mimetype, expected):
+    assert compression.is_compressible(mimetype) is expected
+
+
+def test_compress_gzip():
+    assert gzip.decompress(compression.compress(b"data", "gzip")) == b"data"
+
+
+@pytest.mark.skipif(compression.brotli is None, reason="brotli is not installed")
+def test_compress_brotli():
+    brotli = compression.brotli
+    assert brotli.decompress(compression.compress(b"data", "br")) == b"data"
+
+
+def test_compress_unsupported():
+    with pytest.raises(ValueError):
+        compression.compress(b"data", "deflate")
@@ -0,0 +1,177 @@
+import os
+from unittest import mock
+
+import nbformat
+import pytest
+from jupyter_server.services.contents.filemanager import FileContentsManager
+
+from callisto.core.callisto_config import CallistoConfig
+from callisto.core.content_index import ContentIndex
+from callisto.core.content_index import ContentIndexer
+from callisto.core.content_index import extract_sources
+from callisto.core.content_index import match_query
+from callisto.core.contents_loader import ContentsLoader
+from callisto.core.single_flight import ProcessLock
+
+
+def make_notebook(markdown="", code=""):
+    nb = nbformat.v4.new_notebook()
+    nb.cells.append(nbformat.v4.new_markdown_cell(markdown))
+    nb.cells.append(nbformat.v4.new_code_cell(code))
+    nb.cells.append(nbformat.v4.new_raw_cell("raw text"))
+    return nb
+
+
+def paths(results):
+    return [result["path"] for result in results]
+
+
+def test_extract_sources():
+    nb = make_notebook("# Title", "print(1)")
+    nb.cells.append(nbformat.v4.new_code_cell(["a = ", "1"]))
+    assert extract_sources(nb) == {"markdown": "# Title", "code": "print(1)\n\na = 1"}
+
+
+@pytest.mark.parametrize(
+    "query,expected",
+    [
+        ("sales", '"sales"'),
+        (" daily  sales ", '"daily" "sales"'),
+        ('a"b OR c', '"a""b" "OR" "c"'),
+        ("   ", ""),
+    ],
+)
+def test_match_query(query, expected):
+    assert match_query(query) == expected
+
+
+class TestContentIndex:
+    @pytest.fixture
+    def index(self, tmpdir):
+        index = ContentIndex(str(tmpdir.join("index", "content.sqlite")))
+        index.update(
+            "team/sales.ipynb",
+            "1",
+            make_notebook("# Daily sales", "df = read_table('warehouse.sales_daily')"),
+        )
+        index.update(
+            "team/users.ipynb",
+            "2",
+            make_notebook("Users <b>report</b>", "spark.table('warehouse.users')"),
+        )
+        return index
+
+    def test_search_code(self, index):
+        assert paths(index.search("sales_daily")) == ["team/sales.ipynb"]
+        assert paths(index.search("warehouse")) == [
+            "team/sales.ipynb",
+            "team/users.ipynb",
+        ]
+
+    def test_search_every_word(self, index):
+        assert paths(index.search("warehouse users")) == ["team/users.ipynb"]
+        assert index.search("warehouse nothing") == []
+
+    def test_search_words(self, index):
+        assert index.search("ware") == []
+
+    def test_search_limit(self, index):
+        assert len(index.search("warehouse", limit=1)) == 1
+
+    def test_search_result(self, index):
+        [result] = index.search("report")
+        assert result["name"] == "users.ipynb"
+        assert result["last_modified"] == "2"
+        assert result["snippet"] == "Users &lt;b&gt;<mark>report</mark>&lt;/b&gt;"
+
+    @pytest.mark.parametrize("query", ["", "raw", "(", '"', "* OR"])
+    def test_search_nothing(self, index, query):
+        assert index.search(query) == []
+
+    def test_update(self, index):
+        index.update("team/sales.ipynb", "3", make_notebook("", "other"))
+        assert index.search("sales_daily") == []
+        assert paths(index.search("other")) == ["team/sales.ipynb"]
+        assert index.indexed() == {"team/sales.ipynb": "3", "team/users.ipynb": "2"}
+
+    def test_remove(self, index):
+        index.remove("team/sales.ipynb")
+        index.remove("missing.ipynb")
+        assert paths(index.search("warehouse")) == ["team/users.ipynb"]
+        assert index.stats()["notebooks"] == 1
+
+
+class TestContentIndexer:
+    @pytest.fixture
+    def root(self, tmpdir):
+        root = tmpdir.mkdir("root")
+        nbformat.write(make_notebook(code="orders"), str(root.join("top.ipynb")))
+        folder = root.mkdir("folder")
+        nbformat.write(make_notebook(code="orders"), str(folder.join("a.ipynb")))
+        root.join("broken.ipynb").write("not json")
+        root.join("data.csv").write("orders")
+        return root
+
+    @pytest.fixture
+    def loader(self, root, tmpdir):
+        return ContentsLoader(
+            CallistoConfig(
+                contents_manager_cls=FileContentsManager,
+                contents_manager_kwargs={"root_dir": str(root)},
+                content_index_path=str(tmpdir.join("content.sqlite")),
+            )
+        )
+
+    def test_run_once(self, loader):
+        indexer = ContentIndexer(loader, loader.content_index)
+        assert indexer.run_once() == 2
+        assert sorted(paths(loader.search_content("orders", 10))) == [
+            "folder/a.ipynb",
+            "top.ipynb",
+        ]
+        assert indexer.run_once() == 0
+
+    def test_run_once_changed(self, loader, root):
+        indexer = ContentIndexer(loader, loader.content_index)
+        indexer.run_once()
+        path = str(root.join("top.ipynb"))
+        nbformat.write(make_notebook(code="customers"), path)
+        stat = os.stat(path)
+        os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+        assert indexer.run_once() == 1
+        assert paths(loader.search_content("customers", 10)) == ["top.ipynb"]
+        assert paths(loader.search_content("orders", 10)) == ["folder/a.ipynb"]
+
+    def test_run_once_removed(self, loader, root):
+        indexer = ContentIndexer(loader, loader.content_index)
+        indexer.run_once()
+        root.join("folder", "a.ipynb").remove()
+        assert indexer.run_once() == 0
+        assert paths(loader.search_content("orders", 10)) == ["top.ipynb"]
+
+    def test_run_once_prefixes(self, loader, root):
+        ContentIndexer(loader, loader.content_index).run_once()
+        indexer = ContentIndexer(loader, loader.content_index, prefixes=["/folder/"])
+        root.join("top.ipynb").remove()
+        root.join("folder", "a.ipynb").remove()
+        indexer.run_once()
+        # Notebooks outside of the prefixes are left alone.
+        assert paths(loader.search_content("orders", 10)) == ["top.ipynb"]
+
+    def test_run_forever_with_lock(self, loader, tmpdir):
+        path = str(tmpdir.join("content-index.lock"))
+        other = ProcessLock(path)
+        indexer = ContentIndexer(loader, loader.content_index)
+        with mock.patch.object(indexer, "run_once") as run_once, mock.patch.object(
+            indexer._stop, "wait", side_effect=lambda interval: indexer.stop()
+        ):
+            assert other.acquire()
+            indexer.run_forever(60, lock=ProcessLock(path))
+            assert run_once.call_count == 0
+
+            other.release()
+            indexer._stop.clear()
+            indexer.run_forever(60, lock=ProcessLock(path))
+            assert run_once.call_count == 1
+        # The lock is released once stopped.
+        assert other.acquire()
@@ -1,13 +1,20 @@
+import os
 from unittest import mock
 
 import pytest
+from jupyter_server.services.contents.filemanager import FileContentsManager
 from jupyter_server.services.contents.manager import ContentsManager
 from tornado.web import HTTPError as TornadoHTTPError
 from werkzeug import exceptions as FlaskHTTPExceptions
 
 from callisto.core.contents_loader import ContentsLoader
+from callisto.core.private_loader import PrivateLoader
 from callisto.core.callisto_config import CallistoConfig
+from callisto.core.listing import encode_cursor
 from callisto.core.notebook_content import NotebookContent
+from callisto.core.notebook_content import _NotebookVersion
+from callisto.core.outputs import blob_key
+from callisto.core.render_cache import LocalDirectoryRenderCache
 
 
 class TestLoader:
@@ -17,8 +24,7 @@ class TestLoader:
             yield m
 
     def test_init_str_class(self, mock_import_module):
-        config = mock.MagicMock(spec=CallistoConfig)
-        config.contents_manager_cls = "fake.module.FakeContentsManager"
+        config = CallistoConfig(contents_manager_cls="fake.module.FakeContentsManager")
         loader = ContentsLoader(config)
         assert (
             loader.contents_manager
@@ -31,21 +37,154 @@ class TestLoader:
             def __init__(self, **kwargs):
                 self.kwargs = kwargs
 
-        config = mock.MagicMock(spec=CallistoConfig)
-        config.contents_manager_cls = Dummy
-        config.contents_manager_kwargs = {"foo": "bar"}
+        config = CallistoConfig(
+            contents_manager_cls=Dummy, contents_manager_kwargs={"foo": "bar"}
+        )
 
         loader = ContentsLoader(config)
         assert isinstance(loader.contents_manager, Dummy)
         assert loader.contents_manager.kwargs == {"foo": "bar"}
 
+    def test_init_render_cache(self, tmpdir):
+        config = CallistoConfig(
+            render_cache_cls="callisto.core.render_cache.LocalDirectoryRenderCache",
+            render_cache_kwargs={"directory": str(tmpdir), "max_bytes": 100},
+        )
+        loader = ContentsLoader(config)
+        assert isinstance(loader.render_cache, LocalDirectoryRenderCache)
+        assert loader.render_cache.max_bytes == 100
+        assert loader.cache_stats()["render"]["max_bytes"] == 100
+
+    def test_init_without_render_cache(self):
+        assert ContentsLoader(CallistoConfig()).render_cache is None
+
+    def test_exporter_options(self):
+        assert ContentsLoader(CallistoConfig()).exporter_options == {
+            "template_name": "classic"
+        }
+        loader = ContentsLoader(
+            CallistoConfig(exporter_options={"exclude_input": True})
+        )
+        assert loader.exporter_options == {
+            "template_name": "classic",
+            "exclude_input": True,
+        }
+
+    def test_output_blob_requires_render_cache(self):
+        with pytest.raises(ValueError):
+            ContentsLoader(CallistoConfig(output_blob_min_size=1000))
+
+    def test_outputs(self, tmpdir):
+        loader = ContentsLoader(
+            CallistoConfig(
+                render_cache_cls=LocalDirectoryRenderCache,
+                render_cache_kwargs={"directory": str(tmpdir)},
+                output_blob_min_size=1000,
+            )
+        )
+        assert loader.render_settings == {"output_blob_min_size": 1000}
+        notebook = {"cells": [], "nbformat": 4}
+        assert loader.prepare_notebook(notebook, "nb.ipynb") is not notebook
+
+        assert loader.get_output("abcd") is None
+        loader.store_output("abcd", b"image")
+        assert loader.get_output("abcd") == b"image"
+
+    def test_private_outputs_inline(self, tmpdir):
+        loader = PrivateLoader(
+            CallistoConfig(
+                render_cache_cls=LocalDirectoryRenderCache,
+                render_cache_kwargs={"directory": str(tmpdir)},
+                output_blob_min_size=1000,
+            )
+        )
+        assert loader.render_settings == {}
+        notebook = {"cells": [], "nbformat": 4}
+        assert loader.prepare_notebook(notebook, "nb.ipynb") is notebook
+
+    def test_touch_outputs(self, tmpdir):
+        loader = ContentsLoader(
+            CallistoConfig(
+                render_cache_cls=LocalDirectoryRenderCache,
+                render_cache_kwargs={"directory": str(tmpdir)},
+                output_blob_min_size=1000,
+            )
+        )
+        digest = "ab" * 32
+        html = f'<img loading="lazy" src="/api/notebook/output/{digest}.png">'
+        assert not loader.touch_outputs(html)
+        loader.store_output(digest, b"image")
+        path = loader.render_cache._path(blob_key(digest))
+        os.utime(path, (1, 1))
+        assert loader.touch_outputs(html)
+        assert os.stat(path).st_mtime > 1
+        # Storing an output again only marks it as used.
+        os.utime(path, (1, 1))
+        with mock.patch.object(loader.render_cache, "set") as set_:
+            loader.store_output(digest, b"image")
+        assert set_.call_count == 0
+        assert os.stat(path).st_mtime > 1
+
+    def test_touch_outputs_without_blobs(self):
+        loader = ContentsLoader(CallistoConfig())
+        assert loader.touch_outputs('<img src="/api/notebook/output/x.png">')
+
+    def test_prepare_notebook_unchanged(self):
+        loader = ContentsLoader(CallistoConfig())
+        assert loader.render_settings == {}
+        notebook = {"cells": [], "nbformat": 4}
+        assert loader.prepare_notebook(notebook, "nb.ipynb") is notebook
+
+    @pytest.mark.parametrize(
+        "loader_cls,url",
+        [
+            (ContentsLoader, "/api/notebook/output-text/"),
+            (PrivateLoader, "/api/notebook/private-output-text/"),
+        ],
+    )
+    def test_prepare_notebook_max_output_size(self, loader_cls, url):
+        loader = loader_cls(CallistoConfig(max_output_size=5))
+        assert loader.render_settings == {"max_output_size": 5}
+        output = {"output_type": "stream", "name": "stdout", "text": "0123456789"}
+        notebook = {"cells": [{"cell_type": "code", "outputs": [output]}]}
+        prepared = loader.prepare_notebook(notebook, "a dir/nb.ipynb", first_cell=3)
+        truncated, link = prepared["cells"][0]["outputs"]
+        assert truncated["text"] == "01234"
+        assert (
+            f'href="{url}a%20dir/nb.ipynb?cell=3&amp;output=0"'
+            in link["data"]["text/html"]
+        )
+
+    def test_render_lock(self, tmpdir):
+        loader = ContentsLoader(CallistoConfig())
+        with loader.render_lock("key"):
+            pass
+        loader = ContentsLoader(CallistoConfig(render_lock_directory=str(tmpdir)))
+        with loader.render_lock("key"):
+            assert tmpdir.join("key.lock").exists()
+
+    def test_init_render_pool(self):
+        assert ContentsLoader(CallistoConfig()).render_pool is None
+        loader = ContentsLoader(CallistoConfig(render_workers=2, render_timeout=5))
+        assert loader.render_pool.max_workers == 2
+        assert loader.render_pool.timeout == 5
+        assert loader.cache_stats()["render_pool"]["pending"] == 0
+
+    def test_init_shared_render_pool(self):
+        config = CallistoConfig(render_workers=2)
+        loader = ContentsLoader(config)
+        private_loader = PrivateLoader(config, render_pool=loader.render_pool)
+        assert private_loader.render_pool is loader.render_pool
+
     @pytest.fixture
     def contents_manager(self):
         return mock.MagicMock(spec=ContentsManager)
 
     @pytest.fixture
     def loader(self, mock_import_module, contents_manager):
-        loader = ContentsLoader(mock.MagicMock(spec=CallistoConfig))
+        loader = ContentsLoader(
+            CallistoConfig(contents_manager_cls="fake.module.FakeContentsManager")
+        )
         loader.contents_manager = contents_manager
         return loader
 
@@ -66,6 +205,238 @@ class TestLoader:
         with pytest.raises(FlaskHTTPExceptions.BadRequest):
             loader.get("/bad-request")
 
+    def test_get_directory_cached(self, loader, contents_manager):
+        contents_manager.get.return_value = {"type": "directory", "content": []}
+        assert loader.get("/folder") == {"type": "directory", "content": []}
+        assert loader.get("/folder") == {"type": "directory", "content": []}
+        contents_manager.get.assert_called_once_with("/folder", content=True)
+        assert loader.cache_stats()["listing"]["hits"] == 1
+
+    def test_get_directory_cache_returns_copy(self, loader, contents_manager):
+        contents_manager.get.return_value = {"type": "directory", "content": []}
+        loader.get("/folder")["content"] = "changed"
+        assert loader.get("/folder")["content"] == []
+
+    @pytest.mark.parametrize(
+        "kwargs", [{"content": False}, {"type": "file"}, {"type": "notebook"}]
+    )
+    def test_get_not_cached(self, loader, contents_manager, kwargs):
+        contents_manager.get.return_value = {"type": "directory", "content": None}
+        loader.get("/folder", **kwargs)
+        loader.get("/folder", **kwargs)
+        assert contents_manager.get.call_count == 2
+
+    def test_get_file_not_cached(self, loader, contents_manager):
+        contents_manager.get.return_value = {"type": "file", "content": "content"}
+        loader.get("/file")
+        loader.get("/file")
+        assert contents_manager.get.call_count == 2
+
+    def test_invalidate_listing(self, loader, contents_manager):
+        contents_manager.get.return_value = {"type": "directory", "content": []}
+        loader.get("/folder")
+        loader.invalidate_listing("/folder")
+        loader.get("/folder")
+        assert contents_manager.get.call_count == 2
+
+    def test_invalidate_listing_contents_manager(self, loader, contents_manager):
+        contents_manager.invalidate = mock.Mock()
+        loader.invalidate_listing("/folder")
+        contents_manager.invalidate.assert_called_once_with("/folder")
+
+    def test_open_stream_unsupported(self, loader):
+        assert loader.open_stream("/path/file") is None
+
+    def test_open_stream(self, loader, contents_manager):
+        contents_manager.open_stream = mock.Mock(return_value={"content": []})
+        assert loader.open_stream("/path/file") == {"content": []}
+        contents_manager.open_stream.assert_called_once_with(
+            "/path/file", byte_range=None
+        )
+
+    def test_open_stream_not_found(self, loader, contents_manager):
+        contents_manager.open_stream = mock.Mock(
+            side_effect=TornadoHTTPError(404, "file not found")
+        )
+        with pytest.raises(FlaskHTTPExceptions.NotFound):
+            loader.open_stream("/path/not-exist")
+
+    @pytest.fixture
+    def file_loader(self, tmpdir):
+        tmpdir.join("data.csv").write_binary(b"a,b\n1,2\n")
+        tmpdir.mkdir("folder")
+        return ContentsLoader(
+            CallistoConfig(
+                contents_manager_cls=FileContentsManager,
+                contents_manager_kwargs={"root_dir": str(tmpdir)},
+            )
+        )
+
+    def test_open_stream_local_file(self, file_loader):
+        result = file_loader.open_stream("data.csv")
+        assert result["size"] == 8
+        assert result["name"] == "data.csv"
+        assert b"".join(result["content"]) == b"a,b\n1,2\n"
+
+    @pytest.mark.parametrize(
+        "byte_range,content_range,expected",
+        [
+            ((2, 5), (2, 5), b"b\n1"),
+            ((2, None), (2, 8), b"b\n1,2\n"),
+            ((-3, None), (5, 8), b",2\n"),
+            ((2, 100), (2, 8), b"b\n1,2\n"),
+        ],
+    )
+    def test_open_stream_local_file_range(
+        self, file_loader, byte_range, content_range, expected
+    ):
+        result = file_loader.open_stream("data.csv", byte_range=byte_range)
+        assert result["size"] == 8
+        assert result["content_range"] == content_range
+        assert b"".join(result["content"]) == expected
+
+    def test_list_page(self, file_loader, tmpdir):
+        for name in ["b.csv", "c.txt"]:
+            tmpdir.join(name).write("x")
+        tmpdir.mkdir("another")
+        names = []
+        cursor = None
+        while True:
+            model = file_loader.list_page("", 2, cursor=cursor)
+            assert model["type"] == "directory"
+            assert len(model["content"]) <= 2
+            names += [item["name"] for item in model["content"]]
+            cursor = model["next_cursor"]
+            if cursor is None:
+                break
+        assert names == ["another", "folder", "b.csv", "c.txt", "data.csv"]
+
+    def test_list_page_file(self, file_loader):
+        assert file_loader.list_page("data.csv", 2)["type"] == "file"
+
+    @pytest.mark.parametrize(
+        "cursor",
+        ["invalid", encode_cursor({"offset": -1}), encode_cursor({"offset": "1"})],
+    )
+    def test_list_page_invalid_cursor(self, file_loader, cursor):
+        with pytest.raises(FlaskHTTPExceptions.BadRequest):
+            file_loader.list_page("", 2, cursor=cursor)
+
+    def test_list_page_contents_manager(self, loader, contents_manager):
+        contents_manager.list_folder_page = mock.Mock(
+            return_value={"type": "directory"}
+        )
+        assert loader.list_page("folder", 10, cursor="abc") == {"type": "directory"}
+        contents_manager.list_folder_page.assert_called_once_with(
+            "folder", 10, cursor="abc"
+        )
+        contents_manager.list_folder_page.side_effect = TornadoHTTPError(400, "bad")
+        with pytest.raises(FlaskHTTPExceptions.BadRequest):
+            loader.list_page("folder", 10, cursor="abc")
+
+    @pytest.fixture
+    def tree_loader(self, file_loader, tmpdir):
+        folder = tmpdir.join("folder")
+        folder.join("a.ipynb").write("{}")
+        folder.mkdir("nested").join("b.ipynb").write("{}")
+        folder.join(".hidden").write("")
+        return file_loader
+
+    def test_list_tree(self, tree_loader):
+        model = tree_loader.list_tree("", 3)
+        assert model["type"] == "directory"
+        assert model["truncated"] is False
+        folder, data = model["content"]
+        assert data["path"] == "data.csv"
+        assert [item["path"] for item in folder["content"]] == [
+            "folder/nested",
+            "folder/a.ipynb",
+        ]
+        assert [item["path"] for item in folder["content"][0]["content"]] == [
+            "folder/nested/b.ipynb"
+        ]
+        # The cached listing is left as it was.
+        assert tree_loader.get("")["content"][0].get("content") is None
+
+    def test_list_tree_depth(self, tree_loader):
+        folder, _ = tree_loader.list_tree("", 2)["content"]
+        assert folder["content"][0]["content"] is None
+        [nested, _] = tree_loader.list_tree("folder", 1)["content"]
+        assert nested["content"] is None
+
+    def test_list_tree_max_entries(self, tree_loader):
+        tree_loader.tree_max_entries = 4
+        model = tree_loader.list_tree("", 3)
+        assert model["truncated"] is True
+        assert len(model["content"][0]["content"]) == 2
+        assert model["content"][0]["content"][0]["content"] is None
+
+    def test_list_tree_file(self, tree_loader):
+        assert tree_loader.list_tree("data.csv", 2)["type"] == "file"
+
+    def test_list_tree_contents_manager(self, loader, contents_manager):
+        contents_manager.get.return_value = {
+            "type": "directory",
+            "content": [{"name": "a", "path": "a", "type": "directory"}],
+        }
+        contents_manager.list_folder = mock.Mock(
+            return_value=[{"name": "x.ipynb", "path": "a/x.ipynb", "type": "notebook"}]
+        )
+        model = loader.list_tree("", 2)
+        assert model["content"][0]["content"][0]["path"] == "a/x.ipynb"
+        contents_manager.list_folder.assert_called_once_with("a")
+
+        contents_manager.list_folders = mock.Mock(return_value=[[]])
+        assert loader.list_tree("", 2)["content"][0]["content"] == []
+        contents_manager.list_folders.assert_called_once_with(["a"])
+
+    def test_list_tree_unlisted_folder(self, loader, contents_manager):
+        contents_manager.get.side_effect = [
+            {
+                "type": "directory",
+                "content": [{"name": "a", "path": "a", "type": "directory"}],
+            },
+            TornadoHTTPError(403, "denied"),
+        ]
+        assert loader.list_tree("", 2)["content"][0]["content"] == []
+
+    def test_search(self, loader, contents_manager):
+        contents_manager.search = mock.Mock(return_value=[{"name": "a.ipynb"}])
+        assert loader.search("a", 10) == [{"name": "a.ipynb"}]
+        contents_manager.search.assert_called_once_with("a", limit=10)
+
+    def test_search_without_index(self, loader, file_loader, contents_manager):
+        contents_manager.search = mock.Mock(return_value=None)
+        with pytest.raises(FlaskHTTPExceptions.NotImplemented):
+            loader.search("a", 10)
+        with pytest.raises(FlaskHTTPExceptions.NotImplemented):
+            file_loader.search("a", 10)
+
+    def test_search_content_without_index(self, file_loader):
+        with pytest.raises(FlaskHTTPExceptions.NotImplemented):
+            file_loader.search_content("a", 10)
+
+    def test_content_index_interval_without_path(self):
+        with pytest.raises(ValueError):
+            ContentsLoader(CallistoConfig(content_index_interval=60))
+
+    def test_open_stream_local_file_read(self, file_loader):
+        assert file_loader.open_stream("data.csv")["content"].read() == b"a,b\n1,2\n"
+        result = file_loader.open_stream("data.csv", byte_range=(2, 5))
+        assert result["content"].read() == b"b\n1"
+        assert result["content"].f.closed
+
+    @pytest.mark.parametrize(
+        "path,error",
+        [
+            ("not-exist.csv", FlaskHTTPExceptions.NotFound),
+            ("folder", FlaskHTTPExceptions.BadRequest),
+        ],
+    )
+    def test_open_stream_local_file_error(self, file_loader, path, error):
+        with pytest.raises(error):
+            file_loader.open_stream(path)
+
     def test_info(self, loader, contents_manager):
         contents_manager.get.return_value = {"name": "filename"}
         assert loader.info("/path/filename") == {"name": "filename"}
@@ -78,3 +449,18 @@ class TestLoader:
         assert f1 is f3
         assert f1 is not f2
         assert all(isinstance(f, NotebookContent) for f in [f1, f2, f3])
+
+    def test_get_nb_bounded_by_bytes(self, loader):
+        loader.notebook_cache.max_bytes = 100
+        f1 = loader.get_nb("/file_1")
+        f1._version = _NotebookVersion(
+            content="x" * 200, last_modified=None, etag=None, model_path="file_1"
+        )
+        loader.get_nb("/file_2")
+        assert loader.get_nb("/file_1") is not f1
+        assert loader.cache_stats()["notebook"]["evictions"] == 1
+
+    def test_open_stream_local_file_range_not_satisfiable(self, file_loader):
+        with pytest.raises(FlaskHTTPExceptions.RequestedRangeNotSatisfiable) as e:
+            file_loader.open_stream("data.csv", byte_range=(100, None))
+        assert dict(e.value.get_headers())["Content-Range"] == "bytes */8"
@@ -0,0 +1,127 @@
+import base64
+import os
+
+import pytest
+from jupyter_server.services.contents.filemanager import FileContentsManager
+
+from callisto.core.listing import decode_cursor
+from callisto.core.listing import directories_first
+from callisto.core.listing import encode_cursor
+from callisto.core.listing import list_local_folder
+from callisto.core.listing import list_tree
+
+
+def test_directories_first():
+    items = [
+        {"name": "b.ipynb", "type": "notebook"},
+        {"name": "z", "type": "directory"},
+        {"name": "a.csv", "type": "file"},
+        {"name": "c", "type": "directory"},
+    ]
+    assert [item["name"] for item in sorted(items, key=directories_first)] == [
+        "c",
+        "z",
+        "a.csv",
+        "b.ipynb",
+    ]
+
+
+@pytest.mark.parametrize(
+    "state",
+    [{"offset": 10}, {"phase": "files", "after": "dir/\U0010ffff", "files": True}],
+)
+def test_cursor_round_trip(state):
+    cursor = encode_cursor(state)
+    assert "=" not in cursor
+    assert "/" not in cursor and "+" not in cursor
+    assert decode_cursor(cursor) == state
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "%%%",
+        "abc",
+        base64.urlsafe_b64encode(b"[1, 2]").decode(),
+        base64.urlsafe_b64encode(b"\xff\xfe").decode(),
+    ],
+)
+def test_decode_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+FOLDERS = {
+    "": ["b.ipynb", "a/"],
+    "a": ["a/y/", "a/x.ipynb"],
+    "a/y": ["a/y/z.ipynb"],
+}
+
+
+class TestListTree:
+    @pytest.fixture
+    def listed(self):
+        return []
+
+    @pytest.fixture
+    def list_folders(self, listed):
+        def list_folders(paths):
+            listed.append(paths)
+            return [[self.item(entry) for entry in FOLDERS[path]] for path in paths]
+
+        return list_folders
+
+    def item(self, entry):
+        return {
+            "name": entry.rstrip("/").rpartition("/")[2],
+            "path": entry.rstrip("/"),
+            "type": "directory" if entry.endswith("/") else "notebook",
+            "content": None,
+        }
+
+    def names(self, items):
+        return [item["name"] for item in items]
+
+    def test_list_tree(self, list_folders, listed):
+        tree, truncated = list_tree(list_folders, "", depth=5)
+        assert not truncated
+        assert self.names(tree) == ["a", "b.ipynb"]
+        assert self.names(tree[0]["content"]) == ["y", "x.ipynb"]
+        assert self.names(tree[0]["content"][0]["content"]) == ["z.ipynb"]
+        assert tree[1]["content"] is None
+        # One call per level.
+        assert listed == [[""], ["a"], ["a/y"]]
+
+    def test_depth(self, list_folders, listed):
+        tree, truncated = list_tree(list_folders, "", depth=1)
+        assert not truncated
+        assert self.names(tree) == ["a", "b.ipynb"]
+        assert tree[0]["content"] is None
+        assert listed == [[""]]
+
+    def test_max_entries(self, list_folders):
+        tree, truncated = list_tree(list_folders, "", depth=5, max_entries=4)
+        assert truncated
+        assert self.names(tree[0]["content"]) == ["y", "x.ipynb"]
+        assert tree[0]["content"][0]["content"] is None
+
+
+@pytest.mark.parametrize("allow_hidden", [False, True])
+def test_list_local_folder(tmpdir, allow_hidden):
+    folder = tmpdir.mkdir("folder")
+    folder.join("a.ipynb").write("{}")
+    folder.join("b.txt").write("text")
+    folder.join(".hidden").write("")
+    folder.join("__pycache__").mkdir()
+    folder.mkdir("nested")
+    os.symlink(str(tmpdir.join("missing")), str(folder.join("broken")))
+    manager = FileContentsManager(root_dir=str(tmpdir), allow_hidden=allow_hidden)
+
+    keys = ["name", "path", "type", "size", "mimetype", "writable", "last_modified"]
+    listed = sorted(manager.get("folder")["content"], key=lambda item: item["name"])
+    # Broken symlinks are left out, they can't be opened anyway.
+    expected = [{key: item[key] for key in keys} for item in listed]
+    expected = [item for item in expected if item["name"] != "broken"]
+    items = sorted(list_local_folder(manager, "folder"), key=lambda i: i["name"])
+    assert [{key: item[key] for key in keys} for item in items] == expected
+    assert (".hidden" in [item["name"] for item in items]) == allow_hidden
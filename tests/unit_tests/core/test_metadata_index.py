@@ -0,0 +1,166 @@
+import datetime
+from unittest import mock
+
+import pytest
+
+from callisto.core.metadata_index import MetadataIndex
+
+MODIFIED = datetime.datetime(2021, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc)
+
+
+def file_item(path, etag="etag"):
+    return {
+        "name": path.rpartition("/")[2],
+        "path": path,
+        "last_modified": MODIFIED,
+        "etag": etag,
+        "type": "notebook" if path.endswith(".ipynb") else "file",
+    }
+
+
+def directory_item(path):
+    return {"name": path.rpartition("/")[2], "path": path, "type": "directory"}
+
+
+def names(items):
+    return [item["name"] for item in items]
+
+
+@pytest.fixture
+def index(tmpdir):
+    return MetadataIndex(str(tmpdir.join("cache", "index.sqlite")))
+
+
+@pytest.fixture
+def tree():
+    return [
+        directory_item("a"),
+        directory_item("a/b"),
+        file_item("a/b/report.ipynb"),
+        file_item("a/z.csv"),
+        file_item("a/report.ipynb"),
+        directory_item("c"),
+        file_item("c/monthly_report.ipynb"),
+        file_item("top.ipynb"),
+    ]
+
+
+def test_not_indexed(index):
+    assert index.list_folder("") is None
+    assert index.list_folder("a") is None
+
+
+def test_sync_tree(index, tree):
+    assert index.sync_tree("", tree) == 8
+    assert names(index.list_folder("")) == ["a", "c", "top.ipynb"]
+    assert names(index.list_folder("a")) == ["b", "report.ipynb", "z.csv"]
+    assert names(index.list_folder("/a/b/")) == ["report.ipynb"]
+    assert index.stats()["entries"] == 8
+
+
+def test_items(index, tree):
+    index.sync_tree("", tree)
+    directory, report, _ = index.list_folder("a")
+    assert directory["path"] == "a/b"
+    assert directory["type"] == "directory"
+    assert directory["last_modified"] is None
+    assert "etag" not in directory
+    assert report["path"] == "a/report.ipynb"
+    assert report["type"] == "notebook"
+    assert report["last_modified"] == MODIFIED
+    assert report["etag"] == "etag"
+
+
+def test_list_folder_page(index, tree):
+    index.sync_tree("", tree)
+    assert names(index.list_folder("a", limit=2)) == ["b", "report.ipynb"]
+    assert names(index.list_folder("a", limit=2, offset=2)) == ["z.csv"]
+
+
+def test_sync_tree_changes(index, tree):
+    index.sync_tree("", tree)
+    tree = [item for item in tree if item["path"] != "a/z.csv"]
+    tree[2] = file_item("a/b/report.ipynb", etag="changed")
+    index.sync_tree("", tree)
+    assert names(index.list_folder("a")) == ["b", "report.ipynb"]
+    assert index.list_folder("a/b")[0]["etag"] == "changed"
+
+
+def test_sync_subtree(index, tree):
+    index.sync_tree("", tree)
+    index.sync_tree("a", [file_item("a/new.ipynb")])
+    assert names(index.list_folder("a")) == ["new.ipynb"]
+    assert index.list_folder("a/b") is None
+    assert names(index.list_folder("")) == ["a", "c", "top.ipynb"]
+
+
+def test_sync_subtree_creates_parents(index):
+    index.sync_tree("x/y", [file_item("x/y/a.ipynb")])
+    assert names(index.list_folder("x/y")) == ["a.ipynb"]
+    assert index.search("y")[0]["path"] == "x/y"
+
+
+def test_sync_empty_subtree(index, tree):
+    index.sync_tree("", tree)
+    index.sync_tree("c", [])
+    assert names(index.list_folder("")) == ["a", "top.ipynb"]
+    assert index.list_folder("c") is None
+
+
+def test_sync_folder(index, tree):
+    index.sync_tree("", tree)
+    index.sync_folder("", [directory_item("c"), file_item("new.ipynb")])
+    assert names(index.list_folder("")) == ["c", "new.ipynb"]
+    # The tree of a removed directory is removed too.
+    assert index.list_folder("a") is None
+    assert index.search("report") == [
+        index.list_folder("c")[0],
+    ]
+
+
+def test_sync_empty_folder(index):
+    index.sync_folder("", [])
+    assert index.list_folder("") == []
+    index.sync_folder("a", [])
+    assert index.list_folder("a") is None
+
+
+def test_max_age(index, tree):
+    with mock.patch("time.time", return_value=1000):
+        index.sync_tree("", tree)
+    with mock.patch("time.time", return_value=1010):
+        assert index.list_folder("a", max_age=20) is not None
+        assert index.list_folder("a", max_age=5) is None
+        assert index.list_folder("a") is not None
+
+
+def test_invalidate(index, tree):
+    index.sync_tree("", tree)
+    index.invalidate("/a/")
+    assert index.list_folder("a") is None
+    assert names(index.list_folder("a/b")) == ["report.ipynb"]
+    assert index.search("z.csv") != []
+
+
+def test_search(index, tree):
+    index.sync_tree("", tree)
+    assert [item["path"] for item in index.search("REPORT")] == [
+        "a/report.ipynb",
+        "a/b/report.ipynb",
+        "c/monthly_report.ipynb",
+    ]
+    assert [item["path"] for item in index.search("report.ipynb", limit=1)] == [
+        "a/report.ipynb"
+    ]
+    assert index.search("nothing") == []
+
+
+def test_search_escapes_wildcards(index):
+    index.sync_tree("", [file_item("a_b.ipynb"), file_item("axb.ipynb")])
+    assert names(index.search("a_b")) == ["a_b.ipynb"]
+    assert names(index.search("%")) == []
+
+
+def test_shared_between_instances(index, tree):
+    index.sync_tree("", tree)
+    assert names(MetadataIndex(index.path).list_folder("")) == ["a", "c", "top.ipynb"]
@@ -1,16 +1,40 @@
+import gzip
+import json
+import sys
+import threading
+import time
 from contextlib import contextmanager
 from unittest import mock
 
+import nbformat
 import pytest
 
 from callisto.core.notebook_content import NotebookContent
+from callisto.core.notebook_content import _NotebookVersion
 from callisto.core.contents_loader import ContentsLoader
+from callisto.core.render_cache import RenderCache
+from callisto.core.renderer import DEFAULT_EXPORTER_OPTIONS
+from callisto.core.renderer import RenderPool
+from callisto.core.renderer import add_style
+from callisto.core.single_flight import SingleFlight
+from callisto.core.streaming import ChunkedStream
+from callisto.core.toc import TocNode
+
+EMPTY_NOTEBOOK = '{"nbformat": 4, "nbformat_minor": 5, "metadata": {}, "cells": []}'
 
 
 class TestNotebookContent:
     @pytest.fixture
     def loader(self):
-        return mock.MagicMock(spec=ContentsLoader)
+        loader = mock.MagicMock(spec=ContentsLoader)
+        loader.render_cache = None
+        loader.render_pool = None
+        loader.open_stream.return_value = None
+        loader.single_flight = SingleFlight()
+        loader.exporter_options = DEFAULT_EXPORTER_OPTIONS
+        loader.render_settings = {}
+        loader.prepare_notebook.side_effect = lambda notebook, *args, **kwargs: notebook
+        return loader
 
     @pytest.fixture
     def notebook_content(self, loader):
@@ -25,8 +49,8 @@ class TestNotebookContent:
 
         assert notebook_content.content == v1_result["content"]
         assert notebook_content._last_modified == v1_result["last_modified"]
-        notebook_content._dict_content = {"test": 1}
-        notebook_content._html_content = "html for test 1"
+        notebook_content._version.dict_content = {"test": 1}
+        notebook_content._version.html_content = "html for test 1"
 
         # query again
         assert notebook_content.content == v1_result["content"]
@@ -35,8 +59,8 @@ class TestNotebookContent:
         loader.get.return_value = v2_result
         loader.info.return_value = {"last_modified": v2_result["last_modified"]}
         assert notebook_content.content == v2_result["content"]
-        assert notebook_content._dict_content is None
-        assert notebook_content._html_content is None
+        assert notebook_content._version.dict_content is None
+        assert notebook_content._version.html_content is None
 
         loader.get.call_count == 2
 
@@ -49,112 +73,518 @@ class TestNotebookContent:
             m.return_value = value
             yield
 
-    def test_dict_content(self, loader):
-        with self.mock_property("content", '{"test": 1}'):
-            notebook_content = NotebookContent(loader, "/path/file")
+    def set_content(self, loader, content):
+        loader.get.return_value = {
+            "content": content,
+            "last_modified": "2021-12-01 00:00:00",
+        }
+        loader.info.return_value = {"last_modified": "2021-12-01 00:00:00"}
+
+    def test_content_first_load_skips_info(self, notebook_content, loader):
+        self.set_content(loader, '{"test": 1}')
+        assert notebook_content.content == '{"test": 1}'
+        assert loader.info.call_count == 0
 
+    def test_revalidate_interval(self, loader):
+        self.set_content(loader, EMPTY_NOTEBOOK)
+        notebook_content = NotebookContent(loader, "/path", revalidate_interval=60)
+        with mock.patch("time.monotonic", return_value=100):
+            notebook_content.content
+        with mock.patch("time.monotonic", return_value=159):
+            notebook_content.content
+            notebook_content.dict_content
+        assert loader.info.call_count == 0
+        with mock.patch("time.monotonic", return_value=161):
+            notebook_content.content
+        assert loader.info.call_count == 1
+
+    def test_stale_while_revalidate(self, loader):
+        self.set_content(loader, '{"test": 1}')
+        notebook_content = NotebookContent(
+            loader, "/path", revalidate_interval=60, stale_while_revalidate=60
+        )
+        with mock.patch("time.monotonic", return_value=100):
+            notebook_content.content
+        with mock.patch("time.monotonic", return_value=150), mock.patch(
+            "threading.Thread"
+        ) as mock_thread:
+            notebook_content.content
+            assert mock_thread.call_count == 0
+        with mock.patch("time.monotonic", return_value=170), mock.patch(
+            "threading.Thread"
+        ) as mock_thread:
             assert notebook_content.content == '{"test": 1}'
-            assert notebook_content.dict_content == {"test": 1}
+            notebook_content.content
+            mock_thread.assert_called_once_with(
+                target=notebook_content._background_revalidate, daemon=True
+            )
+            notebook_content._background_revalidate()
+        assert loader.info.call_count == 1
+        with mock.patch("time.monotonic", return_value=300):
+            notebook_content.content
+        assert loader.info.call_count == 2
 
-    @pytest.fixture
-    def mock_nb_reads(self):
-        with mock.patch("nbformat.reads") as m:
-            yield m
+    def test_dict_content(self, notebook_content, loader):
+        self.set_content(loader, EMPTY_NOTEBOOK)
+        assert notebook_content.content == EMPTY_NOTEBOOK
+        assert isinstance(notebook_content.dict_content, nbformat.NotebookNode)
+        assert notebook_content.dict_content == json.loads(EMPTY_NOTEBOOK)
+
+    def test_dict_content_multiline_and_old_format(self, notebook_content, loader):
+        nb = nbformat.v3.new_notebook(
+            worksheets=[
+                nbformat.v3.new_worksheet(
+                    cells=[nbformat.v3.new_text_cell("markdown", source="# a\nb")]
+                )
+            ]
+        )
+        self.set_content(loader, nbformat.writes(nb, version=3))
+        assert notebook_content.dict_content["nbformat"] == 4
+        assert notebook_content.dict_content["cells"][0]["source"] == "# a\nb"
+
+    def test_content_streamed(self, notebook_content, loader):
+        stream = mock.MagicMock(spec=ChunkedStream)
+        stream.read.return_value = EMPTY_NOTEBOOK.encode()
+        loader.open_stream.return_value = {
+            "content": stream,
+            "last_modified": "2021-12-01 00:00:00",
+            "path": "some/path",
+        }
+        loader.info.return_value = {"last_modified": "2021-12-01 00:00:00"}
+        assert notebook_content.content == EMPTY_NOTEBOOK.encode()
+        assert notebook_content.dict_content == json.loads(EMPTY_NOTEBOOK)
+        assert loader.get.call_count == 0
+        loader.open_stream.assert_called_once_with("/some/path")
+
+    def test_nbytes(self, notebook_content, loader):
+        self.set_content(loader, EMPTY_NOTEBOOK)
+        assert notebook_content.nbytes == 0
+        notebook_content.content
+        raw_size = notebook_content.nbytes
+        notebook_content.dict_content
+        dict_size = notebook_content.nbytes
+        assert dict_size > raw_size
+        notebook_content._version.html_content = "x" * 1000
+        assert notebook_content.nbytes > dict_size + 1000
 
     @pytest.fixture
     def mock_html_exporter(self):
         with mock.patch(
-            "callisto.core.notebook_content.HTMLExporter.from_notebook_node",
+            "callisto.core.renderer.HTMLExporter.from_notebook_node",
             autospec=True,
         ) as m:
             m.return_value = "<html>content</html>", "others"
             yield m
 
-    def test_html_content(self, loader, mock_nb_reads, mock_html_exporter):
-        with self.mock_property("content", "some-content"), self.mock_property(
-            "dict_content", {"nbformat": 4}
-        ):
-            notebook_content = NotebookContent(loader, "/some/path.ipynb")
-            assert notebook_content.html_content == "<html>content</html>"
-            mock_nb_reads.assert_called_once_with("some-content", as_version=4)
+    def test_html_content(self, notebook_content, loader, mock_html_exporter):
+        self.set_content(loader, EMPTY_NOTEBOOK)
+        assert notebook_content.html_content == add_style("<html>content</html>")
+        # The parsed notebook is rendered as is.
+        assert (
+            mock_html_exporter.call_args[0][1] is notebook_content._version.dict_content
+        )
+        assert loader.info.call_count == 0
 
     @pytest.fixture
-    def mock_soup(self):
-        with mock.patch("callisto.core.notebook_content.BeautifulSoup") as m:
-            yield m.return_value
-
-    def fake_heading(self, name, id, content):
-        class DummyHeading(dict):
-            def __init__(self, name: str, contents: str, id: int) -> None:
-                self.name = name
-                self["id"] = id
-                self.contents = [mock.MagicMock(text=content)]
-
-        return DummyHeading(name=name, id=id, contents=[content, "other-content"])
-
-    def test_toc(self, loader, mock_soup):
-        with self.mock_property("html_content", "some-content"):
-            mock_soup.find_all.return_value = [
-                self.fake_heading(name="h2", content="0.1", id="1"),
-                self.fake_heading(name="h1", content="1", id="2"),
-                self.fake_heading(name="h2", content="1.1", id="3"),
-                self.fake_heading(name="h5", content="1.1.0.0.1", id="4"),
-                self.fake_heading(name="h5", content="1.1.0.0.2", id="5"),
-                self.fake_heading(name="h4", content="1.1.0.1", id="6"),
-            ]
-            assert NotebookContent(loader, "path").toc() == [
-                {
-                    "level": 1,
-                    "text": None,
-                    "anchor": None,
-                    "children": [
-                        {"level": 2, "text": "0.1", "anchor": "1", "children": []}
-                    ],
-                },
-                {
-                    "level": 1,
-                    "text": "1",
-                    "anchor": "2",
-                    "children": [
-                        {
-                            "level": 2,
-                            "text": "1.1",
-                            "anchor": "3",
-                            "children": [
-                                {
-                                    "level": 3,
-                                    "text": None,
-                                    "anchor": None,
-                                    "children": [
-                                        {
-                                            "level": 4,
-                                            "text": None,
-                                            "anchor": None,
-                                            "children": [
-                                                {
-                                                    "level": 5,
-                                                    "text": "1.1.0.0.1",
-                                                    "anchor": "4",
-                                                    "children": [],
-                                                },
-                                                {
-                                                    "level": 5,
-                                                    "text": "1.1.0.0.2",
-                                                    "anchor": "5",
-                                                    "children": [],
-                                                },
-                                            ],
-                                        },
-                                        {
-                                            "level": 4,
-                                            "text": "1.1.0.1",
-                                            "anchor": "6",
-                                            "children": [],
-                                        },
-                                    ],
-                                }
-                            ],
-                        }
-                    ],
-                },
+    def render_cache(self, loader):
+        loader.render_cache = mock.MagicMock(spec=RenderCache)
+        loader.render_cache.get.return_value = None
+        return loader.render_cache
+
+    def test_html_content_render_cache_miss(
+        self, notebook_content, loader, render_cache, mock_html_exporter
+    ):
+        self.set_content(loader, EMPTY_NOTEBOOK)
+        assert notebook_content.html_content == add_style("<html>content</html>")
+        key = render_cache.get.call_args[0][0]
+        render_cache.set.assert_called_once_with(
+            key, add_style("<html>content</html>").encode()
+        )
+
+    def test_html_content_render_cache_hit(
+        self, loader, render_cache, mock_html_exporter
+    ):
+        render_cache.get.return_value = b"<html>cached</html>"
+        with self.mock_property("content", "some-content"):
+            notebook_content = NotebookContent(loader, "/some/path.ipynb")
+            assert notebook_content.html_content == "<html>cached</html>"
+        assert mock_html_exporter.call_count == 0
+        assert render_cache.set.call_count == 0
+
+    def test_html_content_render_cache_evicted_outputs(
+        self, notebook_content, loader, render_cache, mock_html_exporter
+    ):
+        render_cache.get.return_value = b"<html>cached</html>"
+        loader.touch_outputs.return_value = False
+        self.set_content(loader, EMPTY_NOTEBOOK)
+        assert notebook_content.html_content == add_style("<html>content</html>")
+        loader.touch_outputs.assert_called_with("<html>cached</html>")
+        assert render_cache.set.call_count == 1
+
+    def test_html_content_renders_once(self, notebook_content, loader):
+        self.set_content(loader, EMPTY_NOTEBOOK)
+        notebook_content.content
+        release = threading.Event()
+
+        def render(version):
+            release.wait(5)
+            return "<html>content</html>"
+
+        results = []
+        with mock.patch.object(notebook_content, "_render", side_effect=render) as m:
+            threads = [
+                threading.Thread(
+                    target=lambda: results.append(notebook_content.get_html(False))
+                )
+                for _ in range(5)
             ]
+            for thread in threads:
+                thread.start()
+            time.sleep(0.05)
+            release.set()
+            for thread in threads:
+                thread.join()
+        assert results == ["<html>content</html>"] * 5
+        assert m.call_count == 1
+
+    def test_html_content_of_replaced_version(
+        self, notebook_content, loader, render_cache
+    ):
+        self.set_content(loader, EMPTY_NOTEBOOK)
+        old_key, _ = notebook_content.version()
+        rendering = threading.Event()
+        release = threading.Event()
+
+        def render(notebook, exporter_options):
+            rendering.set()
+            release.wait(5)
+            return "<html>old</html>"
+
+        results = []
+        with mock.patch(
+            "callisto.core.notebook_content.render_notebook", side_effect=render
+        ):
+            thread = threading.Thread(
+                target=lambda: results.append(notebook_content.get_html(False))
+            )
+            thread.start()
+            assert rendering.wait(5)
+            loader.get.return_value = {
+                "content": EMPTY_NOTEBOOK,
+                "last_modified": "2021-12-01 00:00:01",
+            }
+            loader.info.return_value = {"last_modified": "2021-12-01 00:00:01"}
+            new_key, _ = notebook_content.version()
+            release.set()
+            thread.join()
+        assert new_key != old_key
+        assert results == ["<html>old</html>"]
+        render_cache.set.assert_called_once_with(old_key, b"<html>old</html>")
+        # The old html is not served for the new version.
+        assert notebook_content._version.html_content is None
+
+    def test_html_content_rendered_by_other_worker(
+        self, notebook_content, loader, render_cache, mock_html_exporter
+    ):
+        self.set_content(loader, EMPTY_NOTEBOOK)
+        render_cache.get.side_effect = [None, b"<html>other</html>"]
+        assert notebook_content.html_content == "<html>other</html>"
+        loader.render_lock.assert_called_once_with(
+            notebook_content._render_key(notebook_content._version)
+        )
+        assert mock_html_exporter.call_count == 0
+        assert render_cache.set.call_count == 0
+
+    def test_concurrent_first_load_fetches_once(self, notebook_content, loader):
+        self.set_content(loader, '{"test": 1}')
+        release = threading.Event()
+        get = loader.get.return_value
+
+        def slow_get(*args, **kwargs):
+            release.wait(5)
+            return get
+
+        loader.get.side_effect = slow_get
+        threads = [
+            threading.Thread(target=lambda: notebook_content.content) for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert loader.get.call_count == 1
+        assert loader.info.call_count == 0
+
+    @pytest.fixture
+    def notebook_json(self):
+        nb = nbformat.v4.new_notebook()
+        for i in range(5):
+            nb.cells.append(nbformat.v4.new_markdown_cell(f"# Cell {i}"))
+        return nbformat.writes(nb)
+
+    def test_cell_count(self, notebook_content, loader, notebook_json):
+        self.set_content(loader, notebook_json)
+        assert notebook_content.cell_count() == 5
+
+    def test_get_cells_html(self, notebook_content, loader, notebook_json):
+        self.set_content(loader, notebook_json)
+        html = notebook_content.get_cells_html(1, 3)
+        assert "<head>" in html
+        assert [f"Cell {i}" in html for i in range(5)] == [
+            False,
+            True,
+            True,
+            False,
+            False,
+        ]
+
+    def test_get_cells_html_fragment(
+        self, notebook_content, loader, render_cache, notebook_json
+    ):
+        self.set_content(loader, notebook_json)
+        html = notebook_content.get_cells_html(3, 5, fragment=True)
+        assert "<head>" not in html
+        assert '<div class="cell' in html
+        assert "Cell 4" in html
+        key = (
+            notebook_content._render_key(notebook_content._version)
+            + ".cells-3-5.fragment"
+        )
+        render_cache.set.assert_called_once_with(key, html.encode("utf-8"))
+
+    def test_get_cells_html_kept_in_memory(
+        self, notebook_content, loader, notebook_json
+    ):
+        self.set_content(loader, notebook_json)
+        html = notebook_content.get_cells_html(1, 3)
+        with mock.patch.object(notebook_content, "_render_content") as m:
+            assert notebook_content.get_cells_html(1, 3) == html
+        assert m.call_count == 0
+        assert notebook_content.nbytes > sys.getsizeof(html)
+
+    @pytest.mark.parametrize("stop", [5, 30])
+    def test_get_cells_html_every_cell(
+        self, notebook_content, loader, notebook_json, stop
+    ):
+        self.set_content(loader, notebook_json)
+        html = notebook_content.get_cells_html(0, stop)
+        assert html == notebook_content.html_content
+        assert notebook_content._version.cells_html == {}
+
+    def test_get_cells_html_prepared_from_first_cell(
+        self, notebook_content, loader, notebook_json
+    ):
+        self.set_content(loader, notebook_json)
+        notebook_content.get_cells_html(2, 4)
+        notebook, path = loader.prepare_notebook.call_args[0]
+        assert len(notebook["cells"]) == 2
+        assert path == "/some/path"
+        assert loader.prepare_notebook.call_args[1] == {"first_cell": 2}
+
+    def test_get_output_text(self, notebook_content, loader):
+        nb = nbformat.v4.new_notebook()
+        nb.cells.append(
+            nbformat.v4.new_code_cell(
+                "x",
+                outputs=[
+                    nbformat.v4.new_output("stream", name="stdout", text="out"),
+                    nbformat.v4.new_output(
+                        "execute_result",
+                        data={"text/html": "<b>x</b>", "text/plain": "x"},
+                    ),
+                ],
+            )
+        )
+        self.set_content(loader, nbformat.writes(nb))
+        assert notebook_content.get_output_text(0, 0) == ("out", "text/plain")
+        assert notebook_content.get_output_text(0, 1) == ("<b>x</b>", "text/html")
+        assert notebook_content.get_output_text(0, 2) is None
+        assert notebook_content.get_output_text(1, 0) is None
+        assert notebook_content.get_output_text(-1, 0) is None
+
+    def test_html_content_prepared(self, notebook_content, loader):
+        self.set_content(loader, EMPTY_NOTEBOOK)
+        loader.prepare_notebook.side_effect = lambda notebook, *args, **kwargs: {
+            **notebook,
+            "prepared": True,
+        }
+        with mock.patch(
+            "callisto.core.notebook_content.render_notebook", return_value="html"
+        ) as m:
+            assert notebook_content.html_content == "html"
+        assert m.call_args[0][0] == {**json.loads(EMPTY_NOTEBOOK), "prepared": True}
+
+    def test_html_content_render_pool(self, notebook_content, loader):
+        loader.render_pool = mock.MagicMock(spec=RenderPool)
+        loader.render_pool.render.return_value = "<html>pool</html>"
+        self.set_content(loader, EMPTY_NOTEBOOK)
+        assert notebook_content.html_content == "<html>pool</html>"
+        loader.render_pool.render.assert_called_once_with(
+            notebook_content._render_key(notebook_content._version),
+            EMPTY_NOTEBOOK,
+            DEFAULT_EXPORTER_OPTIONS,
+        )
+
+    def test_get_compressed_html(self, notebook_content, loader, render_cache):
+        self.set_content(loader, "{}")
+        notebook_content.content
+        notebook_content._version.html_content = "<html>content</html>"
+        compressed = notebook_content.get_compressed_html("gzip")
+        assert gzip.decompress(compressed) == b"<html>content</html>"
+        assert notebook_content.get_compressed_html("gzip") is compressed
+
+        key = notebook_content._render_key(notebook_content._version) + ".gzip"
+        render_cache.set.assert_called_once_with(key, compressed)
+
+    def test_get_compressed_html_render_cache_hit(
+        self, notebook_content, loader, render_cache
+    ):
+        self.set_content(loader, "{}")
+        notebook_content.content
+        notebook_content._version.html_content = "<html>content</html>"
+        render_cache.get.return_value = b"cached"
+        assert notebook_content.get_compressed_html("gzip") == b"cached"
+        assert render_cache.set.call_count == 0
+
+    def test_get_compressed_cells_html(
+        self, notebook_content, loader, render_cache, notebook_json
+    ):
+        self.set_content(loader, notebook_json)
+        html = notebook_content.get_cells_html(3, 5, fragment=True)
+        compressed = notebook_content.get_compressed_cells_html(
+            3, 5, "gzip", fragment=True
+        )
+        assert gzip.decompress(compressed) == html.encode("utf-8")
+        assert (
+            notebook_content.get_compressed_cells_html(3, 5, "gzip", fragment=True)
+            is compressed
+        )
+        key = notebook_content._render_key(notebook_content._version)
+        render_cache.set.assert_called_with(
+            f"{key}.cells-3-5.fragment.gzip", compressed
+        )
+
+    def test_get_compressed_cells_html_every_cell(
+        self, notebook_content, loader, notebook_json
+    ):
+        self.set_content(loader, notebook_json)
+        compressed = notebook_content.get_compressed_cells_html(0, 5, "gzip")
+        assert notebook_content.get_compressed_html("gzip") is compressed
+
+    def test_render_key(self, loader):
+        notebook_content = NotebookContent(loader, "/some/path.ipynb")
+        version = _NotebookVersion(
+            content="{}",
+            last_modified="2021-12-01 00:00:00",
+            etag=None,
+            model_path="some/path.ipynb",
+        )
+        key = notebook_content._render_key(version)
+        assert key == notebook_content._render_key(version)
+
+        version.last_modified = "2021-12-01 00:00:01"
+        assert key != notebook_content._render_key(version)
+
+        key = notebook_content._render_key(version)
+        loader.exporter_options = {"template_name": "lab"}
+        assert key != notebook_content._render_key(version)
+
+    def test_version(self, notebook_content, loader):
+        self.set_content(loader, '{"cells": []}')
+        etag, last_modified = notebook_content.version()
+        assert etag == notebook_content._render_key(notebook_content._version)
+        assert last_modified == "2021-12-01 00:00:00"
+
+    def test_get_html_without_refresh(
+        self, notebook_content, loader, mock_html_exporter
+    ):
+        self.set_content(loader, EMPTY_NOTEBOOK)
+        notebook_content.version()
+        notebook_content.get_html(refresh=False)
+        assert loader.info.call_count == 0
+
+    @pytest.fixture
+    def mock_extract_headings(self):
+        with mock.patch("callisto.core.notebook_content.extract_headings") as m:
+            yield m
+
+    def test_toc_does_not_render(self, notebook_content, loader, mock_html_exporter):
+        self.set_content(loader, '{"cells": []}')
+        assert notebook_content.toc() == []
+        assert mock_html_exporter.call_count == 0
+
+    def test_toc_cached(self, notebook_content, loader, mock_extract_headings):
+        self.set_content(loader, '{"cells": []}')
+        mock_extract_headings.return_value = []
+        notebook_content.toc()
+        notebook_content.toc()
+        assert mock_extract_headings.call_count == 1
+
+    def test_toc(self, notebook_content, loader, mock_extract_headings):
+        self.set_content(loader, '{"cells": []}')
+        mock_extract_headings.return_value = [
+            TocNode(2, "0.1", "1"),
+            TocNode(1, "1", "2"),
+            TocNode(2, "1.1", "3"),
+            TocNode(5, "1.1.0.0.1", "4"),
+            TocNode(5, "1.1.0.0.2", "5"),
+            TocNode(4, "1.1.0.1", "6"),
+        ]
+        assert notebook_content.toc() == [
+            {
+                "level": 1,
+                "text": None,
+                "anchor": None,
+                "children": [
+                    {"level": 2, "text": "0.1", "anchor": "1", "children": []}
+                ],
+            },
+            {
+                "level": 1,
+                "text": "1",
+                "anchor": "2",
+                "children": [
+                    {
+                        "level": 2,
+                        "text": "1.1",
+                        "anchor": "3",
+                        "children": [
+                            {
+                                "level": 3,
+                                "text": None,
+                                "anchor": None,
+                                "children": [
+                                    {
+                                        "level": 4,
+                                        "text": None,
+                                        "anchor": None,
+                                        "children": [
+                                            {
+                                                "level": 5,
+                                                "text": "1.1.0.0.1",
+                                                "anchor": "4",
+                                                "children": [],
+                                            },
+                                            {
+                                                "level": 5,
+                                                "text": "1.1.0.0.2",
+                                                "anchor": "5",
+                                                "children": [],
+                                            },
+                                        ],
+                                    },
+                                    {
+                                        "level": 4,
+                                        "text": "1.1.0.1",
+                                        "anchor": "6",
+                                        "children": [],
+                                    },
+                                ],
+                            }
+                        ],
+                    }
+                ],
+            },
+        ]
@@ -0,0 +1,87 @@
+import json
+from unittest import mock
+
+import nbformat
+import pytest
+
+from callisto.core import notebook_json
+from callisto.core.notebook_json import dumps
+from callisto.core.notebook_json import loads
+from callisto.core.notebook_json import parse_notebook
+from callisto.core.notebook_json import to_notebook_node
+
+
+@pytest.fixture
+def notebook():
+    nb = nbformat.v4.new_notebook()
+    nb.cells.append(nbformat.v4.new_markdown_cell("# Title\nSome text"))
+    nb.cells.append(
+        nbformat.v4.new_code_cell(
+            "print('héllo')",
+            outputs=[nbformat.v4.new_output("stream", name="stdout", text="héllo\n")],
+        )
+    )
+    return nbformat.writes(nb)
+
+
+@pytest.fixture(params=[True, False], ids=["orjson", "json"])
+def with_orjson(request):
+    if not request.param:
+        with mock.patch.object(notebook_json, "orjson", None):
+            yield
+    else:
+        pytest.importorskip("orjson")
+        yield
+
+
+@pytest.mark.usefixtures("with_orjson")
+class TestJson:
+    def test_loads(self, notebook):
+        assert loads(notebook) == json.loads(notebook)
+        assert loads(notebook.encode("utf-8")) == json.loads(notebook)
+
+    def test_dumps(self, notebook):
+        value = json.loads(notebook)
+        assert isinstance(dumps(value), bytes)
+        assert json.loads(dumps(value)) == value
+
+    def test_loads_invalid(self):
+        with pytest.raises(ValueError):
+            loads(b"{not json")
+
+
+@pytest.mark.parametrize("encode", [str, lambda s: s.encode("utf-8")])
+def test_parse_notebook(notebook, encode):
+    node = parse_notebook(encode(notebook))
+    assert isinstance(node, nbformat.NotebookNode)
+    assert node == nbformat.reads(notebook, as_version=4)
+    assert node.cells[0].source == "# Title\nSome text"
+
+
+def test_parse_notebook_multiline(notebook):
+    # Multiline strings are stored as lists of lines on disk.
+    assert '"# Title\\n",' in notebook
+    assert parse_notebook(notebook).cells[0].source == "# Title\nSome text"
+
+
+def test_parse_notebook_converts_old_format():
+    nb = nbformat.v3.new_notebook(
+        worksheets=[
+            nbformat.v3.new_worksheet(cells=[nbformat.v3.new_code_cell(input="x")])
+        ]
+    )
+    node = parse_notebook(nbformat.writes(nb, version=3))
+    assert node.nbformat == 4
+    assert node.cells[0].source == "x"
+
+
+def test_parse_notebook_unsupported_version():
+    with pytest.raises(nbformat.NBFormatError):
+        parse_notebook('{"nbformat": 99, "nbformat_minor": 0, "cells": []}')
+
+
+def test_to_notebook_node_does_not_modify(notebook):
+    value = json.loads(notebook)
+    node = to_notebook_node(value)
+    assert value == json.loads(notebook)
+    assert node.cells[1].outputs[0].text == "héllo\n"
@@ -0,0 +1,166 @@
+import base64
+import copy
+import hashlib
+import json
+
+import nbformat
+import pytest
+
+from callisto.core.outputs import extract_outputs
+from callisto.core.outputs import lazy_load_outputs
+from callisto.core.outputs import output_digests
+from callisto.core.outputs import output_text
+from callisto.core.outputs import truncate_outputs
+from callisto.core.renderer import render_notebook
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 2000
+DIGEST = hashlib.sha256(PNG).hexdigest()
+
+
+@pytest.fixture
+def notebook():
+    nb = nbformat.v4.new_notebook()
+    encoded = base64.b64encode(PNG).decode("ascii")
+    nb.cells.append(nbformat.v4.new_markdown_cell("# Title"))
+    nb.cells.append(
+        nbformat.v4.new_code_cell(
+            "plot()",
+            outputs=[
+                nbformat.v4.new_output(
+                    "display_data",
+                    data={"image/png": encoded, "text/plain": "<Figure>"},
+                ),
+                nbformat.v4.new_output("stream", name="stdout", text="done"),
+            ],
+        )
+    )
+    return json.loads(nbformat.writes(nb))
+
+
+def test_extract_outputs(notebook):
+    original = copy.deepcopy(notebook)
+    stored = {}
+    result = extract_outputs(notebook, 1000, stored.__setitem__)
+
+    assert stored == {DIGEST: PNG}
+    output = result["cells"][1]["outputs"][0]
+    assert output["data"] == {"image/png": "", "text/plain": ["<Figure>"]}
+    assert output["metadata"]["filenames"] == {
+        "image/png": f"/api/notebook/output/{DIGEST}.png"
+    }
+    assert result["cells"][1]["outputs"][1] == notebook["cells"][1]["outputs"][1]
+    assert result["cells"][0] is notebook["cells"][0]
+    assert notebook == original
+
+
+def test_extract_outputs_multiline_base64(notebook):
+    encoded = notebook["cells"][1]["outputs"][0]["data"]["image/png"]
+    notebook["cells"][1]["outputs"][0]["data"]["image/png"] = [
+        encoded[:100],
+        encoded[100:],
+    ]
+    stored = {}
+    extract_outputs(notebook, 1000, stored.__setitem__)
+    assert stored == {DIGEST: PNG}
+
+
+def test_extract_outputs_below_min_size(notebook):
+    stored = {}
+    result = extract_outputs(notebook, 10000, stored.__setitem__)
+    assert stored == {}
+    assert result == notebook
+
+
+def test_lazy_load_outputs():
+    html = '<img src="/api/notebook/output/abc.png"><img src="data:image/png;base64,">'
+    assert lazy_load_outputs(html) == (
+        '<img loading="lazy" src="/api/notebook/output/abc.png">'
+        '<img src="data:image/png;base64,">'
+    )
+
+
+def test_render_extracted_outputs(notebook):
+    html = render_notebook(json.dumps(extract_outputs(notebook, 1000, lambda *_: None)))
+    assert f'loading="lazy" src="/api/notebook/output/{DIGEST}.png"' in html
+    assert 'src="data:image/png' not in html
+    assert output_digests(html) == {DIGEST}
+
+
+def test_output_digests():
+    assert output_digests('<img src="/api/notebook/output/abc.png">') == set()
+
+
+def full_output_url(cell, output):
+    return f"/full?cell={cell}&output={output}"
+
+
+def test_truncate_outputs(notebook):
+    notebook["cells"][1]["outputs"].append(
+        {"output_type": "stream", "name": "stdout", "text": ["a" * 1500, "b" * 1000]}
+    )
+    original = copy.deepcopy(notebook)
+    result = truncate_outputs(notebook, 2000, full_output_url, first_cell=10)
+
+    outputs = result["cells"][1]["outputs"]
+    assert len(outputs) == 4
+    assert outputs[:2] == notebook["cells"][1]["outputs"][:2]
+    assert outputs[2]["text"] == "a" * 1500 + "b" * 500
+    assert outputs[3]["data"]["text/html"] == (
+        '<a class="callisto-full-output" href="/full?cell=11&amp;output=2" '
+        'target="_blank">Show full output (2K characters)</a>'
+    )
+    assert result["cells"][0] is notebook["cells"][0]
+    assert notebook == original
+
+
+def test_truncate_outputs_html():
+    html = "<table>" + "<tr><td>1</td></tr>" * 100 + "</table>"
+    output = {
+        "output_type": "execute_result",
+        "execution_count": 1,
+        "metadata": {},
+        "data": {"text/html": html, "text/plain": "  0\n0 1"},
+    }
+    notebook = {"cells": [{"cell_type": "code", "outputs": [output]}]}
+    truncated = truncate_outputs(notebook, 100, full_output_url)["cells"][0]
+    assert truncated["outputs"][0]["data"] == {"text/plain": "  0\n0 1"}
+    assert truncated["outputs"][0]["execution_count"] == 1
+
+    del output["data"]["text/plain"]
+    truncated = truncate_outputs(notebook, 100, full_output_url)["cells"][0]
+    assert truncated["outputs"][0]["data"] == {"text/plain": html[:100]}
+
+
+def test_truncate_outputs_below_max_size(notebook):
+    assert truncate_outputs(notebook, 2000, full_output_url) == notebook
+
+
+@pytest.mark.parametrize(
+    "output,expected",
+    [
+        ({"output_type": "stream", "text": ["a", "b"]}, ("ab", "text/plain")),
+        (
+            {"output_type": "display_data", "data": {"text/plain": "x"}},
+            ("x", "text/plain"),
+        ),
+        (
+            {
+                "output_type": "display_data",
+                "data": {"text/plain": "x", "text/markdown": "*x*"},
+            },
+            ("*x*", "text/markdown"),
+        ),
+        ({"output_type": "display_data", "data": {"image/png": ""}}, None),
+        ({"output_type": "error", "ename": "ValueError"}, None),
+    ],
+)
+def test_output_text(output, expected):
+    assert output_text(output) == expected
+
+
+def test_render_truncated_outputs(notebook):
+    notebook["cells"][1]["outputs"][1]["text"] = "x" * 5000
+    html = render_notebook(json.dumps(truncate_outputs(notebook, 100, full_output_url)))
+    assert "x" * 100 in html
+    assert "x" * 101 not in html
+    assert 'href="/full?cell=1&amp;output=1"' in html
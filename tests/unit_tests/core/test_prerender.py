@@ -0,0 +1,141 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import pytest
+from jupyter_server.services.contents.filemanager import FileContentsManager
+
+from callisto.core.callisto_config import CallistoConfig
+from callisto.core.contents_loader import ContentsLoader
+from callisto.core.notebook_content import CELLS_PER_PAGE
+from callisto.core.prerender import Prerenderer
+from callisto.core.prerender import prerender_lock
+from callisto.core.single_flight import ProcessLock
+
+NOTEBOOK = '{"cells": [], "metadata": {}, "nbformat": 4, "nbformat_minor": 5}'
+
+
+class TestPrerenderer:
+    @pytest.fixture
+    def root(self, tmpdir):
+        tmpdir.join("top.ipynb").write(NOTEBOOK)
+        tmpdir.join("data.csv").write("a,b\n")
+        tmpdir.mkdir("folder").join("nested.ipynb").write(NOTEBOOK)
+        tmpdir.mkdir("other").join("other.ipynb").write(NOTEBOOK)
+        return tmpdir
+
+    @pytest.fixture
+    def loader(self, root, tmpdir_factory):
+        return ContentsLoader(
+            CallistoConfig(
+                contents_manager_cls=FileContentsManager,
+                contents_manager_kwargs={"root_dir": str(root)},
+                render_cache_cls="callisto.core.render_cache.LocalDirectoryRenderCache",
+                render_cache_kwargs={"directory": str(tmpdir_factory.mktemp("cache"))},
+            )
+        )
+
+    @pytest.fixture(autouse=True)
+    def mock_executor(self):
+        with mock.patch(
+            "callisto.core.prerender.ProcessPoolExecutor", ThreadPoolExecutor
+        ):
+            yield
+
+    @pytest.fixture
+    def mock_render(self):
+        with mock.patch(
+            "callisto.core.prerender.render_notebook", return_value="<html></html>"
+        ) as m:
+            yield m
+
+    def test_requires_render_cache(self):
+        with pytest.raises(ValueError):
+            Prerenderer(ContentsLoader(CallistoConfig()))
+
+    def test_scan(self, loader):
+        paths = {item["path"] for item in Prerenderer(loader).scan()}
+        assert paths == {"top.ipynb", "folder/nested.ipynb", "other/other.ipynb"}
+
+    def test_scan_prefixes(self, loader):
+        prerenderer = Prerenderer(loader, prefixes=["folder", "missing"])
+        assert [item["path"] for item in prerenderer.scan()] == ["folder/nested.ipynb"]
+
+    def test_run_once(self, loader, mock_render):
+        prerenderer = Prerenderer(loader)
+        assert prerenderer.run_once() == 3
+        assert mock_render.call_count == 3
+
+        nb = loader.get_nb("top.ipynb")
+        assert nb.html_content == "<html></html>"
+        assert mock_render.call_count == 3
+
+        assert prerenderer.run_once() == 0
+        assert mock_render.call_count == 3
+
+    def test_run_once_changed(self, loader, root, mock_render):
+        prerenderer = Prerenderer(loader)
+        prerenderer.run_once()
+        root.join("top.ipynb").setmtime(root.join("top.ipynb").mtime() + 10)
+        assert prerenderer.run_once() == 1
+        assert mock_render.call_count == 4
+
+    def test_run_once_skips_cached(self, loader, mock_render):
+        loader.get_nb("top.ipynb").html_content
+        assert Prerenderer(loader).run_once() == 2
+
+    def test_run_once_retries_failures(self, loader, mock_render):
+        mock_render.side_effect = [Exception("boom"), "<html></html>", "<html></html>"]
+        prerenderer = Prerenderer(loader)
+        assert prerenderer.run_once() == 2
+        mock_render.side_effect = None
+        assert prerenderer.run_once() == 1
+
+    def test_run_once_first_page(self, loader, root, mock_render):
+        cells = [
+            {"cell_type": "markdown", "metadata": {}, "source": f"Cell {i}"}
+            for i in range(CELLS_PER_PAGE + 1)
+        ]
+        root.join("long.ipynb").write(
+            json.dumps({"cells": cells, "metadata": {}, "nbformat": 4})
+        )
+        assert Prerenderer(loader, prefixes=[""]).run_once() == 4
+        rendered = [json.loads(c[0][0]) for c in mock_render.call_args_list]
+        assert sorted(len(nb["cells"]) for nb in rendered) == [0, 0, 0, CELLS_PER_PAGE]
+
+        nb = loader.get_nb("long.ipynb")
+        assert nb.get_cells_html(0, CELLS_PER_PAGE) == "<html></html>"
+
+    def test_run_once_forgets_removed(self, loader, root, mock_render):
+        prerenderer = Prerenderer(loader)
+        prerenderer.run_once()
+        root.join("top.ipynb").remove()
+        prerenderer.run_once()
+        assert sorted(prerenderer._seen) == ["folder/nested.ipynb", "other/other.ipynb"]
+
+    def test_run_forever_with_lock(self, loader, tmpdir):
+        path = str(tmpdir.join("prerender.lock"))
+        other = ProcessLock(path)
+        prerenderer = Prerenderer(loader)
+        with mock.patch.object(prerenderer, "run_once") as run_once, mock.patch.object(
+            prerenderer._stop, "wait", side_effect=lambda interval: prerenderer.stop()
+        ):
+            assert other.acquire()
+            prerenderer.run_forever(60, lock=ProcessLock(path))
+            assert run_once.call_count == 0
+
+            other.release()
+            prerenderer._stop.clear()
+            prerenderer.run_forever(60, lock=ProcessLock(path))
+            assert run_once.call_count == 1
+        # The lock is released once stopped.
+        assert other.acquire()
+
+
+def test_prerender_lock():
+    config = CallistoConfig(render_cache_kwargs={"directory": "/cache"})
+    lock = prerender_lock(config, ["team"])
+    assert lock.path == prerender_lock(config, ["team"]).path
+    assert lock.path != prerender_lock(config, ["other"]).path
+    other_cache = CallistoConfig(render_cache_kwargs={"directory": "/other"})
+    assert lock.path != prerender_lock(other_cache, ["team"]).path
@@ -0,0 +1,88 @@
+import os
+from unittest import mock
+
+import pytest
+
+from callisto.core.render_cache import LocalDirectoryRenderCache
+from callisto.core.render_cache import RenderCache
+from callisto.core.render_cache import make_cache_key
+
+
+def test_make_cache_key():
+    key = make_cache_key(path="a.ipynb", exporter={"template_name": "classic"})
+    assert key == make_cache_key(exporter={"template_name": "classic"}, path="a.ipynb")
+    assert key != make_cache_key(path="a.ipynb", exporter={"template_name": "lab"})
+
+
+def test_render_cache_is_abstract():
+    class Incomplete(RenderCache):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+class TestLocalDirectoryRenderCache:
+    @pytest.fixture
+    def cache(self, tmpdir):
+        return LocalDirectoryRenderCache(str(tmpdir.join("cache")), max_bytes=10)
+
+    def test_get_set(self, cache):
+        assert cache.get("abcd") is None
+        cache.set("abcd", b"html")
+        assert cache.get("abcd") == b"html"
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_contains(self, cache):
+        assert "abcd" not in cache
+        cache.set("abcd", b"html")
+        assert "abcd" in cache
+        assert cache.stats()["hits"] == 0
+
+    def test_shared_between_instances(self, cache):
+        cache.set("abcd", b"html")
+        other = LocalDirectoryRenderCache(cache.directory)
+        assert other.get("abcd") == b"html"
+
+    def test_evicts_least_recently_used(self, cache):
+        cache.set("aa01", b"1234")
+        cache.set("aa02", b"1234")
+        os.utime(cache._path("aa01"), (1, 1))
+        os.utime(cache._path("aa02"), (2, 2))
+        cache.set("aa03", b"1234")
+        assert cache.get("aa01") is None
+        assert cache.get("aa02") == b"1234"
+        assert cache.get("aa03") == b"1234"
+
+    def test_get_bumps_mtime(self, cache):
+        cache.set("aa01", b"1234")
+        os.utime(cache._path("aa01"), (1, 1))
+        cache.get("aa01")
+        assert os.stat(cache._path("aa01")).st_mtime > 1
+
+    def test_touch(self, cache):
+        assert not cache.touch("aa01")
+        cache.set("aa01", b"1234")
+        os.utime(cache._path("aa01"), (1, 1))
+        assert cache.touch("aa01")
+        assert os.stat(cache._path("aa01")).st_mtime > 1
+
+    def test_walks_only_over_max_bytes(self, cache):
+        cache.set("aa01", b"12")
+        with mock.patch("os.walk", wraps=os.walk) as walk:
+            cache.set("aa02", b"12")
+            cache.set("aa01", b"1234")
+            assert walk.call_count == 0
+            assert cache.stats()["bytes"] == 6
+            cache.set("aa03", b"12345")
+            assert walk.call_count == 1
+        assert cache.stats()["bytes"] <= 10
+
+    def test_walks_every_evict_interval(self, cache):
+        cache.evict_interval = 0
+        cache.set("aa01", b"12")
+        with mock.patch("os.walk", wraps=os.walk) as walk:
+            cache.set("aa02", b"12")
+            assert walk.call_count == 1
@@ -0,0 +1,167 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import nbformat
+import pytest
+from werkzeug.exceptions import GatewayTimeout
+from werkzeug.exceptions import ServiceUnavailable
+
+from callisto.core.renderer import EXTRA_STYLE
+from callisto.core.renderer import RenderPool
+from callisto.core.renderer import add_style
+from callisto.core.renderer import get_exporter
+from callisto.core.renderer import render_notebook
+
+
+@pytest.fixture
+def notebook():
+    nb = nbformat.v4.new_notebook()
+    nb.cells.append(nbformat.v4.new_markdown_cell("# Title"))
+    nb.cells.append(nbformat.v4.new_code_cell("say_hello()"))
+    return nbformat.writes(nb)
+
+
+def test_render_notebook(notebook):
+    html = render_notebook(notebook)
+    assert "Title" in html
+    assert EXTRA_STYLE + "</head>" in html
+
+
+@pytest.mark.parametrize(
+    "load",
+    [
+        lambda notebook: notebook.encode("utf-8"),
+        json.loads,
+        lambda notebook: nbformat.reads(notebook, as_version=4),
+    ],
+)
+def test_render_notebook_parsed(notebook, load):
+    assert render_notebook(load(notebook)) == render_notebook(notebook)
+
+
+def test_render_notebook_exporter_options(notebook):
+    html = render_notebook(
+        notebook, {"template_name": "classic", "exclude_input": True}
+    )
+    assert "Title" in html
+    assert "say_hello" not in html
+
+
+def test_get_exporter():
+    exporter = get_exporter({"template_name": "classic"})
+    assert get_exporter({"template_name": "classic"}) is exporter
+    assert get_exporter({"template_name": "lab"}) is not exporter
+
+    other_thread = []
+    thread = threading.Thread(
+        target=lambda: other_thread.append(get_exporter({"template_name": "classic"}))
+    )
+    thread.start()
+    thread.join()
+    assert other_thread[0] is not exporter
+
+
+@pytest.mark.parametrize(
+    "html,expected",
+    [
+        ("<html><head></head></html>", f"<html><head>{EXTRA_STYLE}</head></html>"),
+        ("<div></div>", f"{EXTRA_STYLE}<div></div>"),
+    ],
+)
+def test_add_style(html, expected):
+    assert add_style(html) == expected
+
+
+class TestRenderPool:
+    @pytest.fixture
+    def release(self):
+        return threading.Event()
+
+    @pytest.fixture
+    def rendering(self):
+        return threading.Event()
+
+    @pytest.fixture
+    def mock_render(self, release, rendering):
+        def render(content, exporter_options):
+            rendering.set()
+            release.wait(5)
+            return f"<html>{content}</html>"
+
+        with mock.patch(
+            "callisto.core.renderer.ProcessPoolExecutor", ThreadPoolExecutor
+        ), mock.patch(
+            "callisto.core.renderer.render_notebook", side_effect=render
+        ) as m:
+            yield m
+
+    def render_in_threads(self, pool, calls):
+        results = {}
+
+        def run(i, key, content):
+            try:
+                results[i] = pool.render(key, content)
+            except Exception as e:
+                results[i] = e
+
+        threads = [
+            threading.Thread(target=run, args=(i, key, content))
+            for i, (key, content) in enumerate(calls)
+        ]
+        for thread in threads:
+            thread.start()
+        return threads, results
+
+    def test_coalesces_same_key(self, mock_render, release, rendering):
+        pool = RenderPool(max_workers=2)
+        submitted = threading.Semaphore(0)
+        submit = pool._submit
+
+        def submit_and_signal(*args):
+            future = submit(*args)
+            submitted.release()
+            return future
+
+        with mock.patch.object(pool, "_submit", side_effect=submit_and_signal):
+            threads, results = self.render_in_threads(pool, [("key", "nb")] * 5)
+            # Every caller got the future of the render in flight.
+            assert rendering.wait(5)
+            for _ in threads:
+                assert submitted.acquire(timeout=5)
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert list(results.values()) == ["<html>nb</html>"] * 5
+        assert mock_render.call_count == 1
+        assert pool.stats()["pending"] == 0
+
+    def test_queue_full(self, mock_render, release, rendering):
+        pool = RenderPool(max_workers=1, max_queue=1)
+        threads, results = self.render_in_threads(pool, [("a", "nb")])
+        assert rendering.wait(5)
+        with pytest.raises(ServiceUnavailable):
+            pool.render("b", "nb")
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert results == {0: "<html>nb</html>"}
+
+    def test_timeout(self, mock_render, release):
+        pool = RenderPool(max_workers=1, timeout=0.01)
+        with pytest.raises(GatewayTimeout):
+            pool.render("key", "nb")
+        pool.timeout = 5
+        threads, results = self.render_in_threads(pool, [("key", "nb")])
+        release.set()
+        threads[0].join()
+        assert results == {0: "<html>nb</html>"}
+        assert mock_render.call_count == 1
+
+    def test_render_in_process(self, notebook):
+        pool = RenderPool(max_workers=1)
+        try:
+            assert pool.render("key", notebook) == render_notebook(notebook)
+        finally:
+            pool.shutdown()
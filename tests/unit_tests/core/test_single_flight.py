@@ -0,0 +1,139 @@
+import threading
+import time
+
+import pytest
+
+from callisto.core.single_flight import ProcessLock
+from callisto.core.single_flight import SingleFlight
+from callisto.core.single_flight import file_lock
+from callisto.core.single_flight import job_lock
+
+
+def run_in_threads(n, fn):
+    results = {}
+
+    def run(i):
+        try:
+            results[i] = fn()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+class TestSingleFlight:
+    def test_do(self):
+        assert SingleFlight().do("key", lambda: 1) == 1
+
+    def test_coalesces_concurrent_calls(self):
+        single_flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            release.wait(5)
+            return "result"
+
+        threads, results = run_in_threads(5, lambda: single_flight.do("key", fn))
+        while len(single_flight) == 0:
+            time.sleep(0.001)
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert list(results.values()) == ["result"] * 5
+        assert calls == [1]
+        assert len(single_flight) == 0
+
+    def test_shares_exception(self):
+        single_flight = SingleFlight()
+        release = threading.Event()
+
+        def fn():
+            release.wait(5)
+            raise ValueError("boom")
+
+        threads, results = run_in_threads(3, lambda: single_flight.do("key", fn))
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert all(isinstance(r, ValueError) for r in results.values())
+
+    def test_sequential_calls_run_again(self):
+        single_flight = SingleFlight()
+        assert single_flight.do("key", lambda: 1) == 1
+        assert single_flight.do("key", lambda: 2) == 2
+
+
+def test_file_lock(tmpdir):
+    events = []
+
+    def hold():
+        with file_lock(str(tmpdir), "key"):
+            events.append("enter")
+            time.sleep(0.05)
+            events.append("exit")
+
+    threads, _ = run_in_threads(2, hold)
+    for thread in threads:
+        thread.join()
+    assert events == ["enter", "exit", "enter", "exit"]
+    assert tmpdir.listdir() == []
+
+
+def test_file_lock_removes_files(tmpdir):
+    active = []
+    overlaps = []
+
+    def hold():
+        for i in range(20):
+            with file_lock(str(tmpdir), f"key-{i % 2}"):
+                active.append(i % 2)
+                overlaps.append(active.count(i % 2))
+                time.sleep(0.001)
+                active.remove(i % 2)
+
+    threads, results = run_in_threads(4, hold)
+    for thread in threads:
+        thread.join()
+    assert results == {i: None for i in range(4)}
+    assert max(overlaps) == 1
+    assert tmpdir.listdir() == []
+
+
+@pytest.mark.parametrize("other_key,expected", [("other", True), ("key", False)])
+def test_file_lock_per_key(tmpdir, other_key, expected):
+    acquired = threading.Event()
+
+    def acquire():
+        with file_lock(str(tmpdir), other_key):
+            acquired.set()
+
+    with file_lock(str(tmpdir), "key"):
+        thread = threading.Thread(target=acquire)
+        thread.start()
+        assert acquired.wait(0.1) is expected
+    thread.join()
+
+
+def test_process_lock(tmpdir):
+    path = str(tmpdir.join("locks", "job.lock"))
+    lock, other = ProcessLock(path), ProcessLock(path)
+    assert lock.acquire()
+    assert lock.acquire()
+    assert not other.acquire()
+    lock.release()
+    assert other.acquire()
+    assert not lock.acquire()
+    other.release()
+
+
+def test_job_lock():
+    assert job_lock("job", path="a").path == job_lock("job", path="a").path
+    assert job_lock("job", path="a").path != job_lock("job", path="b").path
+    assert job_lock("job", path="a").path != job_lock("other", path="a").path
@@ -0,0 +1,48 @@
+import re
+
+import nbformat
+import pytest
+from nbconvert.exporters import HTMLExporter
+
+from callisto.core.toc import extract_headings
+
+
+def markdown_notebook(*sources):
+    return {"cells": [{"cell_type": "markdown", "source": s} for s in sources]}
+
+
+@pytest.mark.parametrize(
+    "source,expected",
+    [
+        ("# Title", [(1, "Title", "Title")]),
+        ("## Two words", [(2, "Two words", "Two-words")]),
+        (["### Split ", "source"], [(3, "Split source", "Split-source")]),
+        ("Setext\n===", [(1, "Setext", "Setext")]),
+        ("## **Bold** tail", [(2, "Bold", "Bold-tail")]),
+        ("###### Level 6", []),
+        ("<h2>no anchor</h2>", []),
+        ("just text", []),
+    ],
+)
+def test_extract_headings(source, expected):
+    headings = extract_headings(markdown_notebook(source))
+    assert [(h.level, h.text, h.anchor) for h in headings] == expected
+
+
+def test_extract_headings_skips_other_cells():
+    notebook = {"cells": [{"cell_type": "code", "source": "# comment"}]}
+    assert extract_headings(notebook) == []
+
+
+def test_extract_headings_matches_nbconvert():
+    with open("tests/fixtures/notebooks/test-notebook.ipynb") as f:
+        notebook = nbformat.read(f, as_version=4)
+    html, _ = HTMLExporter(template_name="classic").from_notebook_node(notebook)
+    rendered = [
+        (int(level), anchor)
+        for level, anchor in re.findall(r'<h([1-5]) id="([^"]+)"', html)
+    ]
+
+    headings = extract_headings(notebook)
+    assert [(h.level, h.anchor) for h in headings] == rendered
+    assert headings[0].text == "Callisto Testing Notebook"
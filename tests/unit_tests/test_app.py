@@ -1,13 +1,18 @@
 import base64
+import datetime
+import gzip
 import random
 import json
+import os
 from unittest import mock
 
 import pytest
 from werkzeug.exceptions import NotFound
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
 
 from callisto.app import app
 from callisto.app import configure_app
+from callisto.core.callisto_config import CallistoConfig
 
 
 @pytest.fixture
@@ -19,6 +24,7 @@ def mock_loader():
 @pytest.fixture
 def mock_config():
     with mock.patch("callisto.app.CallistoConfig") as m:
+        m.load_from_config_file.return_value = CallistoConfig()
         yield m.load_from_config_file.return_value
 
 
@@ -28,6 +34,40 @@ def test_configure_app(mock_config, mock_loader):
     assert app.contents_loader == mock_loader
 
 
+def test_configure_app_shares_render_pool(mock_config, mock_loader):
+    with mock.patch("callisto.app.PrivateLoader") as mock_private_loader:
+        configure_app(app)
+    mock_private_loader.assert_called_once_with(
+        mock_config, render_pool=mock_loader.render_pool
+    )
+
+
+def test_configure_app_prerender(mock_config, mock_loader):
+    mock_config.prerender_interval = 60
+    mock_config.prerender_prefixes = ["hot"]
+    with mock.patch("callisto.app.Prerenderer") as mock_prerenderer:
+        configure_app(app)
+    mock_prerenderer.assert_called_once_with(
+        mock_loader, prefixes=["hot"], max_workers=None
+    )
+    [(interval,), kwargs] = mock_prerenderer.return_value.start.call_args
+    assert interval == 60
+    assert os.path.basename(kwargs["lock"].path).startswith("prerender-")
+
+
+def test_configure_app_content_indexer(mock_config, mock_loader):
+    mock_config.content_index_interval = 600
+    mock_config.content_index_prefixes = ["team"]
+    with mock.patch("callisto.app.ContentIndexer") as mock_indexer:
+        configure_app(app)
+    mock_indexer.assert_called_once_with(
+        mock_loader, mock_loader.content_index, prefixes=["team"]
+    )
+    [(interval,), kwargs] = mock_indexer.return_value.start.call_args
+    assert interval == 600
+    assert os.path.basename(kwargs["lock"].path).startswith("content-index-")
+
+
 @pytest.fixture
 def client(mock_loader, mock_config):
     configure_app(app)
@@ -72,12 +112,101 @@ def test_list(client, mock_loader, path, expected_search_path):
     mock_loader.get.assert_called_once_with(expected_search_path)
 
 
+def test_list_refresh(client, mock_loader):
+    mock_loader.get.return_value = {"type": "directory", "content": []}
+    r = client.get("/api/get/some/path?refresh=1")
+    assert r.status_code == 200
+    mock_loader.invalidate_listing.assert_called_once_with("some/path")
+    mock_loader.get.assert_called_once_with("some/path")
+
+
+@pytest.mark.parametrize(
+    "args,cursor", [("limit=50", None), ("limit=50&cursor=abc", "abc")]
+)
+def test_list_page(client, mock_loader, args, cursor):
+    page = {"type": "directory", "content": [], "next_cursor": "next"}
+    mock_loader.list_page.return_value = page
+    r = client.get(f"/api/get/some/path?{args}")
+    assert r.status_code == 200
+    assert json.loads(r.data) == page
+    mock_loader.list_page.assert_called_once_with("some/path", 50, cursor=cursor)
+    assert mock_loader.get.call_count == 0
+
+
+@pytest.mark.parametrize("limit", ["", "x", "0", "-1", "1001"])
+def test_list_page_invalid_limit(client, mock_loader, limit):
+    r = client.get(f"/api/get/some/path?limit={limit}")
+    assert r.status_code == 400
+    assert mock_loader.list_page.call_count == 0
+
+
+@pytest.mark.parametrize("args,limit", [("", 50), ("&limit=5", 5)])
+def test_search(client, mock_loader, args, limit):
+    mock_loader.search.return_value = [{"name": "report.ipynb"}]
+    r = client.get(f"/api/search?q=+report+{args}")
+    assert r.status_code == 200
+    assert json.loads(r.data) == {
+        "query": "report",
+        "content": [{"name": "report.ipynb"}],
+    }
+    mock_loader.search.assert_called_once_with("report", limit)
+
+
+@pytest.mark.parametrize("args", ["", "q=", "q=+", "q=a&limit=0"])
+def test_search_invalid(client, mock_loader, args):
+    r = client.get(f"/api/search?{args}")
+    assert r.status_code == 400
+    assert mock_loader.search.call_count == 0
+
+
+def test_search_content(client, mock_loader):
+    results = [{"path": "a.ipynb", "snippet": "<mark>sales</mark>"}]
+    mock_loader.search_content.return_value = results
+    r = client.get("/api/search/content?q=sales&limit=10")
+    assert r.status_code == 200
+    assert json.loads(r.data) == {"query": "sales", "content": results}
+    mock_loader.search_content.assert_called_once_with("sales", 10)
+
+
+def test_search_content_invalid(client, mock_loader):
+    assert client.get("/api/search/content?q=").status_code == 400
+    assert mock_loader.search_content.call_count == 0
+
+
+@pytest.mark.parametrize(
+    "url,path,depth",
+    [("/api/tree/<root>", "", 1), ("/api/tree/some/path?depth=5", "some/path", 5)],
+)
+def test_tree(client, mock_loader, url, path, depth):
+    tree = {"type": "directory", "content": [], "truncated": False}
+    mock_loader.list_tree.return_value = tree
+    r = client.get(url)
+    assert r.status_code == 200
+    assert json.loads(r.data) == tree
+    mock_loader.list_tree.assert_called_once_with(path, depth)
+
+
+@pytest.mark.parametrize("depth", ["", "x", "0", "6"])
+def test_tree_invalid_depth(client, mock_loader, depth):
+    r = client.get(f"/api/tree/some/path?depth={depth}")
+    assert r.status_code == 400
+    assert mock_loader.list_tree.call_count == 0
+
+
+def test_cache_stats(client, mock_loader):
+    mock_loader.cache_stats.return_value = {"listing": {"hits": 1}}
+    r = client.get("/api/cache/stats")
+    assert r.status_code == 200
+    assert json.loads(r.data) == {"listing": {"hits": 1}}
+
+
 @pytest.mark.parametrize("is_download", [True, False])
 @pytest.mark.parametrize("is_base64", [True, False])
 def test_raw_base64(client, mock_loader, is_download, is_base64):
     content = (
         base64.encodebytes(b"some-value").decode("ascii") if is_base64 else "some-value"
     )
+    mock_loader.open_stream.return_value = None
     mock_loader.get.return_value = {
         "format": "base64" if is_base64 else "text",
         "content": content,
@@ -98,25 +227,230 @@ def test_raw_notebook(client, mock_loader, has_mimetype):
     mock_notebook = {"format": "json", "content": "content", "name": "notebook.ipynb"}
     if has_mimetype:
         mock_notebook["mimetype"] = None
+    mock_loader.open_stream.return_value = None
     mock_loader.get.return_value = mock_notebook
     r = client.get("/api/raw/path/notebook.ipynb")
     assert r.data == b"content"
 
 
-def test_toc(client, mock_loader):
-    mock_loader.get_nb.return_value.toc.return_value = "toc"
+@pytest.mark.parametrize("is_download", [True, False])
+def test_raw_stream(client, mock_loader, is_download):
+    mock_loader.open_stream.return_value = {
+        "content": iter([b"some-", b"value"]),
+        "mimetype": "image/png",
+        "name": "image.png",
+        "size": 10,
+    }
+    path = "/api/raw/some/image.png" + ("?download=1" if is_download else "")
+    r = client.get(path)
+
+    assert r.status_code == 200
+    assert r.data == b"some-value"
+    assert r.headers["Content-Length"] == "10"
+    assert r.mimetype == "image/png"
+    assert ("Content-Disposition" in r.headers) is is_download
+    mock_loader.open_stream.assert_called_once_with("some/image.png", byte_range=None)
+    assert mock_loader.get.call_count == 0
+
+
+@pytest.fixture
+def partial_stream(mock_loader):
+    mock_loader.open_stream.return_value = {
+        "content": mock.MagicMock(__iter__=lambda _: iter([b"value"])),
+        "content_range": (5, 10),
+        "etag": "abc",
+        "last_modified": datetime.datetime(2022, 1, 1, tzinfo=datetime.timezone.utc),
+        "mimetype": "image/png",
+        "name": "image.png",
+        "size": 10,
+    }
+    return mock_loader.open_stream.return_value
+
+
+def test_raw_range(client, mock_loader, partial_stream):
+    r = client.get("/api/raw/some/image.png", headers={"Range": "bytes=5-"})
+    assert r.status_code == 206
+    assert r.data == b"value"
+    assert r.headers["Content-Range"] == "bytes 5-9/10"
+    assert r.headers["Content-Length"] == "5"
+    mock_loader.open_stream.assert_called_once_with(
+        "some/image.png", byte_range=(5, None)
+    )
+
+
+def test_raw_range_not_satisfiable(client, mock_loader):
+    mock_loader.open_stream.side_effect = RequestedRangeNotSatisfiable(length=10)
+    r = client.get("/api/raw/some/image.png", headers={"Range": "bytes=50-"})
+    assert r.status_code == 416
+    assert r.headers["Content-Range"] == "bytes */10"
+
+
+def test_raw_multiple_ranges_serves_whole_file(client, mock_loader):
+    mock_loader.open_stream.return_value = {
+        "content": iter([b"some-value"]),
+        "mimetype": "image/png",
+        "name": "image.png",
+        "size": 10,
+    }
+    r = client.get("/api/raw/some/image.png", headers={"Range": "bytes=0-1,4-5"})
+    assert r.status_code == 200
+    mock_loader.open_stream.assert_called_once_with("some/image.png", byte_range=None)
+
+
+@pytest.mark.parametrize(
+    "if_range,matches",
+    [
+        ('"abc"', True),
+        ('"other"', False),
+        ("Sat, 01 Jan 2022 00:00:00 GMT", True),
+        ("Sun, 02 Jan 2022 00:00:00 GMT", False),
+    ],
+)
+def test_raw_if_range(client, mock_loader, partial_stream, if_range, matches):
+    client.get(
+        "/api/raw/some/image.png",
+        headers={"Range": "bytes=5-", "If-Range": if_range},
+    )
+    if matches:
+        mock_loader.open_stream.assert_called_once_with(
+            "some/image.png", byte_range=(5, None)
+        )
+    else:
+        partial_stream["content"].close.assert_called_once_with()
+        mock_loader.open_stream.assert_called_with("some/image.png")
+
+
+LAST_MODIFIED = datetime.datetime(2022, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+@pytest.fixture
+def mock_nb(mock_loader):
+    nb = mock_loader.get_nb.return_value
+    nb.version.return_value = ("version-etag", LAST_MODIFIED)
+    return nb
+
+
+def test_toc(client, mock_loader, mock_nb):
+    mock_nb.toc.return_value = "toc"
     r = client.get("/api/notebook/toc/some/notebook.ipynb")
     assert r.status_code == 200
     assert json.loads(r.data) == "toc"
+    assert r.headers["ETag"] == '"version-etag"'
+    assert r.headers["Last-Modified"] == "Sat, 01 Jan 2022 00:00:00 GMT"
     mock_loader.get_nb.assert_called_once_with("some/notebook.ipynb")
+    mock_nb.toc.assert_called_once_with(refresh=False)
 
 
-def test_render_nb(client, mock_loader):
-    mock_loader.get_nb.return_value.html_content = "html"
+def test_render_nb(client, mock_loader, mock_nb):
+    mock_nb.get_html.return_value = "html"
     r = client.get("/api/notebook/render/some/notebook.ipynb")
     assert r.status_code == 200
     assert r.data == b"html"
+    assert r.headers["ETag"] == '"version-etag"'
+    assert r.headers["Cache-Control"] == "no-cache"
     mock_loader.get_nb.assert_called_once_with("some/notebook.ipynb")
+    mock_nb.get_html.assert_called_once_with(refresh=False)
+
+
+@pytest.mark.parametrize(
+    "headers",
+    [
+        {"If-None-Match": '"version-etag"'},
+        {"If-Modified-Since": "Sat, 01 Jan 2022 00:00:00 GMT"},
+    ],
+)
+@pytest.mark.parametrize(
+    "path", ["/api/notebook/render/nb.ipynb", "/api/notebook/toc/nb.ipynb"]
+)
+def test_notebook_not_modified(client, mock_nb, path, headers):
+    r = client.get(path, headers=headers)
+    assert r.status_code == 304
+    assert r.data == b""
+    assert mock_nb.get_html.call_count == 0
+    assert mock_nb.toc.call_count == 0
+
+
+def test_render_nb_modified(client, mock_nb):
+    mock_nb.get_html.return_value = "html"
+    r = client.get(
+        "/api/notebook/render/nb.ipynb", headers={"If-None-Match": '"old-etag"'}
+    )
+    assert r.status_code == 200
+    assert r.data == b"html"
+
+
+def test_info_not_modified(client, mock_loader):
+    mock_loader.info.return_value = {"etag": "abc", "last_modified": LAST_MODIFIED}
+    r = client.get("/api/info/some/file.csv")
+    assert r.status_code == 200
+    assert r.headers["ETag"] == '"abc"'
+
+    r = client.get("/api/info/some/file.csv", headers={"If-None-Match": '"abc"'})
+    assert r.status_code == 304
+
+
+def test_list_not_modified(client, mock_loader):
+    mock_loader.get.return_value = {"type": "directory", "content": []}
+    r = client.get("/api/get/some/path")
+    assert r.status_code == 200
+    etag = r.headers["ETag"]
+
+    r = client.get("/api/get/some/path", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+
+    mock_loader.get.return_value = {
+        "type": "directory",
+        "content": [{"type": "file", "name": "new"}],
+    }
+    r = client.get("/api/get/some/path", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+
+
+@pytest.mark.parametrize("query", ["", "?limit=10"])
+def test_list_validated_by_body(client, mock_loader, query):
+    model = {"type": "directory", "last_modified": LAST_MODIFIED, "content": []}
+    mock_loader.get.return_value = model
+    mock_loader.list_page.return_value = model
+    r = client.get(f"/api/get/some/path{query}")
+    assert "Last-Modified" not in r.headers
+    etag = r.headers["ETag"]
+
+    # The folder keeps its last modified time when an entry changes.
+    model["content"] = [{"type": "file", "name": "new"}]
+    r = client.get(
+        f"/api/get/some/path{query}",
+        headers={
+            "If-None-Match": etag,
+            "If-Modified-Since": "Sat, 01 Jan 2022 00:00:00 GMT",
+        },
+    )
+    assert r.status_code == 200
+
+
+def test_tree_validated_by_body(client, mock_loader):
+    tree = {"last_modified": LAST_MODIFIED, "content": [{"content": []}]}
+    mock_loader.list_tree.return_value = tree
+    r = client.get("/api/tree/some/path?depth=2")
+    assert "Last-Modified" not in r.headers
+    etag = r.headers["ETag"]
+
+    # The root keeps its last modified time when an entry deeper down changes.
+    tree["content"][0]["content"] = [{"type": "file", "name": "new"}]
+    r = client.get(
+        "/api/tree/some/path?depth=2",
+        headers={
+            "If-None-Match": etag,
+            "If-Modified-Since": "Sat, 01 Jan 2022 00:00:00 GMT",
+        },
+    )
+    assert r.status_code == 200
+
+
+def test_raw_not_modified(client, mock_loader):
+    mock_loader.info.return_value = {"etag": "abc", "last_modified": LAST_MODIFIED}
+    r = client.get("/api/raw/some/image.png", headers={"If-None-Match": '"abc"'})
+    assert r.status_code == 304
+    assert mock_loader.open_stream.call_count == 0
 
 
 @pytest.mark.parametrize("use_link_func", [True, False])
@@ -152,7 +486,204 @@ def test_import_nb_without_base_url(client, mock_config):
 
 
 def test_handle_exception(client, mock_loader):
-    mock_loader.get.side_effect = NotFound()
+    mock_loader.open_stream.side_effect = NotFound()
     r = client.get("/api/raw/path/not-found")
     assert r.status_code == 404
     assert json.loads(r.data)["code"] == 404
+
+
+def test_compress_json_response(client, mock_loader):
+    mock_loader.get.return_value = {
+        "type": "directory",
+        "content": [{"type": "file", "name": f"file-{i}"} for i in range(100)],
+    }
+    r = client.get("/api/get/some/path", headers={"Accept-Encoding": "gzip"})
+    assert r.status_code == 200
+    assert r.headers["Content-Encoding"] == "gzip"
+    assert r.headers["Vary"] == "Accept-Encoding"
+    assert r.headers["ETag"].startswith("W/")
+    assert len(json.loads(gzip.decompress(r.data))["content"]) == 100
+
+    r = client.get(
+        "/api/get/some/path",
+        headers={"Accept-Encoding": "gzip", "If-None-Match": r.headers["ETag"]},
+    )
+    assert r.status_code == 304
+    assert r.headers["ETag"].startswith("W/")
+    assert r.headers["Vary"] == "Accept-Encoding"
+
+
+def test_compress_skips_small_response(client, mock_loader):
+    mock_loader.info.return_value = {"name": "file"}
+    r = client.get("/api/info/some/file", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in r.headers
+    assert json.loads(r.data) == {"name": "file"}
+
+
+def test_compress_disabled(client, mock_config, mock_loader):
+    mock_config.compression_min_size = None
+    mock_loader.get.return_value = {"type": "directory", "content": []}
+    r = client.get("/api/get/some/path", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in r.headers
+
+
+def test_render_nb_compressed(client, mock_nb):
+    mock_nb.get_html.return_value = "x" * 2000
+    mock_nb.get_compressed_html.return_value = gzip.compress(b"x" * 2000)
+    r = client.get("/api/notebook/render/nb.ipynb", headers={"Accept-Encoding": "gzip"})
+    assert r.status_code == 200
+    assert r.headers["Content-Encoding"] == "gzip"
+    assert r.headers["ETag"] == 'W/"version-etag"'
+    assert gzip.decompress(r.data) == b"x" * 2000
+    mock_nb.get_compressed_html.assert_called_once_with("gzip", refresh=False)
+
+
+def test_render_nb_compressed_by_encoded_size(client, mock_nb):
+    # 600 characters, 1200 bytes, over the 1024 bytes threshold.
+    mock_nb.get_html.return_value = "é" * 600
+    mock_nb.get_compressed_html.return_value = gzip.compress("é".encode() * 600)
+    r = client.get("/api/notebook/render/nb.ipynb", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["Content-Encoding"] == "gzip"
+    mock_nb.get_compressed_html.assert_called_once_with("gzip", refresh=False)
+
+
+def test_render_nb_not_modified_compressible(client, mock_nb):
+    mock_nb.get_html.return_value = "x" * 2000
+    mock_nb.get_compressed_html.return_value = gzip.compress(b"x" * 2000)
+    headers = {"Accept-Encoding": "gzip"}
+    r = client.get("/api/notebook/render/nb.ipynb", headers=headers)
+    etag = r.headers["ETag"]
+    r = client.get(
+        "/api/notebook/render/nb.ipynb", headers={**headers, "If-None-Match": etag}
+    )
+    assert r.status_code == 304
+    assert r.headers["ETag"] == etag == 'W/"version-etag"'
+    assert r.headers["Vary"] == "Accept-Encoding"
+
+
+def test_render_nb_small_weak_etag(client, mock_nb):
+    mock_nb.get_html.return_value = "x"
+    r = client.get("/api/notebook/render/nb.ipynb", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in r.headers
+    assert r.headers["ETag"] == 'W/"version-etag"'
+
+    r = client.get("/api/notebook/render/nb.ipynb")
+    assert r.headers["ETag"] == '"version-etag"'
+
+
+def test_render_nb_cells_compressed(client, mock_nb):
+    mock_nb.cell_count.return_value = 100
+    mock_nb.get_cells_html.return_value = "x" * 2000
+    mock_nb.get_compressed_cells_html.return_value = gzip.compress(b"x" * 2000)
+    r = client.get(
+        "/api/notebook/render/nb.ipynb?cells=30-60&fragment=1",
+        headers={"Accept-Encoding": "gzip"},
+    )
+    assert r.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(r.data) == b"x" * 2000
+    mock_nb.get_compressed_cells_html.assert_called_once_with(
+        30, 60, "gzip", fragment=True, refresh=False
+    )
+
+
+@pytest.mark.parametrize(
+    "cells,expected",
+    [("0-50", (0, 50)), ("10-20", (10, 20)), ("90-", (90, 100)), ("90-200", (90, 100))],
+)
+def test_render_nb_cells(client, mock_nb, cells, expected):
+    mock_nb.cell_count.return_value = 100
+    mock_nb.get_cells_html.return_value = "<div>cells</div>"
+    r = client.get(f"/api/notebook/render/nb.ipynb?cells={cells}")
+    assert r.status_code == 200
+    assert r.data == b"<div>cells</div>"
+    assert r.headers["X-Total-Cells"] == "100"
+    assert r.headers["ETag"] == f'"version-etag.cells-{expected[0]}-{expected[1]}"'
+    mock_nb.get_cells_html.assert_called_once_with(
+        *expected, fragment=False, refresh=False
+    )
+
+
+def test_render_nb_cells_fragment(client, mock_nb):
+    mock_nb.cell_count.return_value = 100
+    mock_nb.get_cells_html.return_value = "<div>cells</div>"
+    r = client.get("/api/notebook/render/nb.ipynb?cells=50-100&fragment=1")
+    assert r.status_code == 200
+    mock_nb.get_cells_html.assert_called_once_with(
+        50, 100, fragment=True, refresh=False
+    )
+
+    r = client.get(
+        "/api/notebook/render/nb.ipynb?cells=50-100&fragment=1",
+        headers={"If-None-Match": r.headers["ETag"]},
+    )
+    assert r.status_code == 304
+    assert r.headers["X-Total-Cells"] == "100"
+
+
+@pytest.mark.parametrize("cells", ["", "abc", "10", "-5", "20-10", "1-x"])
+def test_render_nb_invalid_cells(client, mock_nb, cells):
+    mock_nb.cell_count.return_value = 100
+    r = client.get(f"/api/notebook/render/nb.ipynb?cells={cells}")
+    assert r.status_code == 400
+
+
+DIGEST = "a" * 64
+
+
+def test_notebook_output(client, mock_loader):
+    mock_loader.get_output.return_value = b"image"
+    r = client.get(f"/api/notebook/output/{DIGEST}.png")
+    assert r.status_code == 200
+    assert r.data == b"image"
+    assert r.headers["Content-Type"] == "image/png"
+    assert r.headers["Cache-Control"] == "public, max-age=31536000, immutable"
+    mock_loader.get_output.assert_called_once_with(DIGEST)
+
+    r = client.get(
+        f"/api/notebook/output/{DIGEST}.png", headers={"If-None-Match": f'"{DIGEST}"'}
+    )
+    assert r.status_code == 304
+
+
+@pytest.mark.parametrize(
+    "name", ["abc.png", f"{DIGEST}.exe", f"{DIGEST}", f"{DIGEST.upper()}.png"]
+)
+def test_notebook_output_invalid_name(client, mock_loader, name):
+    r = client.get(f"/api/notebook/output/{name}")
+    assert r.status_code == 404
+    assert mock_loader.get_output.call_count == 0
+
+
+def test_notebook_output_not_found(client, mock_loader):
+    mock_loader.get_output.return_value = None
+    r = client.get(f"/api/notebook/output/{DIGEST}.png")
+    assert r.status_code == 404
+
+
+def test_notebook_output_text(client, mock_loader, mock_nb):
+    mock_nb.get_output_text.return_value = ("<b>full</b>", "text/html")
+    r = client.get("/api/notebook/output-text/nb.ipynb?cell=3&output=1")
+    assert r.status_code == 200
+    assert r.data == b"<b>full</b>"
+    assert r.headers["Content-Type"].startswith("text/html")
+    assert r.headers["ETag"] == '"version-etag.output-3-1"'
+    mock_loader.get_nb.assert_called_once_with("nb.ipynb")
+    mock_nb.get_output_text.assert_called_once_with(3, 1, refresh=False)
+
+    r = client.get(
+        "/api/notebook/output-text/nb.ipynb?cell=3&output=1",
+        headers={"If-None-Match": r.headers["ETag"]},
+    )
+    assert r.status_code == 304
+
+
+@pytest.mark.parametrize("args", ["", "cell=1", "cell=1&output=x", "cell=&output=0"])
+def test_notebook_output_text_invalid(client, mock_nb, args):
+    r = client.get(f"/api/notebook/output-text/nb.ipynb?{args}")
+    assert r.status_code == 400
+
+
+def test_notebook_output_text_not_found(client, mock_nb):
+    mock_nb.get_output_text.return_value = None
+    r = client.get("/api/notebook/output-text/nb.ipynb?cell=100&output=0")
+    assert r.status_code == 404